@@ -36,9 +36,10 @@ bl_info = {
 
 import bpy
 from bpy.props import FloatProperty, IntProperty, BoolProperty
-from mathutils import Vector, Matrix
+from mathutils import Vector
 from collections import deque
-from math import pow, cos, pi, atan2
+from array import array
+from math import pow, sin, cos, pi, atan2
 from random import random as rand_val, seed as rand_seed
 import time
 
@@ -58,7 +59,7 @@ def createIvyGeometry(IVY, growLeaves):
 
     if growLeaves:
         # Create the ivy leaves
-        # Order location of the vertices
+        # The leaf corners, in face order, as factors of the leaf axes
         signList = ((-1.0, +1.0),
                     (+1.0, +1.0),
                     (+1.0, -1.0),
@@ -68,12 +69,11 @@ def createIvyGeometry(IVY, growLeaves):
         # Get the local size
         #local_ivyLeafSize = IVY.ivyLeafSize  # * radius * IVY.ivySize
 
-        # Initialise the vertex and face lists
-        vertList = deque()
+        # Initialise the flat vertex coordinate array
+        leafCoords = array('f')
 
         # Store the methods for faster calling
-        addV = vertList.extend
-        rotMat = Matrix.Rotation
+        addCo = leafCoords.extend
 
     # Loop over all roots to generate its nodes
     for root in IVY.ivyRoots:
@@ -83,11 +83,13 @@ def createIvyGeometry(IVY, growLeaves):
             # Calculate the local radius
             local_ivyBranchRadius = 1.0 / (root.parents + 1) + 1.0
             prevIvyLength = 1.0 / root.ivyNodes[-1].length
-            splineVerts = [ax for n in root.ivyNodes for ax in n.pos.to_4d()]
+            splineVerts = array('f', [ax for n in root.ivyNodes
+                                          for ax in n.pos.to_4d()])
 
             radiusConstant = local_ivyBranchRadius * IVY.ivyBranchSize
-            splineRadii = [radiusConstant * (1.3 - n.length * prevIvyLength)
-                                                        for n in root.ivyNodes]
+            splineRadii = array('f', [radiusConstant *
+                                      (1.3 - n.length * prevIvyLength)
+                                      for n in root.ivyNodes])
 
             # Add the poly curve and set coords and radii
             newSpline = curve.splines.new(type='POLY')
@@ -137,6 +139,22 @@ def createIvyGeometry(IVY, growLeaves):
                     # Calculate the leaf size an append the face to the list
                     leafSize = IVY.ivyLeafSize * sizeWeight
 
+                    # The leaf axes are the X and Y axes rotated by theta
+                    # around X then by phi around Z, scaled to the leaf size,
+                    # the same for all leaves of this node
+                    sinPhi = sin(phi) * leafSize
+                    cosPhi = cos(phi) * leafSize
+                    cosTheta = cos(theta)
+                    basisX = (cosPhi, sinPhi, 0.0)
+                    basisY = (-sinPhi * cosTheta, cosPhi * cosTheta,
+                              sin(theta) * leafSize)
+
+                    # The leaf corners relative to the leaf center
+                    corners = [c for k1, k2 in signList
+                                 for c in (k1 * basisX[0] + k2 * basisY[0],
+                                           k1 * basisX[1] + k2 * basisY[1],
+                                           k1 * basisX[2] + k2 * basisY[2])]
+
                     for j in range(10):
                         # Generate the probability
                         probability = rand_val()
@@ -154,36 +172,25 @@ def createIvyGeometry(IVY, growLeaves):
                             center = (node.pos.lerp(nodeNext.pos, j / 10.0) +
                                                IVY.ivyLeafSize * randomVector)
 
-                            # For each of the verts, rotate/scale and append
-                            basisVecX = Vector((1, 0, 0))
-                            basisVecY = Vector((0, 1, 0))
-
-                            horiRot = rotMat(theta, 3, 'X')
-                            vertRot = rotMat(phi, 3, 'Z')
-
-                            basisVecX.rotate(horiRot)
-                            basisVecY.rotate(horiRot)
-
-                            basisVecX.rotate(vertRot)
-                            basisVecY.rotate(vertRot)
-
-                            basisVecX *= leafSize
-                            basisVecY *= leafSize
-
-                            addV([k1 * basisVecX + k2 * basisVecY + center for
-                                                           k1, k2 in signList])
+                            # Move the leaf corners to the center
+                            addCo([co + offset for co, offset in
+                                               zip(center[:] * 4, corners)])
 
     # Add the object and link to scene
     newCurve = bpy.data.objects.new("IVY_Curve", curve)
     bpy.context.scene.objects.link(newCurve)
 
     if growLeaves:
-        faceList = [[4 * i + l for l in range(4)] for i in
-                                                     range(len(vertList) // 4)]
+        numLeaves = len(leafCoords) // 12
 
-        # Generate the new leaf mesh and link
+        # Generate the new leaf mesh in bulk and link,
+        # every leaf is a quad of its own 4 vertices
         me = bpy.data.meshes.new('IvyLeaf')
-        me.from_pydata(vertList, [], faceList)
+        me.vertices.add(numLeaves * 4)
+        me.vertices.foreach_set('co', leafCoords)
+        me.tessfaces.add(numLeaves)
+        me.tessfaces.foreach_set('vertices_raw', array('i',
+                                                 range(numLeaves * 4)))
         me.update(calc_edges=True)
         ob = bpy.data.objects.new('IvyLeaf', me)
         bpy.context.scene.objects.link(ob)
@@ -247,7 +254,8 @@ class Ivy:
     __slots__ = ('ivyRoots', 'primaryWeight', 'randomWeight',
                  'gravityWeight', 'adhesionWeight', 'branchingProbability',
                  'leafProbability', 'ivySize', 'ivyLeafSize', 'ivyBranchSize',
-                 'maxFloatLength', 'maxAdhesionDistance', 'maxLength')
+                 'maxFloatLength', 'maxAdhesionDistance', 'maxLength',
+                 'branchingMean')
 
     def __init__(self,
                  primaryWeight=0.5,
@@ -282,6 +290,22 @@ class Ivy:
         self.randomWeight /= sum
         self.adhesionWeight /= sum
 
+        # Mean probability of a node starting a new root, nodes are spread
+        # evenly along the root so this only depends on the branching
+        # probability (midpoint rule over the relative node length)
+        self.branchingMean = 0.0
+        for i in range(1000):
+            self.branchingMean += self.branchProbability((i + 0.5) / 1000.0)
+        self.branchingMean /= 1000.0
+
+    def branchProbability(self, relativeLength):
+        # Probability of a node at relativeLength along its root to start
+        # a new root: rand_val() * weight > self.branchingProbability
+        weight = 1.0 - (cos(2.0 * pi * relativeLength) * 0.5 + 0.5)
+        if weight <= self.branchingProbability:
+            return 0.0
+        return 1.0 - self.branchingProbability / weight
+
     def seed(self, seedPos):
         # Seed the Ivy by making a new root and first node
         tmpRoot = IvyRoot()
@@ -291,7 +315,7 @@ class Ivy:
         tmpRoot.ivyNodes.append(tmpIvy)
         self.ivyRoots.append(tmpRoot)
 
-    def grow(self, ob):
+    def grow(self, surface):
         # Determine the local sizes
         #local_ivySize = self.ivySize  # * radius
         #local_maxFloatLength = self.maxFloatLength  # * radius
@@ -318,7 +342,7 @@ class Ivy:
             randomVector.normalize()
 
             # Calculate the adhesion vector
-            adhesionVector = adhesion(prevIvy.pos, ob,
+            adhesionVector = adhesion(prevIvy.pos, surface,
                                                       self.maxAdhesionDistance)
 
             # Calculate the growing vector
@@ -336,7 +360,7 @@ class Ivy:
             newPos = prevIvy.pos + growVector + gravityVector
 
             # Check for collisions with the object
-            climbing = collision(ob, prevIvy.pos, newPos)
+            climbing = collision(surface, prevIvy.pos, newPos)
 
             # Update the growing vector for any collisions
             growVector = newPos - prevIvy.pos - gravityVector
@@ -371,41 +395,69 @@ class Ivy:
                 continue
 
             # Check to make sure there's more than 1 node
-            if len(root.ivyNodes) > 1:
-                # Loop through all nodes in root to check if new root is grown
-                for node in root.ivyNodes:
-                    # Set the last node of the root and find the weighting
-                    prevIvy = root.ivyNodes[-1]
-                    weight = 1.0 - (cos(2.0 * pi * node.length /
-                                        prevIvy.length) * 0.5 + 0.5)
-
-                    probability = rand_val()
-
-                    # Check if a new root is grown and if so, set its values
-                    if (probability * weight > self.branchingProbability):
-                        tmpNode = IvyNode()
-                        tmpNode.pos = node.pos
-                        tmpNode.floatingLength = node.floatingLength
-
-                        tmpRoot = IvyRoot()
-                        tmpRoot.parents = root.parents + 1
-
-                        tmpRoot.ivyNodes.append(tmpNode)
-                        self.ivyRoots.append(tmpRoot)
-                        return
-
-
-def adhesion(loc, ob, max_l):
-    # Get transfor vector and transformed loc
-    tran_mat = ob.matrix_world.inverted()
-    tran_loc = tran_mat * loc
+            numNodes = len(root.ivyNodes)
+            if numNodes > 1:
+                # Instead of testing every node, find if any node starts a
+                # new root (from the mean probability of the nodes)...
+                if (rand_val() >=
+                        1.0 - pow(1.0 - self.branchingMean, numNodes)):
+                    continue
+
+                # ...then pick that node, weighted by its probability.
+                # Only nodes close to the middle of the root can branch,
+                # skip the root if none of its nodes is there.
+                prevLength = root.ivyNodes[-1].length
+                probabilities = [self.branchProbability(node.length /
+                                                        prevLength)
+                                 for node in root.ivyNodes]
+                probabilitySum = sum(probabilities)
+                if probabilitySum <= 0.0:
+                    continue
+                pick = rand_val() * probabilitySum
+                for node, probability in zip(root.ivyNodes, probabilities):
+                    if probability > 0.0:
+                        node_pick = node
+                        pick -= probability
+                        if pick < 0.0:
+                            break
+                node = node_pick
+
+                # A new root is grown, set its values
+                tmpNode = IvyNode()
+                tmpNode.pos = node.pos
+                tmpNode.floatingLength = node.floatingLength
+
+                tmpRoot = IvyRoot()
+                tmpRoot.parents = root.parents + 1
+
+                tmpRoot.ivyNodes.append(tmpNode)
+                self.ivyRoots.append(tmpRoot)
+                return
+
+
+class IvySurface:
+    """ The object the ivy grows on.
+
+    Keeps the object matrices, so these are only calculated once per
+    growth run."""
+    __slots__ = ('object', 'matrix', 'matrixInv')
+
+    def __init__(self, ob):
+        self.object = ob
+        self.matrix = ob.matrix_world.copy()
+        self.matrixInv = self.matrix.inverted()
+
+
+def adhesion(loc, surface, max_l):
+    # Get the transformed loc
+    tran_loc = surface.matrixInv * loc
 
     # Compute the adhesion vector by finding the nearest point
-    nearest_result = ob.closest_point_on_mesh(tran_loc, max_l)
+    nearest_result = surface.object.closest_point_on_mesh(tran_loc, max_l)
     adhesion_vector = Vector((0.0, 0.0, 0.0))
     if nearest_result[2] != -1:
         # Compute the distance to the nearest point
-        adhesion_vector = ob.matrix_world * nearest_result[0] - loc
+        adhesion_vector = surface.matrix * nearest_result[0] - loc
         distance = adhesion_vector.length
         # If it's less than the maximum allowed and not 0, continue
         if distance:
@@ -416,16 +468,16 @@ def adhesion(loc, ob, max_l):
     return adhesion_vector
 
 
-def collision(ob, pos, new_pos):
+def collision(surface, pos, new_pos):
     # Check for collision with the object
     climbing = False
 
     # Transform vecs
-    tran_mat = ob.matrix_world.inverted()
+    tran_mat = surface.matrixInv
     tran_pos = tran_mat * pos
     tran_new_pos = tran_mat * new_pos
 
-    ray_result = ob.ray_cast(tran_pos, tran_new_pos)
+    ray_result = surface.object.ray_cast(tran_pos, tran_new_pos)
     # If there's a collision we need to check it
     if ray_result[2] != -1:
         # Check whether the collision is going into the object
@@ -436,7 +488,7 @@ def collision(ob, pos, new_pos):
             # Reflect in the plane
             tran_new_pos += 2 * (p0 - tran_new_pos)
             new_pos *= 0
-            new_pos += ob.matrix_world * tran_new_pos
+            new_pos += surface.matrix * tran_new_pos
             climbing = True
     return climbing
 
@@ -564,6 +616,9 @@ class IvyGen(bpy.types.Operator):
         # Generate first root and node
         IVY.seed(seedPoint)
 
+        # Prepare the object for the growth queries
+        surface = IvySurface(ob)
+
         checkTime = False
         maxLength = self.maxIvyLength  # * radius
 
@@ -580,7 +635,7 @@ class IvyGen(bpy.types.Operator):
                (IVY.maxLength < maxLength) and
                (not checkTime or (time.time() - t < self.maxTime))):
             # Grow the ivy for this iteration
-            IVY.grow(ob)
+            IVY.grow(surface)
 
             # Print the proportion of ivy growth to console
             if (IVY.maxLength / maxLength * 100) > 10 * startPercent // 10:
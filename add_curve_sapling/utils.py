@@ -21,6 +21,8 @@ import bpy
 import time
 import copy
 
+from array import array
+
 from mathutils import *
 from math import pi,sin,degrees,radians,atan2,copysign,cos,acos
 from random import random,uniform,seed,choice,getstate,setstate
@@ -83,6 +85,67 @@ class childPoint:
         self.parBone = parBone
 
 
+# The stems are grown in these stand-ins for the curve data. Each finished level is written to the curve at once,
+# adding points one at a time through the curve data (and deleting splines while pruning) is very slow.
+class bezierPoint:
+    __slots__ = ('co','handle_left','handle_right','handle_left_type','handle_right_type','radius')
+    def __init__(self):
+        self.co = Vector((0,0,0))
+        self.handle_left = Vector((0,0,0))
+        self.handle_right = Vector((0,0,0))
+        self.handle_left_type = 'FREE'
+        self.handle_right_type = 'FREE'
+        self.radius = 1.0
+
+class bezierPoints(list):
+    def add(self,count=1):
+        self.extend(bezierPoint() for i in range(count))
+
+class bezierSpline:
+    __slots__ = ('bezier_points','curve')
+    def __init__(self,curve):
+        self.bezier_points = bezierPoints([bezierPoint()])
+        self.curve = curve
+
+class treeSplines(list):
+    def __init__(self,curve):
+        self.curve = curve
+    def new(self,type):
+        spline = bezierSpline(self.curve)
+        self.append(spline)
+        return spline
+
+class treeCurve:
+    def __init__(self):
+        self.splines = treeSplines(self)
+        self.written = 0
+    # Add the splines grown since the last call to the curve cu. The handles calculated for the AUTO and VECTOR
+    # points are read back as they are needed to find the child points along the stems.
+    def write(self,cu):
+        for spline in self.splines[self.written:]:
+            points = spline.bezier_points
+            numPoints = len(points)
+            newSpline = cu.splines.new('BEZIER')
+            newPoints = newSpline.bezier_points
+            newPoints.add(numPoints - 1)
+            for attr in ('co','handle_left','handle_right'):
+                values = []
+                for p in points:
+                    values.extend(getattr(p,attr))
+                newPoints.foreach_set(attr,values)
+            newPoints.foreach_set('radius',[p.radius for p in points])
+            # Setting the handle types also recalculates the handles from the new coordinates
+            for p,newPoint in zip(points,newPoints):
+                (newPoint.handle_left_type,newPoint.handle_right_type) = (p.handle_left_type,p.handle_right_type)
+            handlesL = [0.0]*(3*numPoints)
+            handlesR = [0.0]*(3*numPoints)
+            newPoints.foreach_get('handle_left',handlesL)
+            newPoints.foreach_get('handle_right',handlesR)
+            for i,p in enumerate(points):
+                p.handle_left = Vector(handlesL[3*i:3*i+3])
+                p.handle_right = Vector(handlesR[3*i:3*i+3])
+        self.written = len(self.splines)
+
 # This function calculates the shape ratio as defined in the paper
 def shapeRatio(shape,ratio,pruneWidthPeak=0.0,prunePowerHigh=0.0,prunePowerLow=0.0):
     if shape == 0:
@@ -222,8 +285,7 @@ def growSpline(stem,numSplit,splitAng,splitAngV,splineList,attractUp,hType,splin
     # If the stem splits, we need to add new splines etc
     if numSplit > 0:
         # Get the curve data
-        cuData = stem.spline.id_data.name
-        cu = bpy.data.curves[cuData]
+        cu = stem.spline.curve
         # Now for each split add the new spline and adjust the growth direction
         for i in range(numSplit):
             newSpline = cu.splines.new('BEZIER')
@@ -321,19 +383,15 @@ def growSpline(stem,numSplit,splitAng,splitAngV,splineList,attractUp,hType,splin
     stem.updateEnd()
     #return splineList
 
-def genLeafMesh(leafScale,leafScaleX,loc,quat,index,downAngle,downAngleV,rotate,rotateV,oldRot,bend,leaves, leafShape):
-    if leafShape == 'hex':
-        verts = [Vector((0,0,0)),Vector((0.5,0,1/3)),Vector((0.5,0,2/3)),Vector((0,0,1)),Vector((-0.5,0,2/3)),Vector((-0.5,0,1/3))]
-        edges = [[0,1],[1,2],[2,3],[3,4],[4,5],[5,0],[0,3]]
-        faces = [[0,1,2,3],[0,3,4,5]]
-    elif leafShape == 'rect':
-        verts = [Vector((1,0,0)),Vector((1,0,1)),Vector((-1,0,1)),Vector((-1,0,0))]
-        edges = [[0,1],[1,2],[2,3],[3,0]]
-        faces = [[0,1,2,3],]
-    #faces = [[0,1,5],[1,2,4,5],[2,3,4]]
+# The vertices and faces of a single leaf, these are placed on the tree by genLeafMesh
+leafGeom = {'hex': ([(0,0,0),(0.5,0,1/3),(0.5,0,2/3),(0,0,1),(-0.5,0,2/3),(-0.5,0,1/3)],[[0,1,2,3],[0,3,4,5]]),
+            'rect': ([(1,0,0),(1,0,1),(-1,0,1),(-1,0,0)],[[0,1,2,3],])}
+#faces = [[0,1,5],[1,2,4,5],[2,3,4]]
 
-    vertsList = []
-    facesList = []
+# Add the coordinates of a leaf at loc to leafVerts. All the rotations of the leaf are combined in a single matrix which
+# is then applied to the scaled leaf vertices.
+def genLeafMesh(leafScale,leafScaleX,loc,quat,downAngle,downAngleV,rotate,rotateV,oldRot,bend,leaves,leafShape,leafVerts):
+    verts = leafGeom[leafShape][0]
 
     # If the special -ve flag is used we need a different rotation of the leaf geometry
     if leaves < 0:
@@ -344,17 +402,14 @@ def genLeafMesh(leafScale,leafScaleX,loc,quat,index,downAngle,downAngleV,rotate,
         downRotMat = Matrix.Rotation(downAngle+uniform(-downAngleV,downAngleV),3,'X')
         rotMat = Matrix.Rotation(oldRot,3,'Z')
 
-    normal = yAxis.copy()
-    #dirVec = zAxis.copy()
-    orientationVec = zAxis.copy()
+    leafMat = quat.to_matrix()*rotMat
+    if leaves > 0:
+        leafMat = leafMat*downRotMat
 
     # If the bending of the leaves is used we need to rotated them differently
-    if (bend != 0.0) and (leaves >= 0):
-#        normal.rotate(downRotMat)
-#        orientationVec.rotate(downRotMat)
-#
-#        normal.rotate(rotMat)
-#        orientationVec.rotate(rotMat)
+    if (bend != 0.0) and (leaves > 0):
+        normal = yAxis.copy()
+        orientationVec = zAxis.copy()
 
         normal.rotate(quat)
         orientationVec.rotate(quat)
@@ -373,33 +428,19 @@ def genLeafMesh(leafScale,leafScaleX,loc,quat,index,downAngle,downAngleV,rotate,
 
         rotateZOrien2 = Matrix.Rotation(-orientation,3,'X')
 
-    # For each of the verts we now rotate and scale them, then append them to the list to be added to the mesh
-    for v in verts:
-        
-        v.z *= leafScale
-        v.x *= leafScaleX*leafScale
-
-        if leaves > 0:
-            v.rotate(downRotMat)
-
-        v.rotate(rotMat)
-        v.rotate(quat)
+        # Correct the rotation
+        leafMat = rotateZOrien2*rotateX*rotateZOrien*rotateZ*leafMat
 
-        if (bend != 0.0) and (leaves > 0):
-            # Correct the rotation
-            v.rotate(rotateZ)
-            v.rotate(rotateZOrien)
-            v.rotate(rotateX)
-            v.rotate(rotateZOrien2)
-
-        #v.rotate(quat)
-    for v in verts:
-        v += loc
-        vertsList.append([v.x,v.y,v.z])
-
-    for f in faces:
-        facesList.append([f[0] + index,f[1] + index,f[2] + index,f[3] + index])
-    return vertsList,facesList,oldRot
+    # Scale the leaf and then transform each of the vertices
+    (m0,m1,m2) = leafMat
+    sx = leafScaleX*leafScale
+    for (x,y,z) in verts:
+        x *= sx
+        z *= leafScale
+        leafVerts.extend((m0[0]*x + m0[1]*y + m0[2]*z + loc.x,
+                          m1[0]*x + m1[1]*y + m1[2]*z + loc.y,
+                          m2[0]*x + m2[1]*y + m2[2]*z + loc.z))
+    return oldRot
 
 def addTree(props):
     global splitError
@@ -489,6 +530,10 @@ def addTree(props):
     cu.fill_mode = 'FULL'
     cu.bevel_depth = bevelDepth
     cu.bevel_resolution = bevelRes
+    cu.resolution_u = resU
+
+    # The stems are grown in treeCu and written to cu level by level
+    treeCu = treeCurve()
 
     # Fix the scale of the tree now
     scaleVal = scale + uniform(-scaleV,scaleV)
@@ -526,8 +571,8 @@ def addTree(props):
             newPoint.co = Vector((0,scaleVal*pruneWidth*shapeRatio(8,ratioVal,pruneWidthPeak,prunePowerHigh,prunePowerLow),zVal))
             (newPoint.handle_right_type,newPoint.handle_left_type) = (enHandle,enHandle)
 
-    leafVerts = []
-    leafFaces = []
+    leafVerts = array('f')
+    leafFaces = array('i')
     levelCount = []
 
     splineToBone = deque([''])
@@ -545,8 +590,7 @@ def addTree(props):
         # If this is the first level of growth (the trunk) then we need some special work to begin the tree
         if n == 0:
             vertAtt = 0.0
-            newSpline = cu.splines.new('BEZIER')
-            cu.resolution_u = resU
+            newSpline = treeCu.splines.new('BEZIER')
             newPoint = newSpline.bezier_points[-1]
             newPoint.co = Vector((0,0,0))
             newPoint.handle_right = Vector((0,0,1))
@@ -565,8 +609,7 @@ def addTree(props):
             # For each of the points defined in the list of stem starting points we need to grow a stem.
             for p in childP:
                 # Add a spline and set the coordinate of the first point.
-                newSpline = cu.splines.new('BEZIER')
-                cu.resolution_u = resU
+                newSpline = treeCu.splines.new('BEZIER')
                 newPoint = newSpline.bezier_points[-1]
                 newPoint.co = p.co
                 tempPos = zAxis.copy()
@@ -616,10 +659,12 @@ def addTree(props):
                 else:
                     curveVal = 2*curve[n]/curveRes[n]
                 # Add the new stem to list of stems to grow and define which bone it will be parented to
-                addstem(stemSpline(newSpline,curveVal,curveV[n]/curveRes[n],0,curveRes[n],branchL/curveRes[n],childStems,startRad,endRad,len(cu.splines)-1))
+                addstem(stemSpline(newSpline,curveVal,curveV[n]/curveRes[n],0,curveRes[n],branchL/curveRes[n],childStems,startRad,endRad,len(treeCu.splines)-1))
                 addsplinetobone(p.parBone)
 
         childP = []
+        # The stems which sprout child points, these are found once the whole level is written to the curve
+        sprouts = []
         # Now grow each of the stems in the list of those to be extended
         for st in stemList:
             # When using pruning, we need to ensure that the random effects will be the same for each iteration to make sure the problem is linear.
@@ -655,8 +700,8 @@ def addTree(props):
                 # To prevent millions of splines being created we delete any old ones and replace them with only their first points to begin the spline again
                 if deleteSpline:
                     for x in splineList:
-                        cu.splines.remove(x.spline)
-                    newSpline = cu.splines.new('BEZIER')
+                        treeCu.splines.remove(x.spline)
+                    newSpline = treeCu.splines.new('BEZIER')
                     newPoint = newSpline.bezier_points[-1]
                     newPoint.co = originalCo
                     newPoint.handle_right = originalHandleR
@@ -725,10 +770,10 @@ def addTree(props):
                         trimNum = int(baseSize*(len(tVals)+1))
                         tVals = tVals[trimNum:]
 
-                    # For all the splines, we interpolate them and add the new points to the list of child points
+                    # For all the splines, we will interpolate them and add the new points to the list of child points
                     for s in splineList:
                         #print(str(n)+'level: ',s.segMax*s.segL)
-                        childP.extend(interpStem(s,tVals,s.segMax*s.segL,s.radS))
+                        sprouts.append((s,tVals,s.segMax*s.segL,s.radS))
 
                 # Force the splines to be deleted
                 deleteSpline = True
@@ -736,6 +781,11 @@ def addTree(props):
                 if not prune:
                     startPrune = False
 
+        # Write the stems of this level and find the child points along them
+        treeCu.write(cu)
+        for (s,tVals,lPar,parRad) in sprouts:
+            childP.extend(interpStem(s,tVals,lPar,parRad))
+
         levelCount.append(len(cu.splines))
         # If we need to add leaves, we do it here
         if (storeN == levels-1) and leaves:
@@ -747,32 +797,36 @@ def addTree(props):
                 if leaves < 0:
                     oldRot = -rotate[n]/2
                     for g in range(abs(leaves)):
-                        (vertTemp,faceTemp,oldRot) = genLeafMesh(leafScale,leafScaleX,cp.co,cp.quat,len(leafVerts),downAngle[n],downAngleV[n],rotate[n],rotateV[n],oldRot,bend,leaves, leafShape)
-                        leafVerts.extend(vertTemp)
-                        leafFaces.extend(faceTemp)
+                        oldRot = genLeafMesh(leafScale,leafScaleX,cp.co,cp.quat,downAngle[n],downAngleV[n],rotate[n],rotateV[n],oldRot,bend,leaves,leafShape,leafVerts)
                 # Otherwise just add the leaves like splines.
                 else:
-                    (vertTemp,faceTemp,oldRot) = genLeafMesh(leafScale,leafScaleX,cp.co,cp.quat,len(leafVerts),downAngle[n],downAngleV[n],rotate[n],rotateV[n],oldRot,bend,leaves, leafShape)
-                    leafVerts.extend(vertTemp)
-                    leafFaces.extend(faceTemp)
-            # Create the leaf mesh and object, add geometry using from_pydata, edges are currently added by validating the mesh which isn't great
+                    oldRot = genLeafMesh(leafScale,leafScaleX,cp.co,cp.quat,downAngle[n],downAngleV[n],rotate[n],rotateV[n],oldRot,bend,leaves,leafShape,leafVerts)
+            # Create the leaf mesh and object, all leaves share the same faces so these can be added in one go
+            (shapeVerts,shapeFaces) = leafGeom[leafShape]
+            numLeaves = len(leafVerts)//(3*len(shapeVerts))
+            for i in range(numLeaves):
+                index = i*len(shapeVerts)
+                for f in shapeFaces:
+                    leafFaces.extend([v + index for v in f])
+            numFaces = numLeaves*len(shapeFaces)
             leafMesh = bpy.data.meshes.new('leaves')
             leafObj = bpy.data.objects.new('leaves',leafMesh)
             bpy.context.scene.objects.link(leafObj)
             leafObj.parent = treeOb
-            leafMesh.from_pydata(leafVerts,(),leafFaces)
+            leafMesh.vertices.add(len(leafVerts)//3)
+            leafMesh.vertices.foreach_set('co',leafVerts)
+            leafMesh.loops.add(len(leafFaces))
+            leafMesh.loops.foreach_set('vertex_index',leafFaces)
+            leafMesh.polygons.add(numFaces)
+            leafMesh.polygons.foreach_set('loop_start',range(0,len(leafFaces),4))
+            leafMesh.polygons.foreach_set('loop_total',[4]*numFaces)
 
             if leafShape == 'rect':
                 leafMesh.uv_textures.new("leafUV")
                 uvlayer = leafMesh.uv_layers.active.data
+                uvlayer.foreach_set('uv',[1,0, 1,1, 1 - leafScaleX,1, 1 - leafScaleX,0]*numFaces)
 
-                for i in range(0, len(leafFaces)):
-                    uvlayer[i*4 + 0].uv = Vector((1, 0))
-                    uvlayer[i*4 + 1].uv = Vector((1, 1))
-                    uvlayer[i*4 + 2].uv = Vector((1 - leafScaleX, 1))
-                    uvlayer[i*4 + 3].uv = Vector((1 - leafScaleX, 0))
-
-            leafMesh.validate()
+            leafMesh.update(calc_edges=True)
 
 # This can be used if we need particle leaves
 #            if (storeN == levels-1) and leaves:
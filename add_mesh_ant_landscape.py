@@ -93,75 +93,6 @@ def create_mesh_object(context, verts, edges, faces, name):
     from bpy_extras import object_utils
     return object_utils.object_data_add(context, mesh, operator=None)
 
-# A very simple "bridge" tool.
-# Connects two equally long vertex rows with faces.
-# Returns a list of the new faces (list of  lists)
-#
-# vertIdx1 ... First vertex list (list of vertex indices).
-# vertIdx2 ... Second vertex list (list of vertex indices).
-# closed ... Creates a loop (first & last are closed).
-# flipped ... Invert the normal of the face(s).
-#
-# Note: You can set vertIdx1 to a single vertex index to create
-#    a fan/star of faces.
-# Note: If both vertex idx list are the same length they have
-#    to have at least 2 vertices.
-def createFaces(vertIdx1, vertIdx2, closed=False, flipped=False):
-    faces = []
-
-    if not vertIdx1 or not vertIdx2:
-        return None
-
-    if len(vertIdx1) < 2 and len(vertIdx2) < 2:
-        return None
-
-    fan = False
-    if (len(vertIdx1) != len(vertIdx2)):
-        if (len(vertIdx1) == 1 and len(vertIdx2) > 1):
-            fan = True
-        else:
-            return None
-
-    total = len(vertIdx2)
-
-    if closed:
-        # Bridge the start with the end.
-        if flipped:
-            face = [
-                vertIdx1[0],
-                vertIdx2[0],
-                vertIdx2[total - 1]]
-            if not fan:
-                face.append(vertIdx1[total - 1])
-            faces.append(face)
-
-        else:
-            face = [vertIdx2[0], vertIdx1[0]]
-            if not fan:
-                face.append(vertIdx1[total - 1])
-            face.append(vertIdx2[total - 1])
-            faces.append(face)
-
-    # Bridge the rest of the faces.
-    for num in range(total - 1):
-        if flipped:
-            if fan:
-                face = [vertIdx2[num], vertIdx1[0], vertIdx2[num + 1]]
-            else:
-                face = [vertIdx2[num], vertIdx1[num],
-                    vertIdx1[num + 1], vertIdx2[num + 1]]
-            faces.append(face)
-        else:
-            if fan:
-                face = [vertIdx1[0], vertIdx2[num], vertIdx2[num + 1]]
-            else:
-                face = [vertIdx1[num], vertIdx2[num],
-                    vertIdx2[num + 1], vertIdx1[num + 1]]
-            faces.append(face)
-
-    return faces
-
-
 ###------------------------------------------------------------
 ###------------------------------------------------------------
 # some functions for marble_noise
@@ -263,6 +194,13 @@ def strata_hterrain( x,y,z, H, lacunarity, octaves, offset, distort, basis ):
 ###------------------------------------------------------------
 # landscape_gen
 def landscape_gen(x,y,z,falloffsize,options=[0,1.0,1, 0,0,1.0,0,6,1.0,2.0,1.0,2.0,0,0,0, 1.0,0.0,1,0.0,1.0,0,0,0]):
+    # single vertex, see landscape_heights() for many
+    return landscape_heights( [(x,y,z)], falloffsize, options )[0]
+
+
+# landscape_heights: height values for a list of (x,y,z) coordinates.
+# The options are parsed once and each stage runs over all the coordinates.
+def landscape_heights(coords,falloffsize,options):
 
     # options
     rseed    = options[0]
@@ -304,127 +242,189 @@ def landscape_gen(x,y,z,falloffsize,options=[0,1.0,1, 0,0,1.0,0,6,1.0,2.0,1.0,2.
         origin_y = ( 0.5 - origin[1] ) * 1000.0
         origin_z = ( 0.5 - origin[2] ) * 1000.0
 
-    # adjust noise size and origin
-    ncoords = ( x / nsize + origin_x, y / nsize + origin_y, z / nsize + origin_z )
-
     # noise basis type's
     if nbasis == 9: nbasis = 14  # to get cellnoise basis you must set 14 instead of 9
     if vlbasis ==9: vlbasis = 14
+
     # noise type's
-    if ntype == 0:   value = multi_fractal(        ncoords, dimension, lacunarity, depth, nbasis ) * 0.5
-    elif ntype == 1: value = ridged_multi_fractal( ncoords, dimension, lacunarity, depth, offset, gain, nbasis ) * 0.5
-    elif ntype == 2: value = hybrid_multi_fractal( ncoords, dimension, lacunarity, depth, offset, gain, nbasis ) * 0.5
-    elif ntype == 3: value = hetero_terrain(       ncoords, dimension, lacunarity, depth, offset, nbasis ) * 0.25
-    elif ntype == 4: value = fractal(              ncoords, dimension, lacunarity, depth, nbasis )
-    elif ntype == 5: value = turbulence_vector(    ncoords, depth, hardnoise, nbasis )[0]
-    elif ntype == 6: value = variable_lacunarity(            ncoords, distortion, nbasis, vlbasis ) + 0.5
-    elif ntype == 7: value = marble_noise( x*2.0/falloffsize,y*2.0/falloffsize,z*2/falloffsize, origin, nsize, marbleshape, marblebias, marblesharpnes, distortion, depth, hardnoise, nbasis )
-    elif ntype == 8: value = shattered_hterrain( ncoords[0], ncoords[1], ncoords[2], dimension, lacunarity, depth, offset, distortion, nbasis )
-    elif ntype == 9: value = strata_hterrain( ncoords[0], ncoords[1], ncoords[2], dimension, lacunarity, depth, offset, distortion, nbasis )
+    if ntype == 7:
+        values = [ marble_noise( x*2.0/falloffsize,y*2.0/falloffsize,z*2/falloffsize, origin, nsize, marbleshape, marblebias, marblesharpnes, distortion, depth, hardnoise, nbasis ) for x,y,z in coords ]
     else:
-        value = 0.0
+        # adjust noise size and origin
+        ncoords = [ ( x / nsize + origin_x, y / nsize + origin_y, z / nsize + origin_z ) for x,y,z in coords ]
+
+        if ntype == 0:   values = [ multi_fractal(        nc, dimension, lacunarity, depth, nbasis ) * 0.5 for nc in ncoords ]
+        elif ntype == 1: values = [ ridged_multi_fractal( nc, dimension, lacunarity, depth, offset, gain, nbasis ) * 0.5 for nc in ncoords ]
+        elif ntype == 2: values = [ hybrid_multi_fractal( nc, dimension, lacunarity, depth, offset, gain, nbasis ) * 0.5 for nc in ncoords ]
+        elif ntype == 3: values = [ hetero_terrain(       nc, dimension, lacunarity, depth, offset, nbasis ) * 0.25 for nc in ncoords ]
+        elif ntype == 4: values = [ fractal(              nc, dimension, lacunarity, depth, nbasis ) for nc in ncoords ]
+        elif ntype == 5: values = [ turbulence_vector(    nc, depth, hardnoise, nbasis )[0] for nc in ncoords ]
+        elif ntype == 6: values = [ variable_lacunarity(            nc, distortion, nbasis, vlbasis ) + 0.5 for nc in ncoords ]
+        elif ntype == 8: values = [ shattered_hterrain( nc[0], nc[1], nc[2], dimension, lacunarity, depth, offset, distortion, nbasis ) for nc in ncoords ]
+        elif ntype == 9: values = [ strata_hterrain( nc[0], nc[1], nc[2], dimension, lacunarity, depth, offset, distortion, nbasis ) for nc in ncoords ]
+        else:
+            values = [0.0] * len(coords)
+        del ncoords
 
     # adjust height
     if invert !=0:
-        value = (1-value) * height + heightoffset
+        values = [ (1-value) * height + heightoffset for value in values ]
     else:
-        value = value * height + heightoffset
+        values = [ value * height + heightoffset for value in values ]
 
     # edge falloff
     if sphere == 0: # no edge falloff if spherical
         if falloff != 0:
-            fallofftypes = [ 0, sqrt((x*x)**2+(y*y)**2), sqrt(x*x+y*y), sqrt(y*y), sqrt(x*x) ]
-            dist = fallofftypes[ falloff]
+            if falloff == 1:   dists = [ sqrt((x*x)**2+(y*y)**2) for x,y,z in coords ]
+            elif falloff == 2: dists = [ sqrt(x*x+y*y) for x,y,z in coords ]
+            elif falloff == 3: dists = [ sqrt(y*y) for x,y,z in coords ]
+            else:              dists = [ sqrt(x*x) for x,y,z in coords ]
             if falloff ==1:
                 radius = (falloffsize/2)**2
             else:
                 radius = falloffsize/2
-            value = value - sealevel
-            if( dist < radius ):
-                dist = dist / radius
-                dist = ( (dist) * (dist) * ( 3-2*(dist) ) )
-                value = ( value - value * dist ) + sealevel
-            else:
-                value = sealevel
+            for i, dist in enumerate(dists):
+                if( dist < radius ):
+                    value = values[i] - sealevel
+                    dist = dist / radius
+                    dist = ( (dist) * (dist) * ( 3-2*(dist) ) )
+                    values[i] = ( value - value * dist ) + sealevel
+                else:
+                    values[i] = sealevel
+            del dists
 
     # strata / terrace / layered
     if stratatype !='0':
         strata = strata / height
     if stratatype == '1':
         strata *= 2
-        steps = ( sin( value*strata*pi ) * ( 0.1/strata*pi ) )
-        value = ( value * (1.0-0.5) + steps*0.5 ) * 2.0
+        values = [ ( value * (1.0-0.5) + ( sin( value*strata*pi ) * ( 0.1/strata*pi ) )*0.5 ) * 2.0 for value in values ]
     elif stratatype == '2':
-        steps = -abs( sin( value*(strata)*pi ) * ( 0.1/(strata)*pi ) )
-        value =( value * (1.0-0.5) + steps*0.5 ) * 2.0 
+        values = [ ( value * (1.0-0.5) + -abs( sin( value*(strata)*pi ) * ( 0.1/(strata)*pi ) )*0.5 ) * 2.0 for value in values ]
     elif stratatype == '3':
-        steps = abs( sin( value*(strata)*pi ) * ( 0.1/(strata)*pi ) )
-        value =( value * (1.0-0.5) + steps*0.5 ) * 2.0
-    else:
-        value = value
+        values = [ ( value * (1.0-0.5) + abs( sin( value*(strata)*pi ) * ( 0.1/(strata)*pi ) )*0.5 ) * 2.0 for value in values ]
 
     # clamp height
-    if ( value < sealevel ): value = sealevel
-    if ( value > platlevel ): value = platlevel
+    values = [ min( max( value, sealevel ), platlevel ) for value in values ]
 
-    return value
+    return values
+
+
+# faces of a rows x columns vertex grid, bridging each row to the next
+def grid_faces( rows, columns ):
+    return [ ( i, i+columns, i+columns+1, i+1 )
+             for row_x in range(rows-1)
+             for i in range(row_x*columns, row_x*columns+columns-1) ]
 
 
 # generate grid
 def grid_gen( sub_d, size_me, options ):
 
-    verts = []
-    faces = []
-    edgeloop_prev = []
+    delta = size_me / float(sub_d - 1)
+    start = -(size_me / 2.0)
+
+    coords = [ ( start + row_x * delta, start + row_y * delta, 0.0 )
+               for row_x in range(sub_d)
+               for row_y in range(sub_d) ]
+    heights = landscape_heights( coords, size_me, options )
+    verts = [ (x,y,z) for (x,y,_), z in zip(coords, heights) ]
+
+    return verts, grid_faces( sub_d, sub_d )
+
+
+# tiled grid: vertex index ranges of tiles along one side,
+# neighbor tiles share their border vertices.
+def grid_tile_ranges( sub_d, tiles ):
+    tiles = max( 1, min( tiles, sub_d - 1 ) )
+    bounds = [ ( i * (sub_d - 1) ) // tiles for i in range(tiles + 1) ]
+    return [ ( bounds[i], bounds[i+1] + 1 ) for i in range(tiles) ]
+
+
+# heights of one tile, runs in worker processes
+def grid_tile_heights( tile ):
+    from array import array
+    sub_d, size_me, options, x_range, y_range = tile
 
     delta = size_me / float(sub_d - 1)
     start = -(size_me / 2.0)
 
-    for row_x in range(sub_d):
-        edgeloop_cur = []
-        x = start + row_x * delta
-        for row_y in range(sub_d):
-            y = start + row_y * delta
-            z = landscape_gen(x,y,0.0,size_me,options)
+    coords = [ ( start + row_x * delta, start + row_y * delta, 0.0 )
+               for row_x in range(*x_range)
+               for row_y in range(*y_range) ]
+    return array( 'd', landscape_heights( coords, size_me, options ) )
 
-            edgeloop_cur.append(len(verts))
-            verts.append((x,y,z))
 
-        if len(edgeloop_prev) > 0:
-            faces_row = createFaces(edgeloop_prev, edgeloop_cur)
-            faces.extend(faces_row)
+# generate grid in tiles, the tiles are calculated in a pool of
+# processes (0 for one per CPU). The pool forks Blender, which isn't safe
+# for the user interface, so it's only used on Linux or in background mode.
+# Heights only depend on the vertex location, so tiles match at borders.
+# Returns a list of (verts, faces), one per tile with tile_objects,
+# otherwise a single grid the same as grid_gen() makes.
+def grid_gen_tiled( sub_d, size_me, options, tiles, processes=1, tile_objects=False ):
+    import os
+    import sys
 
-        edgeloop_prev = edgeloop_cur
+    delta = size_me / float(sub_d - 1)
+    start = -(size_me / 2.0)
 
-    return verts, faces
+    ranges = grid_tile_ranges( sub_d, tiles )
+    jobs = [ ( sub_d, size_me, options, x_range, y_range )
+             for x_range in ranges
+             for y_range in ranges ]
+
+    if ( processes != 1 and len(jobs) > 1 and hasattr(os, "fork") and
+         ( sys.platform.startswith("linux") or bpy.app.background ) ):
+        import multiprocessing
+        pool = multiprocessing.Pool( processes or None )
+        try:
+            results = pool.map( grid_tile_heights, jobs )
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [ grid_tile_heights( job ) for job in jobs ]
+
+    if tile_objects:
+        meshes = []
+        for ( _, _, _, x_range, y_range ), heights in zip(jobs, results):
+            coords = [ ( start + row_x * delta, start + row_y * delta )
+                       for row_x in range(*x_range)
+                       for row_y in range(*y_range) ]
+            verts = [ (x,y,z) for (x,y), z in zip(coords, heights) ]
+            faces = grid_faces( x_range[1] - x_range[0], y_range[1] - y_range[0] )
+            meshes.append( (verts, faces) )
+        return meshes
+
+    # stitch the tiles into one grid
+    verts = [None] * (sub_d * sub_d)
+    for ( _, _, _, x_range, y_range ), heights in zip(jobs, results):
+        heights = iter(heights)
+        for row_x in range(*x_range):
+            x = start + row_x * delta
+            for row_y in range(*y_range):
+                verts[row_x * sub_d + row_y] = ( x, start + row_y * delta, next(heights) )
+
+    return [ (verts, grid_faces( sub_d, sub_d )) ]
 
 
 # generate sphere
 def sphere_gen( sub_d, size_me, options ):
 
-    verts = []
-    faces = []
-    edgeloop_prev = []
-
+    coords = []
     for row_x in range(sub_d):
-        edgeloop_cur = []
         for row_y in range(sub_d):
             u = sin(row_y*pi*2/(sub_d-1)) * cos(-pi/2+row_x*pi/(sub_d-1)) * size_me/2
             v = cos(row_y*pi*2/(sub_d-1)) * cos(-pi/2+row_x*pi/(sub_d-1)) * size_me/2
             w = sin(-pi/2+row_x*pi/(sub_d-1)) * size_me/2
-            h = landscape_gen(u,v,w,size_me,options) / size_me
-            u,v,w = u+u*h, v+v*h, w+w*h
+            coords.append( (u, v, w) )
+    heights = landscape_heights( coords, size_me, options )
 
-            edgeloop_cur.append(len(verts))
-            verts.append((u, v, w))
-
-        if len(edgeloop_prev) > 0:
-            faces_row = createFaces(edgeloop_prev, edgeloop_cur)
-            faces.extend(faces_row)
-
-        edgeloop_prev = edgeloop_cur
+    verts = []
+    for (u,v,w), h in zip(coords, heights):
+        h = h / size_me
+        verts.append( (u+u*h, v+v*h, w+w*h) )
 
-    return verts, faces
+    return verts, grid_faces( sub_d, sub_d )
 
 
 ###------------------------------------------------------------
@@ -451,7 +451,8 @@ class landscape_add(bpy.types.Operator):
 
     Subdivision = IntProperty(name="Subdivisions",
                 min=4,
-                max=6400,
+                max=16384,
+                soft_max=6400,
                 default=64,
                 description="Mesh x y subdivisions")
 
@@ -461,6 +462,22 @@ class landscape_add(bpy.types.Operator):
                 default=2.0,
                 description="Mesh size")
 
+    Tiles = IntProperty(name="Tiles",
+                min=1,
+                max=64,
+                default=1,
+                description="Generate the grid in tiles x tiles parts, calculated in parallel")
+
+    TileObjects = BoolProperty(name="Tile Objects",
+                default=False,
+                description="Create an object for every tile (tiles share their border vertices)")
+
+    Processes = IntProperty(name="Processes",
+                min=0,
+                max=256,
+                default=1,
+                description="Number of processes to calculate tiles with, 0 for one per CPU (Linux or background mode only)")
+
     RandomSeed = IntProperty(name="Random Seed",
                 min=0,
                 max=9999,
@@ -652,6 +669,11 @@ class landscape_add(bpy.types.Operator):
         box.prop(self, 'SmoothMesh')
         box.prop(self, 'Subdivision')
         box.prop(self, 'MeshSize')
+        if self.SphereMesh == False:
+            box.prop(self, 'Tiles')
+            if self.Tiles > 1:
+                box.prop(self, 'TileObjects')
+                box.prop(self, 'Processes')
 
         box = layout.box()
         box.prop(self, 'NoiseType')
@@ -768,28 +790,33 @@ class landscape_add(bpy.types.Operator):
             # Main function
             if self.SphereMesh !=0:
                 # sphere
-                verts, faces = sphere_gen( self.Subdivision, self.MeshSize, options )
+                meshes = [ sphere_gen( self.Subdivision, self.MeshSize, options ) ]
+            elif self.Tiles > 1:
+                # grid, in tiles
+                meshes = grid_gen_tiled( self.Subdivision, self.MeshSize, options,
+                                         self.Tiles, self.Processes, self.TileObjects )
             else:
                 # grid
-                verts, faces = grid_gen( self.Subdivision, self.MeshSize, options )
-
-            # create mesh object
-            obj = create_mesh_object(context, verts, [], faces, "Landscape")
-            bpy.ops.object.mode_set(mode='EDIT')
-            bpy.ops.mesh.normals_make_consistent(inside=False)
-            bpy.ops.object.mode_set(mode='OBJECT')
-            # sphere, remove doubles
-            if self.SphereMesh !=0:
+                meshes = [ grid_gen( self.Subdivision, self.MeshSize, options ) ]
+
+            for verts, faces in meshes:
+                # create mesh object
+                obj = create_mesh_object(context, verts, [], faces, "Landscape")
                 bpy.ops.object.mode_set(mode='EDIT')
-                bpy.ops.mesh.remove_doubles(threshold=0.0001)
+                bpy.ops.mesh.normals_make_consistent(inside=False)
                 bpy.ops.object.mode_set(mode='OBJECT')
-
-            # Shade smooth
-            if self.SmoothMesh !=0:
-                if bpy.ops.object.shade_smooth.poll():
-                    bpy.ops.object.shade_smooth()
-                else: # edit mode
-                    bpy.ops.mesh.faces_shade_smooth()
+                # sphere, remove doubles
+                if self.SphereMesh !=0:
+                    bpy.ops.object.mode_set(mode='EDIT')
+                    bpy.ops.mesh.remove_doubles(threshold=0.0001)
+                    bpy.ops.object.mode_set(mode='OBJECT')
+
+                # Shade smooth
+                if self.SmoothMesh !=0:
+                    if bpy.ops.object.shade_smooth.poll():
+                        bpy.ops.object.shade_smooth()
+                    else: # edit mode
+                        bpy.ops.mesh.faces_shade_smooth()
 
             # restore pre operator undo state
             bpy.context.user_preferences.edit.use_global_undo = undo
@@ -57,12 +57,17 @@ def simplypoly(splineVerts, options):
     dis_error = options[6] # additional distance error
 
     # get curvatures per vert
+    # the derivatives are always taken at the same t, so the bernstein
+    # coefficients are the same for every window
+    t = 1/(order-1)
+    coeffs1 = getBernstein(0, t)
+    coeffs2 = getBernstein(1, t)
     for i, point in enumerate(points[:-(order-1)]):
         BVerts = points[i:i+order]
-        for b, BVert in enumerate(BVerts[1:-1]):
-            deriv1 = getDerivative(BVerts, 1/(order-1), order-1)
-            deriv2 = getDerivative(BVerts, 1/(order-1), order-2)
-            curva = getCurvature(deriv1, deriv2)
+        deriv1 = getDerivative(BVerts, t, order-1, coeffs1)
+        deriv2 = getDerivative(BVerts, t, order-2, coeffs2)
+        curva = getCurvature(deriv1, deriv2)
+        for b in range(len(BVerts)-2):
             pointCurva[i+b+1].append(curva)
 
     # average the curvatures
@@ -101,8 +106,13 @@ def binom(n, m):
             j-= 1
     return b[m]
 
+# get the bernstein polynomials of degree n at t
+def getBernstein(n, t):
+    return [binom(n, i) * math.pow(t, i) * math.pow(1-t, n-i)
+            for i in range(n+1)]
+
 # get nth derivative of order(len(verts)) bezier curve
-def getDerivative(verts, t, nth):
+def getDerivative(verts, t, nth, coeffs=None):
     order = len(verts) - 1 - nth
     QVerts = []
 
@@ -117,13 +127,16 @@ def getDerivative(verts, t, nth):
     else:
         QVerts = verts
 
+    if coeffs is None:
+        coeffs = getBernstein(order, t)
+
     if len(verts[0]) == 3:
         point = mathutils.Vector((0, 0, 0))
     if len(verts[0]) == 2:
         point = mathutils.Vector((0, 0))
 
-    for i, vert in enumerate(QVerts):
-        point += binom(order, i) * math.pow(t, i) * math.pow(1-t, order-i) * vert
+    for coeff, vert in zip(coeffs, QVerts):
+        point += coeff * vert
     deriv = point
 
     return deriv
@@ -149,43 +162,39 @@ def altitude(point1, point2, pointn):
     if edge1.length == 0:
         altitude = edge2.length
         return altitude
-    alpha = edge1.angle(edge2)
-    altitude = math.sin(alpha) * edge2.length
+    altitude = edge1.cross(edge2).length / edge1.length
     return altitude
 
-# iterate through verts
-def iterate(points, newVerts, error):
-    new = []
-    for newIndex in range(len(newVerts)-1):
-        bigVert = 0
-        alti_store = 0
-        for i, point in enumerate(points[newVerts[newIndex]+1:newVerts[newIndex+1]]):
-            alti = altitude(points[newVerts[newIndex]], points[newVerts[newIndex+1]], point)
-            if alti > alti_store:
-                alti_store = alti
-                if alti_store >= error:
-                    bigVert = i+1+newVerts[newIndex]
-        if bigVert:
-            new.append(bigVert)
-    if new == []:
-        return False
-    return new
-
 #### get SplineVertIndices to keep
 def simplify_RDP(splineVerts, options):
     #main vars
     error = options[4]
 
-    # set first and last vert
-    newVerts = [0, len(splineVerts)-1]
+    # first and last vert are always kept
+    if len(splineVerts) < 2:
+        return [0, len(splineVerts)-1]
+    keep = [False] * len(splineVerts)
+    keep[0] = keep[-1] = True
+
+    # split the segments on their farthest vert until within the error,
+    # every segment is only scanned once
+    stack = [(0, len(splineVerts)-1)]
+    while stack:
+        first, last = stack.pop()
+        bigVert = 0
+        alti_store = 0
+        for i in range(first+1, last):
+            alti = altitude(splineVerts[first], splineVerts[last],
+                            splineVerts[i])
+            if alti > alti_store:
+                alti_store = alti
+                bigVert = i
+        if bigVert and alti_store >= error:
+            keep[bigVert] = True
+            stack.append((first, bigVert))
+            stack.append((bigVert, last))
 
-    # iterate through the points
-    new = 1
-    while new != False:
-        new = iterate(splineVerts, newVerts, error)
-        if new:
-            newVerts += new
-            newVerts.sort()
+    newVerts = [i for i, k in enumerate(keep) if k]
     return newVerts
 
 ##########################
@@ -314,17 +323,51 @@ def selectedfcurves(obj):
             fcurves_sel.append(fc)
     return fcurves_sel
 
+## replace the keyframes of a fcurve by points,
+## the keys at the original indices are kept (with their settings)
+def setFcurvePoints(fcurve, points, indices):
+    keyframes = fcurve.keyframe_points
+    # the fcurve is rewritten in place (keeping its place in the action,
+    # its settings and modifiers), all arrays at once as removing and
+    # inserting keyframes one at a time is slow on long (mocap) fcurves
+    handles = {}
+    for attr in ('handle_left', 'handle_right'):
+        values = [0.0] * (len(keyframes) * 2)
+        keyframes.foreach_get(attr, values)
+        handles[attr] = [c for i in indices for c in values[i * 2:i * 2 + 2]]
+    attrs = [attr for attr in ('interpolation', 'easing', 'type',
+                               'handle_left_type', 'handle_right_type')
+             if hasattr(keyframes[0], attr)]
+    settings = [[getattr(keyframes[i], attr) for attr in attrs]
+                for i in indices]
+
+    # remove the surplus keys from the end
+    for i in range(len(keyframes) - len(points)):
+        keyframes.remove(keyframes[-1])
+
+    co = []
+    for v in points:
+        co += (v[0], v[1])
+    keyframes.foreach_set('co', co)
+    for keyframe, values in zip(keyframes, settings):
+        for attr, value in zip(attrs, values):
+            setattr(keyframe, attr, value)
+    for attr, values in handles.items():
+        keyframes.foreach_set(attr, values)
+    fcurve.update()
+    return fcurve
+
 ###########################################################
 ## fCurves Main
 def fcurves_simplify(context, obj, options, fcurves):
     # main vars
     mode = options[0]
 
-    #get indices of selected fcurves
+    #get selected fcurves, all of them are simplified in one go
     fcurve_sel = selectedfcurves(obj)
-    
+
     # go through fcurves
-    for fcurve_i, fcurve in enumerate(fcurves):
+    for fcurve, fc in zip(fcurves, fcurve_sel):
         # test if fcurve is long enough
         if len(fcurve) >= 7:
 
@@ -335,20 +378,14 @@ def fcurves_simplify(context, obj, options, fcurves):
             if mode == 'curvature':
                 newVerts = simplypoly(fcurve, options)
 
+            # the keys are rewritten in place, each one only once
+            newVerts = sorted(set(newVerts))
+
             # convert indices into vectors3D
-            newPoints = []
-        
-            #this is different from the main() function for normal curves, different api...
-            for v in newVerts:
-                newPoints.append(fcurve[v])
-            
-            #remove all points from curve first
-            for i in range(len(fcurve)-1,0,-1):
-                fcurve_sel[fcurve_i].keyframe_points.remove(fcurve_sel[fcurve_i].keyframe_points[i])
+            newPoints = [fcurve[v] for v in newVerts]
+
             # put newPoints into fcurve
-            for v in newPoints:
-                fcurve_sel[fcurve_i].keyframe_points.insert(frame=v[0],value=v[1])
-            #fcurve.points.foreach_set('co', newPoints)
+            setFcurvePoints(fc, newPoints, newVerts)
     return
 
 #################################################
@@ -37,8 +37,10 @@ bl_info = {
 
 
 import re
+import time
 import bpy
 from mathutils import Vector, Matrix
+from keyframe_utils import KeyframeWriter, ensure_action
 from math import radians, degrees
 from bpy.props import (StringProperty,
                        BoolProperty,
@@ -289,6 +291,7 @@ class StructureBuilder(DataStructure):
         self.fno = 1  # default Blender scene start frame
         self.use_frame_no = use_frame_no
         self.motion = iter(self.scan_motion_capture(filename, frame_skip))
+        self.keys = KeyframeWriter(ensure_action(self.object))
 
     def apply_next_frame(self):
         try:
@@ -300,13 +303,19 @@ class StructureBuilder(DataStructure):
         for name, w, l in bones:
             b, P, Pi = self.rest[name]
             if name == 'root':
-                b.location = w.to_translation()
-                b.keyframe_insert('location', -1, regframe, name)
+                self.keys.add(b.path_from_id('location'), regframe,
+                              w.to_translation(), name)
             T = Pi * l.to_3x3() * P
-            b.rotation_quaternion = T.to_quaternion()
-            b.keyframe_insert('rotation_quaternion', -1, regframe, name)
+            self.keys.add(b.path_from_id('rotation_quaternion'), regframe,
+                          T.to_quaternion(), name)
         return True
 
+    def write_keyframes(self):
+        """
+            Write the keyframes collected by apply_next_frame
+        """
+        self.keys.write()
+
 
 class AsfImporter(bpy.types.Operator):
     #
@@ -380,13 +389,17 @@ class AmcAnimator(bpy.types.Operator):
 
     sb = None
     timer = None
+    # seconds of frame decoding per timer event, keeps the UI responsive
+    time_slice = 0.1
 
     def modal(self, context, event):
         if event.type == 'ESC':
             return self.cancel(context)
         if event.type == 'TIMER':
-            if not self.sb.apply_next_frame():
-                return self.cancel(context)
+            t_end = time.time() + self.time_slice
+            while time.time() < t_end:
+                if not self.sb.apply_next_frame():
+                    return self.cancel(context)
         return {'PASS_THROUGH'}
 
     def execute(self, context):
@@ -396,6 +409,7 @@ class AmcAnimator(bpy.types.Operator):
         return {'RUNNING_MODAL'}
 
     def cancel(self, context):
+        self.sb.write_keyframes()
         bpy.context.scene.frame_set(bpy.context.scene.frame_current)
         context.window_manager.event_timer_remove(self.timer)
         bpy.ops.object.mode_set(mode='OBJECT')
@@ -21,9 +21,11 @@
 # Script copyright (C) Campbell Barton
 
 from math import radians
+from array import array
 
 import bpy
 from mathutils import Vector, Euler, Matrix
+from keyframe_utils import KeyframeWriter
 
 
 class BVH_Node(object):
@@ -38,7 +40,7 @@ class BVH_Node(object):
         'channels',  # list of 6 ints, -1 for an unused channel, otherwise an index for the BVH motion data lines, loc triple then rot triple
         'rot_order',  # a triple of indices as to the order rotation is applied. [0,1,2] is x/y/z - [None, None, None] if no rotation.
         'rot_order_str',  # same as above but a string 'XYZ' format.
-        'anim_data',  # a list one tuple's one for each frame. (locx, locy, locz, rotx, roty, rotz), euler rotation ALWAYS stored xyz order, even when native used.
+        'anim_data',  # 6 arrays, one per channel (locx, locy, locz, rotx, roty, rotz) with a value for each frame, frame 0 being the rest pose. euler rotation ALWAYS stored xyz order, even when native used.
         'has_loc',  # Convenience function, bool, same as (channels[0]!=-1 or channels[1]!=-1 or channels[2]!=-1)
         'has_rot',  # Convenience function, bool, same as (channels[3]!=-1 or channels[4]!=-1 or channels[5]!=-1)
         'index',  # index from the file, not strictly needed but nice to maintain order
@@ -73,10 +75,10 @@ class BVH_Node(object):
 
         self.children = []
 
-        # list of 6 length tuples: (lx,ly,lz, rx,ry,rz)
+        # 6 channel arrays: (lx,ly,lz, rx,ry,rz), filled from the MOTION block
         # even if the channels aren't used they will just be zero
         #
-        self.anim_data = [(0, 0, 0, 0, 0, 0)]
+        self.anim_data = tuple(array('d', [0.0]) for i in range(6))
 
     def __repr__(self):
         return ('BVH name:"%s", rest_loc:(%.3f,%.3f,%.3f), rest_tail:(%.3f,%.3f,%.3f)' %
@@ -93,24 +95,27 @@ def sorted_nodes(bvh_nodes):
 
 def read_bvh(context, file_path, rotate_mode='XYZ', global_scale=1.0):
     # File loading stuff
-    # Open the file for importing
-    file = open(file_path, 'rU')
+    # Open the file for importing, universal newlines also handle
+    # non standard carrage returns.
+    file = open(file_path, 'r')
 
-    # Seperate into a list of lists, each line a list of words.
-    file_lines = file.readlines()
-    # Non standard carrage returns?
-    if len(file_lines) == 1:
-        file_lines = file_lines[0].split('\r')
+    # The hierarchy is parsed as a stream of lines, each line a list of words.
+    def read_lines():
+        for line in file:
+            words = line.split()
+            if words:
+                yield words
 
-    # Split by whitespace.
-    file_lines = [ll for ll in [l.split() for l in file_lines] if ll]
+    file_lines = read_lines()
 
     # Create hierarchy as empties
-    if file_lines[0][0].lower() == 'hierarchy':
+    words = next(file_lines, None)
+    if words and words[0].lower() == 'hierarchy':
         #print 'Importing the BVH Hierarchy for:', file_path
         pass
     else:
-        raise 'ERROR: This is not a BVH file'
+        file.close()
+        raise Exception("ERROR: This is not a BVH file")
 
     bvh_nodes = {None: None}
     bvh_nodes_serial = [None]
@@ -118,35 +123,30 @@ def read_bvh(context, file_path, rotate_mode='XYZ', global_scale=1.0):
 
     channelIndex = -1
 
-    lineIdx = 0  # An index for the file.
-    while lineIdx < len(file_lines) - 1:
+    for words in file_lines:
         #...
-        if file_lines[lineIdx][0].lower() == 'root' or file_lines[lineIdx][0].lower() == 'joint':
+        if words[0].lower() == 'root' or words[0].lower() == 'joint':
 
             # Join spaces into 1 word with underscores joining it.
-            if len(file_lines[lineIdx]) > 2:
-                file_lines[lineIdx][1] = '_'.join(file_lines[lineIdx][1:])
-                file_lines[lineIdx] = file_lines[lineIdx][:2]
-
             # MAY NEED TO SUPPORT MULTIPLE ROOTS HERE! Still unsure weather multiple roots are possible?
 
             # Make sure the names are unique - Object names will match joint names exactly and both will be unique.
-            name = file_lines[lineIdx][1]
+            name = '_'.join(words[1:])
 
             #print '%snode: %s, parent: %s' % (len(bvh_nodes_serial) * '  ', name,  bvh_nodes_serial[-1])
 
-            lineIdx += 2  # Increment to the next line (Offset)
-            rest_head_local = Vector((float(file_lines[lineIdx][1]), float(file_lines[lineIdx][2]), float(file_lines[lineIdx][3]))) * global_scale
-            lineIdx += 1  # Increment to the next line (Channels)
+            next(file_lines)  # Skip the bracket
+            words = next(file_lines)  # Offset
+            rest_head_local = Vector((float(words[1]), float(words[2]), float(words[3]))) * global_scale
+            words = next(file_lines)  # Channels
 
             # newChannel[Xposition, Yposition, Zposition, Xrotation, Yrotation, Zrotation]
             # newChannel references indices to the motiondata,
-            # if not assigned then -1 refers to the last value that will be added on loading at a value of zero, this is appended
-            # We'll add a zero value onto the end of the MotionDATA so this always refers to a value.
+            # if not assigned then -1, the channel is left at a value of zero on loading.
             my_channel = [-1, -1, -1, -1, -1, -1]
             my_rot_order = [None, None, None]
             rot_count = 0
-            for channel in file_lines[lineIdx][2:]:
+            for channel in words[2:]:
                 channel = channel.lower()
                 channelIndex += 1  # So the index points to the right channel
                 if channel == 'xposition':
@@ -169,8 +169,6 @@ def read_bvh(context, file_path, rotate_mode='XYZ', global_scale=1.0):
                     my_rot_order[rot_count] = 2
                     rot_count += 1
 
-            channels = file_lines[lineIdx][2:]
-
             my_parent = bvh_nodes_serial[-1]  # account for none
 
             # Apply the parents offset accumulatively
@@ -185,9 +183,10 @@ def read_bvh(context, file_path, rotate_mode='XYZ', global_scale=1.0):
             bvh_nodes_serial.append(bvh_node)
 
         # Account for an end node
-        if file_lines[lineIdx][0].lower() == 'end' and file_lines[lineIdx][1].lower() == 'site':  # There is sometimes a name after 'End Site' but we will ignore it.
-            lineIdx += 2  # Increment to the next line (Offset)
-            rest_tail = Vector((float(file_lines[lineIdx][1]), float(file_lines[lineIdx][2]), float(file_lines[lineIdx][3]))) * global_scale
+        elif words[0].lower() == 'end' and words[1].lower() == 'site':  # There is sometimes a name after 'End Site' but we will ignore it.
+            next(file_lines)  # Skip the bracket
+            words = next(file_lines)  # Offset
+            rest_tail = Vector((float(words[1]), float(words[2]), float(words[3]))) * global_scale
 
             bvh_nodes_serial[-1].rest_tail_world = bvh_nodes_serial[-1].rest_head_world + rest_tail
             bvh_nodes_serial[-1].rest_tail_local = bvh_nodes_serial[-1].rest_head_local + rest_tail
@@ -196,7 +195,7 @@ def read_bvh(context, file_path, rotate_mode='XYZ', global_scale=1.0):
             # so this is a placeholder
             bvh_nodes_serial.append(None)
 
-        if len(file_lines[lineIdx]) == 1 and file_lines[lineIdx][0] == '}':  # == ['}']
+        elif len(words) == 1 and words[0] == '}':  # == ['}']
             bvh_nodes_serial.pop()  # Remove the last item
 
         # End of the hierarchy. Begin the animation section of the file with
@@ -204,20 +203,24 @@ def read_bvh(context, file_path, rotate_mode='XYZ', global_scale=1.0):
         #  MOTION
         #  Frames: n
         #  Frame Time: dt
-        if len(file_lines[lineIdx]) == 1 and file_lines[lineIdx][0].lower() == 'motion':
-            lineIdx += 2  # Read frame rate.
+        elif len(words) == 1 and words[0].lower() == 'motion':
+            next(file_lines, None)  # Skip the frame count, the data tells.
+            words = next(file_lines, ())  # Read frame rate.
 
-            if (len(file_lines[lineIdx]) == 3 and
-                file_lines[lineIdx][0].lower() == 'frame' and
-                file_lines[lineIdx][1].lower() == 'time:'):
+            if (len(words) == 3 and
+                words[0].lower() == 'frame' and
+                words[1].lower() == 'time:'):
 
-                bvh_frame_time = float(file_lines[lineIdx][2])
-
-            lineIdx += 1  # Set the cursor to the first frame
+                bvh_frame_time = float(words[2])
 
             break
 
-        lineIdx += 1
+    # Decode the whole MOTION block into one frames x channels array,
+    # the rest of the file only holds numbers.
+    motion = array('d')
+    for line in file:
+        motion.extend(map(float, line.split()))
+    file.close()
 
     # Remove the None value used for easy parent reference
     del bvh_nodes[None]
@@ -228,31 +231,20 @@ def read_bvh(context, file_path, rotate_mode='XYZ', global_scale=1.0):
     # second life expects it, which isn't to spec.
     bvh_nodes_list = sorted_nodes(bvh_nodes)
 
-    while lineIdx < len(file_lines):
-        line = file_lines[lineIdx]
-        for bvh_node in bvh_nodes_list:
-            #for bvh_node in bvh_nodes_serial:
-            lx = ly = lz = rx = ry = rz = 0.0
-            channels = bvh_node.channels
-            anim_data = bvh_node.anim_data
-            if channels[0] != -1:
-                lx = global_scale * float(line[channels[0]])
-
-            if channels[1] != -1:
-                ly = global_scale * float(line[channels[1]])
-
-            if channels[2] != -1:
-                lz = global_scale * float(line[channels[2]])
-
-            if channels[3] != -1 or channels[4] != -1 or channels[5] != -1:
-
-                rx = radians(float(line[channels[3]]))
-                ry = radians(float(line[channels[4]]))
-                rz = radians(float(line[channels[5]]))
-
-            # Done importing motion data #
-            anim_data.append((lx, ly, lz, rx, ry, rz))
-        lineIdx += 1
+    # Split the motion into one array per used channel (after frame 0, the rest pose),
+    # an incomplete last frame is ignored.
+    channel_count = channelIndex + 1
+    frame_count = len(motion) // channel_count if channel_count else 0
+    motion_end = frame_count * channel_count
+    for bvh_node in bvh_nodes_list:
+        for i, channel in enumerate(bvh_node.channels):
+            anim_data = bvh_node.anim_data[i]
+            if channel == -1:
+                anim_data.extend(array('d', [0.0]) * frame_count)
+            elif i < 3:
+                anim_data.extend(v * global_scale for v in motion[channel:motion_end:channel_count])
+            else:
+                anim_data.extend(map(radians, motion[channel:motion_end:channel_count]))
 
     # Assign children
     for bvh_node in bvh_nodes_list:
@@ -343,9 +335,7 @@ def bvh_node_dict2objects(context, bvh_name, bvh_nodes, rotate_mode='NATIVE', fr
     for name, bvh_node in bvh_nodes.items():
         obj = bvh_node.temp
 
-        for frame_current in range(len(bvh_node.anim_data)):
-
-            lx, ly, lz, rx, ry, rz = bvh_node.anim_data[frame_current]
+        for frame_current, (lx, ly, lz, rx, ry, rz) in enumerate(zip(*bvh_node.anim_data)):
 
             if bvh_node.has_loc:
                 obj.delta_location = Vector((lx, ly, lz)) - bvh_node.rest_head_world
@@ -478,6 +468,7 @@ def bvh_node_dict2armature(context,
     arm_ob.animation_data_create()
     action = bpy.data.actions.new(name=bvh_name)
     arm_ob.animation_data.action = action
+    keys = KeyframeWriter(action)
 
     # Replace the bvh_node.temp (currently an editbone)
     # With a tuple  (pose_bone, armature_bone, bone_rest_matrix, bone_rest_matrix_inv)
@@ -496,7 +487,7 @@ def bvh_node_dict2armature(context,
         bvh_node.temp = (pose_bone, bone, bone_rest_matrix, bone_rest_matrix_inv)
 
         if 0 == num_frame:
-            num_frame = len(bvh_node.anim_data)
+            num_frame = len(bvh_node.anim_data[0])
 
     # Choose to skip some frames at the beginning. Frame 0 is the rest pose
     # used internally by this importer. Frame 1, by convention, is also often
@@ -527,8 +518,9 @@ def bvh_node_dict2armature(context,
             data_path = 'pose.bones["%s"].location' % pose_bone.name
 
             location = [(0.0, 0.0, 0.0)] * num_frame
-            for frame_i in range(num_frame):
-                bvh_loc = bvh_node.anim_data[frame_i + skip_frame][:3]
+            bvh_locs = zip(*(anim_data[skip_frame:skip_frame + num_frame]
+                             for anim_data in bvh_node.anim_data[:3]))
+            for frame_i, bvh_loc in enumerate(bvh_locs):
 
                 bone_translate_matrix = Matrix.Translation(
                         Vector(bvh_loc) - bvh_node.rest_head_local)
@@ -537,13 +529,8 @@ def bvh_node_dict2armature(context,
 
             # For each location x, y, z.
             for axis_i in range(3):
-                curve = action.fcurves.new(data_path=data_path, index=axis_i)
-                keyframe_points = curve.keyframe_points
-                keyframe_points.add(num_frame)
-
-                for frame_i in range(num_frame):
-                    keyframe_points[frame_i].co = \
-                            (time[frame_i], location[frame_i][axis_i])
+                keys.add_channel(data_path, axis_i, time,
+                                 [loc[axis_i] for loc in location])
 
         if bvh_node.has_rot:
             data_path = None
@@ -559,8 +546,9 @@ def bvh_node_dict2armature(context,
                              pose_bone.name)
 
             prev_euler = Euler((0.0, 0.0, 0.0))
-            for frame_i in range(num_frame):
-                bvh_rot = bvh_node.anim_data[frame_i + skip_frame][3:]
+            bvh_rots = zip(*(anim_data[skip_frame:skip_frame + num_frame]
+                             for anim_data in bvh_node.anim_data[3:]))
+            for frame_i, bvh_rot in enumerate(bvh_rots):
 
                 # apply rotation order and convert to XYZ
                 # note that the rot_order_str is reversed.
@@ -579,20 +567,13 @@ def bvh_node_dict2armature(context,
 
             # For each Euler angle x, y, z (or Quaternion w, x, y, z).
             for axis_i in range(len(rotate[0])):
-                curve = action.fcurves.new(data_path=data_path, index=axis_i)
-                keyframe_points = curve.keyframe_points
-                curve.keyframe_points.add(num_frame)
-
-                for frame_i in range(0, num_frame):
-                    keyframe_points[frame_i].co = \
-                            (time[frame_i], rotate[frame_i][axis_i])
+                keys.add_channel(data_path, axis_i, time,
+                                 [rot[axis_i] for rot in rotate])
 
-    for cu in action.fcurves:
-        if IMPORT_LOOP:
-            pass  # 2.5 doenst have cyclic now?
+    if IMPORT_LOOP:
+        pass  # 2.5 doenst have cyclic now?
 
-        for bez in cu.keyframe_points:
-            bez.interpolation = 'LINEAR'
+    keys.write(interpolation='LINEAR')
 
     # finally apply matrix
     arm_ob.matrix_world = global_matrix
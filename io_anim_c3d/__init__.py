@@ -44,60 +44,10 @@ from bpy.props import (StringProperty,
                        )
 
 import math
-import time
-from mathutils import Vector
+from keyframe_utils import KeyframeWriter, ensure_action
 from . import import_c3d
 
 
-class C3DAnimateCloud(bpy.types.Operator):
-    """
-        Animate the Marker Cloud
-    """
-    bl_idname = "import_anim.c3danim"
-    bl_label = "Animate C3D"
-
-    markerset = None
-    uname = None
-    curframe = 0
-    fskip = 0
-    scale = 0
-    timer = None
-    Y_up = False
-
-    def modal(self, context, event):
-        if event.type == 'ESC':
-            return self.cancel(context)
-        if event.type == 'TIMER':
-            if self.curframe > self.markerset.endFrame:
-                return self.cancel(context)
-            fno = self.curframe
-            if not self.use_frame_no:
-                fno = (self.curframe - self.markerset.startFrame) / self.fskip
-            for i in range(self.fskip):
-                self.markerset.readNextFrameData()
-            for ml in self.markerset.markerLabels:
-                name = self.unames[self.prefix + ml]
-                o = bpy.context.scene.objects[name]
-                m = self.markerset.getMarker(ml, self.curframe)
-                p = Vector(m.position) * self.scale
-                o.location = Vector((p[0], -p[2], p[1])) if self.Y_up else p
-                if m.confidence >= self.confidence:
-                    o.keyframe_insert('location', frame=fno)
-            self.curframe += self.fskip
-        return {'PASS_THROUGH'}
-
-    def execute(self, context):
-        self.timer = context.window_manager.\
-            event_timer_add(0.001, context.window)
-        context.window_manager.modal_handler_add(self)
-        return {'RUNNING_MODAL'}
-
-    def cancel(self, context):
-        bpy.context.scene.frame_set(bpy.context.scene.frame_current)
-        context.window_manager.event_timer_remove(self.timer)
-        return {'CANCELLED'}
-
-
 class C3DImporter(bpy.types.Operator):
     """
         Load a C3D Marker Cloud
@@ -183,6 +133,7 @@ class C3DImporter(bpy.types.Operator):
             (only works for standing poses)
         """
         zmin = None
+        first = ms.getFrame(0)
         hidx = 1 if self.properties.Y_up else 2
         for ml in ms.markerLabels:
             if 'LTOE' in ml:
@@ -191,10 +142,10 @@ class C3DImporter(bpy.types.Operator):
                     break
                 pmin_idx = ms.markerLabels.index(ml)
                 pmax_idx = ms.markerLabels.index(hd)
-                zmin = ms.frames[0][pmin_idx].position[hidx]
-                zmax = ms.frames[0][pmax_idx].position[hidx]
+                zmin = first[pmin_idx].position[hidx]
+                zmax = first[pmax_idx].position[hidx]
         if zmin is None:  # could not find named markers, get extremes
-            allz = [m.position[hidx] for m in ms.frames[0]]
+            allz = [m.position[hidx] for m in first]
             zmin, zmax = min(allz), max(allz)
         return abs(zmax - zmin)
 
@@ -218,46 +169,58 @@ class C3DImporter(bpy.types.Operator):
     def execute(self, context):
         s = self.properties.size
         empty_size = (s, s, s)
-        ms = import_c3d.read(self.properties.filepath, onlyHeader=True)
-        ms.readNextFrameData()
-        #print(ms.fileName)
-
-        # determine the final scale
-        height = self.find_height(ms)
-        #print('h', height)
-        scale = 1.0 if not self.properties.from_inches else 2.54
-        scale *= ms.scale
-        if self.properties.auto_magnitude:
-            scale = self.adjust_scale_magnitude(height, scale)
-            #print('scale',scale)
-        if self.properties.auto_scale:
-            scale = self.adjust_scale(height, scale)
-        scale *= self.properties.scale
-
-        # create the empties and get their collision-free names
-        unames = {}
-        for ml in ms.markerLabels:
-            bpy.ops.object.add()
-            bpy.ops.transform.resize(value=empty_size)
-            name = self.properties.prefix + ml
-            bpy.context.active_object.name = name
-            unames[name] = bpy.context.active_object.name
-            bpy.context.active_object.show_name = self.properties.show_names
-            bpy.context.active_object.show_x_ray = self.properties.x_ray
-        for name in unames.values():
-            bpy.context.scene.objects[name].select = True
-
-        # start animating the empties
-        C3DAnimateCloud.markerset = ms
-        C3DAnimateCloud.unames = unames
-        C3DAnimateCloud.scale = scale
-        C3DAnimateCloud.Y_up = self.properties.Y_up
-        C3DAnimateCloud.fskip = self.properties.frame_skip
-        C3DAnimateCloud.prefix = self.properties.prefix
-        C3DAnimateCloud.use_frame_no = self.properties.use_frame_no
-        C3DAnimateCloud.confidence = self.properties.confidence
-        C3DAnimateCloud.curframe = ms.startFrame
-        bpy.ops.import_anim.c3danim()
+        ms = import_c3d.read(self.properties.filepath)
+        try:
+            #print(ms.fileName)
+            if ms.markerCount == 0:
+                self.report({'WARNING'}, "No markers in the file")
+                return {'CANCELLED'}
+
+            # determine the final scale
+            height = self.find_height(ms)
+            #print('h', height)
+            scale = 1.0 if not self.properties.from_inches else 2.54
+            scale *= ms.scale
+            if self.properties.auto_magnitude:
+                scale = self.adjust_scale_magnitude(height, scale)
+                #print('scale',scale)
+            if self.properties.auto_scale:
+                scale = self.adjust_scale(height, scale)
+            scale *= self.properties.scale
+
+            # create the empties and get their collision-free names
+            unames = {}
+            for ml in ms.markerLabels:
+                bpy.ops.object.add()
+                bpy.ops.transform.resize(value=empty_size)
+                name = self.properties.prefix + ml
+                bpy.context.active_object.name = name
+                unames[name] = bpy.context.active_object.name
+                bpy.context.active_object.show_name = self.properties.show_names
+                bpy.context.active_object.show_x_ray = self.properties.x_ray
+            for name in unames.values():
+                bpy.context.scene.objects[name].select = True
+
+            # key whole marker tracks at once
+            fskip = self.properties.frame_skip
+            for ml in ms.markerLabels:
+                name = unames[self.properties.prefix + ml]
+                frames, xs, ys, zs = ms.markerTrack(
+                    ml, scale, self.properties.Y_up, fskip,
+                    self.properties.confidence)
+                if not frames:
+                    continue
+                if self.properties.use_frame_no:
+                    frames = [f + ms.startFrame for f in frames]
+                else:
+                    frames = [f / fskip for f in frames]
+                keys = KeyframeWriter(ensure_action(context.scene.objects[name]))
+                for index, values in enumerate((xs, ys, zs)):
+                    keys.add_channel('location', index, frames, values)
+                keys.write()
+        finally:
+            ms.close()
+        context.scene.frame_set(context.scene.frame_current)
         return {'FINISHED'}
 
     def invoke(self, context, event):
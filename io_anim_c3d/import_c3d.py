@@ -30,10 +30,9 @@
 
 
 import struct
-try:
-    from numpy import array as vec  # would be nice to have NumPy in Blender
-except:
-    from mathutils import Vector as vec
+import mmap
+from array import array
+from itertools import compress
 
 
 class Marker:
@@ -76,23 +75,28 @@ class Parameter:
 
 
 class MarkerSet:
+    """
+        Marker data is kept in one flat array of frames x markers x 4 values
+        (x, y, z, confidence), unscaled. Files in the Intel float format are
+        memory mapped instead of read.
+    """
     def __init__(self, fileName, scale=1., stripPrefix=True, onlyHeader=False):
         self.fileName = fileName
+        self.data = None
+        self.mmap = None
         if fileName.endswith('.csv'):
             with open(fileName, 'rt') as infile:
                 self.readCSV(infile)
             return
-        if onlyHeader:
-            self.infile = open(fileName, 'rb')
-            self.readHeader(self.infile, scale)
-            self.identifyMarkerPrefix(stripPrefix)
-            self.infile.seek(512 * (self.dataBlock - 1))
-            self.frames = []
-            return
         with open(fileName, 'rb') as infile:
             self.readHeader(infile, scale)
             self.identifyMarkerPrefix(stripPrefix)
-            self.readFrameData(infile)
+            if not onlyHeader:
+                self.readFrameData(infile)
+
+    @property
+    def frameCount(self):
+        return self.endFrame - self.startFrame + 1
 
     def readCSV(self, infile):
         import csv
@@ -101,20 +105,17 @@ class MarkerSet:
         if 0 != len(header) % 3:
             raise Exception('Incorrect data format in CSV file')
         self.markerLabels = [label[:-2] for label in header[::3]]
-        self.frames = []
+        self.markerCount = len(self.markerLabels)
+        self.data = array('f')
         for framerow in csvr:
-            newFrame = []
             for c in range(0, len(framerow), 3):
-                m = Marker()
                 try:
-                    m.position = vec([float(v) for v in framerow[c:c + 3]])
-                    m.confidence = 1.
+                    self.data.extend([float(v) for v in framerow[c:c + 3]])
+                    self.data.append(1.)
                 except:
-                    pass
-                newFrame.append(m)
-            self.frames.append(newFrame)
+                    self.data.extend((0., 0., 0., -1.))
         self.startFrame = 0
-        self.endFrame = len(self.frames) - 1
+        self.endFrame = len(self.data) // (self.markerCount * 4) - 1
         self.scale = 1.
 
     def writeCSV(self, fileName, applyScale=True, mfilter=[]):
@@ -132,10 +133,10 @@ class MarkerSet:
             if mfilter:
                 mfilter = [self.markerLabels.index(m)
                             for m in self.markerLabels if m in mfilter]
-            for f in self.frames:
-                F = f
+            for f in range(self.frameCount):
+                F = self.getFrame(f)
                 if mfilter:
-                    F = [m for i, m in enumerate(f) if i in mfilter]
+                    F = [m for i, m in enumerate(F) if i in mfilter]
                 expmarkers = (m.confidence < 0 and nan or fmt(m) for m in F)
                 o.writerow(sum(expmarkers, ()))
 
@@ -169,14 +170,9 @@ class MarkerSet:
         (self.scale, self.dataBlock, bogus,
          self.frameRate) = struct.unpack('fhhf', td)
         self.scale *= scale
-        if self.scale < 0:
-            if self.procType == 2:
-                self.readMarker = self.readFloatMarkerInvOrd
-            else:
-                self.readMarker = self.readFloatMarker
+        self.isFloat = self.scale < 0
+        if self.isFloat:
             self.scale *= -1
-        else:
-            self.readMarker = self.readShortMarker
 
     def readParameters(self, infile):
         infile.seek(512 * (self.firstParameterBlock - 1))
@@ -212,54 +208,98 @@ class MarkerSet:
             else:
                 repeats[m] = 1
 
-    def readMarker(self, infile):
-        pass  # ...
-
-    def readFloatMarker(self, infile):
-        m = Marker()
-        x, y, z, m.confidence = struct.unpack('ffff', infile.read(16))
-        m.position = (x * self.scale, y * self.scale, z * self.scale)
-        return m
-
-    def readFloatMarkerInvOrd(self, infile):
-        m = Marker()
-        inv = lambda f: f[2:] + f[:2]
-        i = lambda: inv(infile.read(4))
-        x, y, z, m.confidence = struct.unpack('ffff', i() + i() + i() + i())
-        m.position = (x * self.scale, y * self.scale, z * self.scale)
-        return m
-
-    def readShortMarker(self, infile):
-        m = Marker()
-        x, y, z, m.confidence = struct.unpack('hhhh', infile.read(8))
-        m.position = (x * self.scale, y * self.scale, z * self.scale)
-        return m
-
     def readFrameData(self, infile):
-        infile.seek(512 * (self.dataBlock - 1))
-        self.frames = []
-        for f in range(self.startFrame, self.endFrame + 1):
-            frame = [self.readMarker(infile) for m in range(self.markerCount)]
-            self.frames.append(frame)
-
-    def readNextFrameData(self):
-        if len(self.frames) < (self.endFrame - self.startFrame + 1):
-            frame = [self.readMarker(self.infile)
-                for m in range(self.markerCount)]
-            self.frames.append(frame)
-        return self.frames[-1]
+        if self.markerCount == 0:
+            # Only analog data in the file
+            self.data = array('f')
+            return
+        offset = 512 * (self.dataBlock - 1)
+        itemsize = 4 if self.isFloat else 2
+        infile.seek(0, 2)
+        frameSize = self.markerCount * 4 * itemsize
+        available = max(0, (infile.tell() - offset) // frameSize)
+        if available < self.frameCount:
+            self.endFrame = self.startFrame + available - 1
+        size = self.frameCount * frameSize
+        if self.isFloat and self.procType != 2:
+            # Map the file, the floats are used in place.
+            self.mmap = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = memoryview(self.mmap)[offset:offset + size].cast('f')
+            return
+        infile.seek(offset)
+        raw = infile.read(size)
+        if self.isFloat:
+            # DEC-VAX order, swap the 16 bits halves of each float
+            words = array('H')
+            words.frombytes(raw)
+            words[0::2], words[1::2] = words[1::2], words[0::2]
+            raw = words.tobytes()
+        self.data = array('f' if self.isFloat else 'h')
+        self.data.frombytes(raw)
+
+    def close(self):
+        """
+            Release the memory mapped file, the marker data can't be used
+            any more
+        """
+        if self.mmap is not None:
+            self.data.release()
+            self.data = None
+            self.mmap.close()
+            self.mmap = None
+
+    def markerIndex(self, marker):
+        if type(marker) == int:
+            return marker
+        return self.markerLabels.index(marker)
+
+    def markerTrack(self, marker, scale=1., yUp=False, step=1,
+                    minConfidence=None):
+        """
+            Positions of a marker over every step-th frame, returned as
+            (frame indices, xs, ys, zs). Frames where the confidence is below
+            minConfidence are left out; with yUp, Y is the up axis in the
+            file and the positions are converted to Blender's Z up.
+        """
+        stride = self.markerCount * 4
+        end = self.frameCount * stride
+        first = self.markerIndex(marker) * 4
+        channel = lambda c: self.data[first + c:end:stride * step]
+        xs, ys, zs, cs = channel(0), channel(1), channel(2), channel(3)
+        frames = range(0, self.frameCount, step)
+        if minConfidence is not None:
+            keep = [c >= minConfidence for c in cs]
+            frames, xs, ys, zs = (list(compress(seq, keep))
+                                  for seq in (frames, xs, ys, zs))
+        s = self.scale * scale
+        xs, ys, zs = ([v * s for v in seq] for seq in (xs, ys, zs))
+        if yUp:
+            xs, ys, zs = xs, [-v for v in zs], ys
+        return list(frames), xs, ys, zs
+
+    def getFrame(self, frame):
+        """
+            Markers of one frame (index from the first frame)
+        """
+        stride = self.markerCount * 4
+        values = self.data[frame * stride:(frame + 1) * stride]
+        s = self.scale
+        markers = []
+        for i in range(0, stride, 4):
+            m = Marker()
+            m.position = (values[i] * s, values[i + 1] * s,
+                          values[i + 2] * s)
+            m.confidence = values[i + 3]
+            markers.append(m)
+        return markers
 
     def getFramesByMarker(self, marker):
-        if type(marker) == int:
-            idx = marker
-        else:
-            idx = self.markerLabels.index(marker)
-        fcnt = self.endFrame - self.startFrame + 1
-        return [self.frames[f][idx] for f in range(fcnt)]
+        idx = self.markerIndex(marker)
+        return [self.getFrame(f)[idx] for f in range(self.frameCount)]
 
     def getMarker(self, marker, frame):
-        idx = self.markerLabels.index(marker)
-        return self.frames[frame - self.startFrame][idx]
+        idx = self.markerIndex(marker)
+        return self.getFrame(frame - self.startFrame)[idx]
 
 
 def read(filename, *a, **kw):
@@ -2257,80 +2257,198 @@ def parseThumbnail(section, statements, handles):
 
 #
 #    buildGeometry(entities):
-#    addMesh(name, verts, edges, faces):                            
+#    drawGeometry(geom):
 #
 
+class CGeometry:
+    """ Flat vertex/edge/face arrays accumulated from entity build() output """
+
+    def __init__(self):
+        self.coords = []        # x0, y0, z0, x1, y1, z1, ...
+        self.edges = []         # flat pairs of vertex indices
+        self.faces = []         # flat face loops
+        self.faceSizes = []     # number of vertices of each face
+
+    def __len__(self):
+        return len(self.coords) // 3
+
+    def extend(self, verts, edges=(), faces=()):
+        vn = len(self)
+        coords = self.coords
+        for v in verts:
+            coords.extend((v[0], v[1], v[2]))
+        if vn:
+            self.edges.extend(it + vn for e in edges for it in e)
+            for f in faces:
+                self.faces.extend(it + vn for it in f)
+                self.faceSizes.append(len(f))
+        else:
+            self.edges.extend(it for e in edges for it in e)
+            for f in faces:
+                self.faces.extend(f)
+                self.faceSizes.append(len(f))
+
+    def vertList(self):
+        co = self.coords
+        return [tuple(co[i:i + 3]) for i in range(0, len(co), 3)]
+
+    def edgeList(self):
+        e = self.edges
+        return [(e[i], e[i + 1]) for i in range(0, len(e), 2)]
+
+
 def buildGeometry(entities):
     try: bpy.ops.object.mode_set(mode='OBJECT')
     except: pass
-    v_verts = []
-    v_vn = 0
-    e_verts = []
-    e_edges = []
-    e_vn = 0
-    f_verts = []
-    f_edges = []
-    f_faces = []
-    f_vn = 0
+    v_geom = CGeometry()
+    e_geom = CGeometry()
+    f_geom = CGeometry()
     for ent in entities:
         if ent.drawtype in {'Mesh', 'Curve'}:
             (verts, edges, faces, vn) = ent.build()
             if not toggle & T_DrawOne:
-                drawGeometry(verts, edges, faces)
-            else:
-                if verts:
-                    if faces:
-                        for i,f in enumerate(faces):
-                            #print ('face=', f)
-                            faces[i] = tuple(it+f_vn for it in f)
-                        for i,e in enumerate(edges):
-                            edges[i] = tuple(it+f_vn for it in e)
-                        f_verts.extend(verts)
-                        f_edges.extend(edges)
-                        f_faces.extend(faces)
-                        f_vn += len(verts)
-                    elif edges:
-                        for i,e in enumerate(edges):
-                            edges[i] = tuple(it+e_vn for it in e)
-                        e_verts.extend(verts)
-                        e_edges.extend(edges)
-                        e_vn += len(verts)
-                    else:
-                        v_verts.extend(verts)
-                        v_vn += len(verts)
+                geom = CGeometry()
+                geom.extend(verts, edges, faces)
+                drawGeometry(geom)
+            elif verts:
+                if faces:
+                    f_geom.extend(verts, edges, faces)
+                elif edges:
+                    e_geom.extend(verts, edges)
+                else:
+                    v_geom.extend(verts)
         else:
             ent.draw()
-                    
+
     if toggle & T_DrawOne:
-        drawGeometry(f_verts, f_edges, f_faces)
-        drawGeometry(e_verts, e_edges)
-        drawGeometry(v_verts)
+        drawGeometry(f_geom)
+        drawGeometry(e_geom)
+        drawGeometry(v_geom)
 
 
 
-def drawGeometry(verts, edges=[], faces=[]):
-    if verts:
-        if edges and (toggle & T_Curves):
+def drawGeometry(geom):
+    if len(geom):
+        if geom.edges and (toggle & T_Curves):
             print ('draw Curve')
             cu = bpy.data.curves.new('DXFlines', 'CURVE')
             cu.dimensions = '3D'
-            buildSplines(cu, verts, edges)
+            buildSplines(cu, geom.vertList(), geom.edgeList())
             ob = addObject('DXFlines', cu)
         else:
-            #for v in verts: print(v)
-            #print ('draw Mesh with %s vertices' %(len(verts)))
-            #for e in edges: print(e)
-            #print ('draw Mesh with %s edges' %(len(edges)))
-            #for f in faces: print(f)
-            #print ('draw Mesh with %s faces' %(len(faces)))
+            if toggle & T_Merge:
+                weldVertices(geom, theMergeLimit)
             me = bpy.data.meshes.new('DXFmesh')
-            me.from_pydata(verts, edges, faces)
+            buildMesh(me, geom)
             ob = addObject('DXFmesh', me)
-            removeDoubles(ob)
     return
 
 
 
+def buildMesh(me, geom):
+    """ Fill an empty mesh from flat arrays with one foreach_set per attribute """
+    me.vertices.add(len(geom))
+    me.vertices.foreach_set("co", geom.coords)
+    if geom.edges:
+        me.edges.add(len(geom.edges) // 2)
+        me.edges.foreach_set("vertices", geom.edges)
+    if geom.faceSizes:
+        loop_starts = []
+        start = 0
+        for n in geom.faceSizes:
+            loop_starts.append(start)
+            start += n
+        me.loops.add(len(geom.faces))
+        me.loops.foreach_set("vertex_index", geom.faces)
+        me.polygons.add(len(geom.faceSizes))
+        me.polygons.foreach_set("loop_start", loop_starts)
+        me.polygons.foreach_set("loop_total", geom.faceSizes)
+    me.update(calc_edges=True)
+    return me
+
+
+
+def weldVertices(geom, limit):
+    """
+    Merge vertices closer than limit, in place.
+
+    Vertices are binned into a spatial hash with cell size limit, so each
+    vertex only has to be compared with the 27 cells around it. The first
+    vertex of a cluster is kept, like bpy.ops.mesh.remove_doubles does.
+    Edges and faces collapsed by the merge are dropped.
+    """
+    coords = geom.coords
+    if limit <= 0.0:
+        limit = 1e-9
+    inv = 1.0 / limit
+    limit_sq = limit * limit
+    floor = math.floor
+    offsets = [(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)]
+
+    grid = {}
+    remap = []
+    new_coords = []
+    for i in range(0, len(coords), 3):
+        x, y, z = coords[i], coords[i + 1], coords[i + 2]
+        cx, cy, cz = floor(x * inv), floor(y * inv), floor(z * inv)
+        target = -1
+        for (dx, dy, dz) in offsets:
+            cell = grid.get((cx + dx, cy + dy, cz + dz))
+            if cell is None:
+                continue
+            for j in cell:
+                j3 = j * 3
+                ddx = new_coords[j3] - x
+                ddy = new_coords[j3 + 1] - y
+                ddz = new_coords[j3 + 2] - z
+                if ddx * ddx + ddy * ddy + ddz * ddz <= limit_sq:
+                    target = j
+                    break
+            if target != -1:
+                break
+        if target == -1:
+            target = len(new_coords) // 3
+            new_coords.extend((x, y, z))
+            grid.setdefault((cx, cy, cz), []).append(target)
+        remap.append(target)
+
+    if len(new_coords) == len(coords):
+        return geom
+
+    edges = geom.edges
+    new_edges = []
+    edge_keys = set()
+    for i in range(0, len(edges), 2):
+        a, b = remap[edges[i]], remap[edges[i + 1]]
+        if a != b:
+            key = (a, b) if a < b else (b, a)
+            if key not in edge_keys:
+                edge_keys.add(key)
+                new_edges.extend(key)
+
+    new_faces = []
+    new_sizes = []
+    start = 0
+    faces = geom.faces
+    for n in geom.faceSizes:
+        f = []
+        for it in faces[start:start + n]:
+            it = remap[it]
+            if it not in f:
+                f.append(it)
+        start += n
+        if len(f) > 2:
+            new_faces.extend(f)
+            new_sizes.append(len(f))
+
+    geom.coords = new_coords
+    geom.edges = new_edges
+    geom.faces = new_faces
+    geom.faceSizes = new_sizes
+    return geom
+
+
+
 def buildSplines(cu, verts, edges):
     if edges:
         point_list = []
@@ -2370,17 +2488,6 @@ def addObject(name, data):
     return ob
 
 
-def removeDoubles(ob):
-    global theMergeLimit
-    if toggle & T_Merge:
-        scn = bpy.context.scene
-        scn.objects.active = ob
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.mesh.remove_doubles(threshold=theMergeLimit)
-        bpy.ops.object.mode_set(mode='OBJECT')
-
-
-
 #
 #    clearScene(context):
 #
@@ -68,6 +68,7 @@ DEBUGLOG = False
 scale = 1.0
 bonesize = 1.0
 from bpy_extras.io_utils import unpack_list, unpack_face_list
+from keyframe_utils import KeyframeWriter
 
 class md5_bone:
     bone_index = 0
@@ -965,8 +966,11 @@ def psaimport(filename,context):
         object.animation_data_create()
         action = bpy.data.actions.new(name=Name)
         object.animation_data.action = action
+        # keys are collected per frame and written to the action at once
+        keys = KeyframeWriter(action)
         for i in range(NumRawFrames):
-            context.scene.frame_set(i + 1)
+            frame = i + 1
+            context.scene.frame_set(frame)
             pose_bones = object.pose.bones
             for j in range(Totalbones):
                 if j not in BoneNotFoundList:
@@ -992,8 +996,8 @@ def psaimport(filename,context):
             #bpy.data.meshes[1]
             for bone in pose_bones:
                 bone.matrix = psa_bones[bone.name].Transform
-                bone.keyframe_insert("rotation_quaternion")
-                bone.keyframe_insert("location")
+                keys.add_property(bone, "rotation_quaternion", frame, bone.name)
+                keys.add_property(bone, "location", frame, bone.name)
 
             def whirlSingleBone(pose_bone,quat):
                 bpy.context.scene.update()
@@ -1010,8 +1014,8 @@ def psaimport(filename,context):
 
                 #whirl this bone by quat
                 pose_bone.matrix *= quat.to_matrix().to_4x4()
-                pose_bone.keyframe_insert("location")
-                pose_bone.keyframe_insert("rotation_quaternion")
+                keys.add_property(pose_bone, "location", frame, pose_bone.name)
+                keys.add_property(pose_bone, "rotation_quaternion", frame, pose_bone.name)
                 bpy.context.scene.update()
                 #set back children bon to original position 
                 #reverse whirl child bone by quat.inverse()
@@ -1022,16 +1026,17 @@ def psaimport(filename,context):
                     rotmat = children_infos[child][2] 
 
                     child.matrix = Matrix.Translation(pos) * rotmat.to_4x4() * hymat * armmat 
-                    child.keyframe_insert("location") 
-                    child.keyframe_insert("rotation_quaternion")
+                    keys.add_property(child, "location", frame, child.name)
+                    keys.add_property(child, "rotation_quaternion", frame, child.name)
 
             for bone in pose_bones:
                 if bone.parent != None:
                     whirlSingleBone(bone,Quaternion((0.707, 0, 0, -0.707)))
                 else:
                     bone.rotation_quaternion *= Quaternion((0.707, -0.707, 0, 0)) * Quaternion((0.707, 0, 0, -0.707))
-                    bone.keyframe_insert("rotation_quaternion")
+                    keys.add_property(bone, "rotation_quaternion", frame, bone.name)
 
+        keys.write()
         break
 
     context.scene.frame_set(0)
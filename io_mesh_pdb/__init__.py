@@ -32,9 +32,6 @@
 #           Valter, ...
 #  Other  : Frank Palmino
 #
-#
-#  To do: 1. Sticks in normal representation: options bonds and colors
-#
 
 bl_info = {
     "name": "Atomic Blender - PDB",
@@ -144,15 +141,24 @@ class ImportPDB(Operator, ImportHelper):
     use_sticks_bonds = BoolProperty(
         name="Bonds", default=False,
         description="Show double and tripple bonds.")
+    use_sticks_distance = BoolProperty(
+        name="Find bonds", default=True,
+        description="Find the sticks from the distances of the atoms if "
+                    "there are no CONECT records")
+    use_sticks_distance_merge = BoolProperty(
+        name="Add to CONECT", default=False,
+        description="Also find the sticks from the distances of the atoms "
+                    "if there are CONECT records, in addition to their sticks")
+    sticks_tolerance = FloatProperty(
+        name = "Tolerance", default=0.4, min=0.0, max=2.0,
+        description="Added to the sum of the covalent radii of two atoms "
+                    "when finding bonds (Angstrom)")
     sticks_dist = FloatProperty(
         name="", default = 1.1, min=1.0, max=3.0,
         description="Distance between sticks measured in stick diameter")         
     use_sticks_one_object = BoolProperty(
         name="One object", default=True,
         description="All sticks are one object.")     
-    use_sticks_one_object_nr = IntProperty(
-        name = "No.", default=200, min=10,
-        description="Number of sticks to be grouped at once")                 
     datafile = StringProperty(
         name = "", description="Path to your custom data file",
         maxlen = 256, default = "", subtype='FILE_PATH')
@@ -193,6 +199,13 @@ class ImportPDB(Operator, ImportHelper):
         row = box.row()
         row.active = self.use_sticks                
         row.prop(self, "use_sticks_type")
+        row = box.row()
+        row.active = self.use_sticks
+        row.prop(self, "use_sticks_distance")
+        col = row.column()
+        col.active = self.use_sticks_distance
+        col.prop(self, "sticks_tolerance")
+        col.prop(self, "use_sticks_distance_merge")
         row = box.row()        
         row.active = self.use_sticks
         col = row.column()
@@ -209,23 +222,20 @@ class ImportPDB(Operator, ImportHelper):
         if self.use_sticks_type == '0': 
             col.prop(self, "sticks_unit_length")
         col = row.column(align=True)    
-        if self.use_sticks_type == '0': 
+        if self.use_sticks_type == '0' or self.use_sticks_type == '2': 
             col.prop(self, "use_sticks_color")        
         col.prop(self, "use_sticks_smooth")
         if self.use_sticks_type == '0' or self.use_sticks_type == '2':
             col.prop(self, "use_sticks_bonds")
         row = box.row()        
-        if self.use_sticks_type == '0': 
+        if self.use_sticks_type == '0' or self.use_sticks_type == '2': 
             row.active = self.use_sticks and self.use_sticks_bonds
             row.label(text="Distance")
             row.prop(self, "sticks_dist")
         if self.use_sticks_type == '2':
+            row = box.row()
             row.active = self.use_sticks      
-            col = row.column()    
-            col.prop(self, "use_sticks_one_object")
-            col = row.column()
-            col.active = self.use_sticks_one_object
-            col.prop(self, "use_sticks_one_object_nr")
+            row.prop(self, "use_sticks_one_object")
             
             
     def execute(self, context):
@@ -247,8 +257,10 @@ class ImportPDB(Operator, ImportHelper):
                       self.use_sticks_color,
                       self.use_sticks_smooth,
                       self.use_sticks_bonds,
+                      self.use_sticks_distance,
+                      self.use_sticks_distance_merge,
+                      self.sticks_tolerance,
                       self.use_sticks_one_object,
-                      self.use_sticks_one_object_nr,
                       self.sticks_unit_length,
                       self.sticks_dist,
                       self.sticks_sectors,
@@ -18,7 +18,7 @@
 
 import bpy
 import bmesh
-from math import pi, cos, sin, sqrt, ceil
+from math import pi, cos, sin, sqrt, ceil, floor
 from mathutils import Vector, Matrix
 from copy import copy
 
@@ -356,35 +356,21 @@ def read_pdb_file_sticks(filepath_pdb, use_sticks_bonds, all_atoms):
 
     # The list of all sticks.
     all_sticks = []
+    # The atom pairs of all sticks, to find sticks listed twice.
+    all_pairs = set()
 
     # Open the PDB file.
     filepath_pdb_p = open(filepath_pdb, "r")
 
-    line = filepath_pdb_p.readline()
-    split_list = line.split(' ')
-
-    # Go to the first entry
-    if "CONECT" not in split_list[0]:
-        for line in filepath_pdb_p:
-            split_list = line.split(' ')
-            if "CONECT" in split_list[0]:
-                break
-
-    Number_of_sticks = 0
     sticks_double = 0
-    j = 0
-    # This is in fact an endless while loop, ...
-    while j > -1:
+    # Go through all 'CONECT' records, wherever they are in the file.
+    for line in filepath_pdb_p:
 
-        # ... which is broken here (EOF) ...
-        if line == "":
-            break
-        # ... or here, when no 'CONECT' appears anymore.
-        if "CONECT" not in line:
-            break
+        if line[:6] != "CONECT":
+            continue
 
         # The strings of the atom numbers do have a clear position in the file
-        # (From 7 to 12, from 13 to 18 and so on.) and one needs to consider
+        # (From 7 to 11, from 12 to 16 and so on.) and one needs to consider
         # this. One could also use the split function but then one gets into
         # trouble if there are lots of atoms: For instance, it may happen that
         # one has
@@ -397,18 +383,17 @@ def read_pdb_file_sticks(filepath_pdb, use_sticks_bonds, all_atoms):
         # Cut spaces from the right and 'CONECT' at the beginning
         line = line.rstrip()
         line = line[6:]
-        # Amount of loops
-        length = len(line)
-        loops  = int(length/5)
 
         # List of atoms
         atom_list = []
-        for i in range(loops):
-            number = line[5*i:5*(i+1)].rsplit()
-            if number != []:
-                if number[0].isdigit() == True:
-                    atom_number = int(number[0])
-                    atom_list.append(atom_number)
+        for i in range(0, len(line), 5):
+            number = line[i:i+5].strip()
+            if number.isdigit() == True:
+                atom_list.append(int(number))
+
+        # Is there any connection at all?
+        if len(atom_list) < 2:
+            continue
 
         # The first atom is connected with all the others in the list.
         atom1 = atom_list[0]
@@ -450,27 +435,116 @@ def read_pdb_file_sticks(filepath_pdb, use_sticks_bonds, all_atoms):
             # Note that in a PDB file, sticks of one atom pair can appear a
             # couple of times. (Only god knows why ...)
             # So, does a stick between the considered atoms already exist?
-            FLAG_BAR = False
-            for k in range(Number_of_sticks):
-                if ((all_sticks[k].atom1 == atom1 and all_sticks[k].atom2 == atom2) or
-                    (all_sticks[k].atom2 == atom1 and all_sticks[k].atom1 == atom2)):
-                    sticks_double += 1
-                    # If yes, then FLAG on 'True'.
-                    FLAG_BAR       = True
-                    break
+            pair = (min(atom1, atom2), max(atom1, atom2))
+            if pair in all_pairs:
+                sticks_double += 1
+                continue
 
-            # If the stick is not yet registered (FLAG_BAR == False), then
-            # register it!
-            if FLAG_BAR == False:
-                all_sticks.append(StickProp(atom1,atom2,number,dist_n))
-                Number_of_sticks += 1
-                j += 1
-
-        line = filepath_pdb_p.readline()
-        line = line.rstrip()
+            # If the stick is not yet registered, then register it!
+            all_pairs.add(pair)
+            all_sticks.append(StickProp(atom1,atom2,number,dist_n))
 
     filepath_pdb_p.close()
     
+    return (all_sticks, all_pairs)
+
+
+# The function, which finds the sticks from the distances of the atoms. This
+# is needed for all PDB files without 'CONECT' records, and most files list
+# only a few bonds in 'CONECT' records (e.g. the ones of the HETATM atoms).
+#
+# Two atoms are bonded if their distance is smaller than the sum of their
+# covalent radii plus some tolerance. In order to not compare all atoms with
+# each other, the atoms are first put into the cells of a cubic grid. The
+# cells are as large as the longest possible bond, so that bonded atoms are
+# either in the same or in neighbouring cells.
+#
+# tolerance: added to the sum of the covalent radii (Angstrom)
+# all_pairs: the atom pairs of the sticks, which are already there (from
+#            the 'CONECT' records). These are skipped, the pairs of the new
+#            sticks are added.
+def build_sticks_distance(all_atoms, tolerance, all_pairs):
+
+    # The covalent radii of all elements, as they are named in all_atoms
+    radii = {}
+    for element in ELEMENTS:
+        radii[str.upper(element.short_name)] = element.radii[1]
+    radius_default = ELEMENTS[-2].radii[1]
+    radii["VAC"] = None
+
+    # Atoms, which are closer than this, are not bonded but are most likely
+    # the same atom listed twice (alternate locations).
+    dist_min = 0.4
+
+    atoms = []
+    radius_max = 0.0
+    for i, atom in enumerate(all_atoms):
+        # No sticks for 'TER atoms' and vacancies.
+        if atom.element == "TER":
+            continue
+        radius = radii.get(atom.element, radius_default)
+        if radius is None:
+            continue
+        x, y, z = atom.location
+        # The atom numbers of the sticks start at 1.
+        atoms.append((x, y, z, radius, i+1))
+        radius_max = max(radius_max, radius)
+
+    if atoms == []:
+        return []
+
+    # Sort all atoms into the cells of the grid.
+    size = 2.0 * radius_max + tolerance
+    cells = {}
+    for atom in atoms:
+        key = (int(floor(atom[0]/size)),
+               int(floor(atom[1]/size)),
+               int(floor(atom[2]/size)))
+        cell = cells.get(key)
+        if cell is None:
+            cells[key] = [atom]
+        else:
+            cell.append(atom)
+
+    # Each pair of neighbouring cells has to be checked only once: these are
+    # the 13 neighbours 'in front of' a cell.
+    neighbours = [(i, j, k) for i in (-1, 0, 1)
+                            for j in (-1, 0, 1)
+                            for k in (-1, 0, 1)
+                            if (i, j, k) > (0, 0, 0)]
+
+    dist_min_sq = dist_min * dist_min
+
+    all_sticks = []
+
+    def add_stick(atom1, atom2):
+        pair = (min(atom1, atom2), max(atom1, atom2))
+        if pair not in all_pairs:
+            all_pairs.add(pair)
+            all_sticks.append(StickProp(atom1, atom2, 1, None))
+
+    for (ci, cj, ck), cell in cells.items():
+
+        # Atoms within the cell ...
+        for n, (x1, y1, z1, r1, atom1) in enumerate(cell):
+            for (x2, y2, z2, r2, atom2) in cell[n+1:]:
+                dist_sq = (x2-x1)**2 + (y2-y1)**2 + (z2-z1)**2
+                dist_max = r1 + r2 + tolerance
+                if dist_min_sq < dist_sq <= dist_max * dist_max:
+                    add_stick(atom1, atom2)
+
+        # ... and with the atoms in the neighbouring cells.
+        for (i, j, k) in neighbours:
+            cell2 = cells.get((ci+i, cj+j, ck+k))
+            if cell2 is None:
+                continue
+            for (x1, y1, z1, r1, atom1) in cell:
+                for (x2, y2, z2, r2, atom2) in cell2:
+                    dist_sq = (x2-x1)**2 + (y2-y1)**2 + (z2-z1)**2
+                    dist_max = r1 + r2 + tolerance
+                    if dist_min_sq < dist_sq <= dist_max * dist_max:
+                        add_stick(atom1, atom2)
+
     return all_sticks
 
 
@@ -1010,6 +1084,90 @@ def draw_sticks_skin(all_atoms,
     return new_stick_mesh
 
 
+# Function, which builds one mesh with the cylinders of many sticks. Instead
+# of adding a cylinder primitive for each stick, all vertices are computed from
+# the end points of the sticks with one ring of 'sectors' vertices as
+# template. Both halves of a stick can have different materials, which are
+# given as material indices of the mesh.
+#
+# sticks: list of [location1, location2, material_index1, material_index2]
+def build_sticks_mesh(name, sticks, radius, sectors, use_smooth):
+
+    # The ring template
+    dphi = 2.0 * pi / sectors
+    ring = [(radius * cos(dphi * i), radius * sin(dphi * i))
+                                                    for i in range(sectors)]
+
+    vertices = []
+    vertex_indices = []
+    loop_totals = []
+    material_indices = []
+    for location1, location2, material1, material2 in sticks:
+
+        # Two vectors u and w perpendicular to the stick
+        d = (location2 - location1).normalized()
+        u = d.orthogonal().normalized()
+        w = d.cross(u)
+        ux, uy, uz = u
+        wx, wy, wz = w
+
+        # A stick is split in the middle if both halves differ in color.
+        if material1 == material2:
+            centers = (location1, location2)
+            materials = (material1,)
+        else:
+            centers = (location1, (location1 + location2) * 0.5, location2)
+            materials = (material1, material2)
+
+        start = len(vertices) // 3
+        for x, y, z in centers:
+            for c, s in ring:
+                vertices.extend((x + c*ux + s*wx,
+                                 y + c*uy + s*wy,
+                                 z + c*uz + s*wz))
+
+        # Side facets
+        for j, material in enumerate(materials):
+            ring1 = start + j * sectors
+            ring2 = ring1 + sectors
+            for i in range(sectors):
+                i2 = (i + 1) % sectors
+                vertex_indices.extend((ring1 + i, ring1 + i2,
+                                       ring2 + i2, ring2 + i))
+            loop_totals.extend([4] * sectors)
+            material_indices.extend([material] * sectors)
+
+        # Bottom and top facets
+        vertex_indices.extend(range(start + sectors - 1, start - 1, -1))
+        ring_last = start + (len(centers) - 1) * sectors
+        vertex_indices.extend(range(ring_last, ring_last + sectors))
+        loop_totals.extend((sectors, sectors))
+        material_indices.extend((materials[0], materials[-1]))
+
+    loop_starts = [0] * len(loop_totals)
+    total = 0
+    for i, loop_total in enumerate(loop_totals):
+        loop_starts[i] = total
+        total += loop_total
+
+    # Build the mesh
+    stick_mesh = bpy.data.meshes.new(name)
+    stick_mesh.vertices.add(len(vertices) // 3)
+    stick_mesh.vertices.foreach_set("co", vertices)
+    stick_mesh.loops.add(len(vertex_indices))
+    stick_mesh.loops.foreach_set("vertex_index", vertex_indices)
+    stick_mesh.polygons.add(len(loop_totals))
+    stick_mesh.polygons.foreach_set("loop_start", loop_starts)
+    stick_mesh.polygons.foreach_set("loop_total", loop_totals)
+    stick_mesh.polygons.foreach_set("material_index", material_indices)
+    if use_smooth == True:
+        stick_mesh.polygons.foreach_set("use_smooth",
+                                        [True] * len(loop_totals))
+    stick_mesh.update(calc_edges=True)
+
+    return stick_mesh
+
+
 # Draw the sticks the normal way: connect the atoms by simple cylinders.
 # Two options: 1. single cylinders parented to an empty
 #              2. one single mesh object
@@ -1018,103 +1176,113 @@ def draw_sticks_normal(all_atoms,
                        center,
                        Stick_diameter,
                        Stick_sectors,
+                       Stick_dist,
+                       use_sticks_color,
                        use_sticks_smooth,
-                       use_sticks_one_object,
-                       use_sticks_one_object_nr):
+                       use_sticks_one_object):
     
-    bpy.ops.object.material_slot_add()
     stick_material = bpy.data.materials.new(ELEMENTS[-1].name)
     stick_material.diffuse_color = ELEMENTS[-1].color
     
-    up_axis = Vector([0.0, 0.0, 1.0])
-    current_layers = bpy.context.scene.layers
+    # A cylinder needs at least 3 sectors.
+    sectors = max(3, Stick_sectors)
+    dist = Stick_diameter * Stick_dist
+
+    # All materials used by the sticks and their indices
+    materials = []
+    material_indices = {}
+    def material_index(material):
+        if material not in material_indices:
+            material_indices[material] = len(materials)
+            materials.append(material)
+        return material_indices[material]
 
     # For all sticks, do ...
-    list_group = []
-    list_group_sub = []
-    counter = 0
+    sticks_list = []
     for stick in all_sticks:
-		
+
         # The vectors of the two atoms
-        atom1 = all_atoms[stick.atom1-1].location-center
-        atom2 = all_atoms[stick.atom2-1].location-center
-        # Location
-        location = (atom1 + atom2) * 0.5
-        # The difference of both vectors
-        v = (atom2 - atom1)
-        # Angle with respect to the z-axis
-        angle = v.angle(up_axis, 0)
-        # Cross-product between v and the z-axis vector. It is the 
-        # vector of rotation.
-        axis = up_axis.cross(v)
-        # Calculate Euler angles
-        euler = Matrix.Rotation(angle, 4, axis).to_euler()
-        # Create stick
-        bpy.ops.mesh.primitive_cylinder_add(vertices=Stick_sectors, 
-                                            radius=Stick_diameter, 
-                                            depth=v.length, 
-                                            end_fill_type='NGON', 
-                                            view_align=False, 
-                                            enter_editmode=False, 
-                                            location=location, 
-                                            rotation=(0, 0, 0), 
-                                            layers=current_layers)
-        # Put the stick into the scene ...
-        stick = bpy.context.scene.objects.active
-        # ... and rotate the stick.
-        stick.rotation_euler = euler
-        # ... and name
-        stick.name = "Stick_Cylinder"
-        counter += 1
-        
-        # Smooth the cylinder.
-        if use_sticks_smooth == True: 
-            bpy.ops.object.select_all(action='DESELECT')
-            stick.select = True
-            bpy.ops.object.shade_smooth()        
-        
-        list_group_sub.append(stick)
-        
-        if use_sticks_one_object == True:
-            if counter == use_sticks_one_object_nr:
-                bpy.ops.object.select_all(action='DESELECT')
-                for stick in list_group_sub:
-                    stick.select = True
-                bpy.ops.object.join()
-                list_group.append(bpy.context.scene.objects.active)
-                bpy.ops.object.select_all(action='DESELECT')
-                list_group_sub = []
-                counter = 0
+        atom1 = all_atoms[stick.atom1-1]
+        atom2 = all_atoms[stick.atom2-1]
+        location1 = atom1.location - center
+        location2 = atom2.location - center
+        if location1 == location2:
+            continue
+
+        if use_sticks_color == True and atom1.material and atom2.material:
+            material1 = material_index(atom1.material)
+            material2 = material_index(atom2.material)
+        else:
+            material1 = material2 = material_index(stick_material)
+
+        # Double and triple bonds are shifted sideways, like the
+        # dupliverts sticks.
+        if stick.number == 2:
+            shifts = (stick.dist * dist, stick.dist * (-dist))
+        elif stick.number == 3:
+            shifts = (stick.dist * dist, None, stick.dist * (-dist))
         else:
-            # Material ... 
-            stick.active_material = stick_material			
+            shifts = (None,)
+
+        for shift in shifts:
+            if shift is None:
+                sticks_list.append([location1, location2, 
+                                    material1, material2])
+            else:
+                sticks_list.append([location1 + shift, location2 + shift, 
+                                    material1, material2])
 
     if use_sticks_one_object == True:
-        bpy.ops.object.select_all(action='DESELECT')
-        for stick in list_group_sub:
-            stick.select = True
-        bpy.ops.object.join()
-        list_group.append(bpy.context.scene.objects.active)
-        bpy.ops.object.select_all(action='DESELECT')
-
-        for group in list_group:
-            group.select = True
-        bpy.ops.object.join() 
-        bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', 
-                                   center='MEDIAN')
-        sticks = bpy.context.scene.objects.active
-        sticks.active_material = stick_material
+        # The origin of the sticks object is the median of all sticks.
+        origin = Vector((0.0, 0.0, 0.0))
+        for stick in sticks_list:
+            origin += stick[0] + stick[1]
+        if sticks_list != []:
+            origin /= 2 * len(sticks_list)
+        for stick in sticks_list:
+            stick[0] = stick[0] - origin
+            stick[1] = stick[1] - origin
+
+        stick_mesh = build_sticks_mesh("Sticks", sticks_list, Stick_diameter,
+                                       sectors, use_sticks_smooth)
+        for material in materials:
+            stick_mesh.materials.append(material)
+        sticks = bpy.data.objects.new("Sticks", stick_mesh)
+        sticks.location = origin
+        bpy.context.scene.objects.link(sticks)
     else:
-        bpy.ops.object.empty_add(type='ARROWS', 
-                                  view_align=False, 
-                                  location=(0, 0, 0), 
-                                  rotation=(0, 0, 0), 
-                                  layers=current_layers)
-        sticks = bpy.context.scene.objects.active
-        for stick in list_group_sub:
+        sticks = bpy.data.objects.new("Sticks", None)
+        sticks.empty_draw_type = 'ARROWS'
+        bpy.context.scene.objects.link(sticks)
+
+        up_axis = Vector([0.0, 0.0, 1.0])
+        for location1, location2, material1, material2 in sticks_list:
+            # Location
+            location = (location1 + location2) * 0.5
+            # The difference of both vectors
+            v = (location2 - location1)
+            # Angle with respect to the z-axis
+            angle = v.angle(up_axis, 0)
+            # Cross-product between v and the z-axis vector. It is the 
+            # vector of rotation.
+            axis = up_axis.cross(v)
+            # Calculate Euler angles
+            euler = Matrix.Rotation(angle, 4, axis).to_euler()
+            # Create stick
+            half = Vector((0.0, 0.0, v.length / 2.0))
+            stick_mesh = build_sticks_mesh("Stick_Cylinder", 
+                                    [[-half, half, 0, int(material1 != material2)]],
+                                    Stick_diameter, sectors, use_sticks_smooth)
+            stick_mesh.materials.append(materials[material1])
+            if material1 != material2:
+                stick_mesh.materials.append(materials[material2])
+            stick = bpy.data.objects.new("Stick_Cylinder", stick_mesh)
+            # ... and rotate the stick.
+            stick.location = location
+            stick.rotation_euler = euler
             stick.parent = sticks
+            bpy.context.scene.objects.link(stick)
         
-    sticks.name = "Sticks"
     sticks.location += center
 
     return sticks
@@ -1136,8 +1304,10 @@ def import_pdb(Ball_type,
                use_sticks_color,
                use_sticks_smooth,
                use_sticks_bonds,
+               use_sticks_distance,
+               use_sticks_distance_merge,
+               Stick_tolerance,
                use_sticks_one_object,
-               use_sticks_one_object_nr,
                Stick_unit, Stick_dist,
                Stick_sectors,
                Stick_diameter,
@@ -1222,9 +1392,18 @@ def import_pdb(Ball_type,
     # ------------------------------------------------------------------------
     # READING DATA OF STICKS
 
-    all_sticks = read_pdb_file_sticks(filepath_pdb, 
-                                      use_sticks_bonds, 
-                                      all_atoms)
+    all_sticks, all_pairs = read_pdb_file_sticks(filepath_pdb, 
+                                                 use_sticks_bonds, 
+                                                 all_atoms)
+
+    # Most PDB files do not have any 'CONECT' records. If so, the sticks
+    # are found from the distances of the atoms. Optionally, this is also
+    # done for files with 'CONECT' records, which often list only a few
+    # bonds. The sticks from the 'CONECT' records are kept.
+    if (use_sticks == True and use_sticks_distance == True and
+        (all_sticks == [] or use_sticks_distance_merge == True)):
+        all_sticks += build_sticks_distance(all_atoms, Stick_tolerance,
+                                            all_pairs)
 
     #
     # So far, all atoms, sticks and materials have been registered.
@@ -1363,9 +1542,10 @@ def import_pdb(Ball_type,
                                     object_center_vec,
                                     Stick_diameter,
                                     Stick_sectors,
+                                    Stick_dist,
+                                    use_sticks_color,
                                     use_sticks_smooth,
-                                    use_sticks_one_object,
-                                    use_sticks_one_object_nr)
+                                    use_sticks_one_object)
         atom_object_list.append(sticks)
 
     # ------------------------------------------------------------------------
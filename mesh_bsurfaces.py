@@ -99,6 +99,44 @@ class VIEW3D_PT_tools_SURFSK_curve(bpy.types.Panel):
 
 
 
+#### Builds a KD-tree from a list of (coordinates, order, vert index) items. Each node is a tuple (item, axis, left node, right node).
+def kdtree_build(items, depth=0):
+    if not items:
+        return None
+    
+    axis = depth % 3
+    items = sorted(items, key=lambda item: item[0][axis])
+    median = len(items) // 2
+    
+    return (items[median], axis, kdtree_build(items[:median], depth + 1), kdtree_build(items[median + 1:], depth + 1))
+
+
+
+#### Returns [distance, order, vert index] of the item nearest to co. Ties go to the lowest order, like a linear scan through the items would do.
+def kdtree_nearest(node, co, best=None):
+    if node is None:
+        return best
+    
+    item, axis, left, right = node
+    dist = (co - item[0]).length
+    if best is None or dist < best[0] or (dist == best[0] and item[1] < best[1]):
+        best = [dist, item[1], item[2]]
+    
+    diff = co[axis] - item[0][axis]
+    if diff < 0:
+        near, far = left, right
+    else:
+        near, far = right, left
+    
+    best = kdtree_nearest(near, co, best)
+    # The other side can only have nearer items if the splitting plane is near enough.
+    if abs(diff) <= best[0]:
+        best = kdtree_nearest(far, co, best)
+    
+    return best
+
+
+
 #### Returns the type of strokes used.
 def get_strokes_type(main_object):
     strokes_type = ""
@@ -340,21 +378,30 @@ class GPENCIL_OT_SURFSK_add_surface(bpy.types.Operator):
     
     
         
+    #### Clears the KD-trees and edge face counts. The keys only hold element counts, so this is done at the start of every invoke and execute, as the mesh may have been edited in between.
+    def caches_clear(self):
+        self.verts_kdtrees = {}
+        self.edge_face_counts = {}
+        
+        
+    #### Returns a KD-tree with the world coordinates of the verts in verts_idx. It is built once per execution and reused by every query on the same verts.
+    def verts_kdtree(self, object, verts_idx):
+        if not hasattr(self, "verts_kdtrees"):
+            self.verts_kdtrees = {}
+        
+        key = (object.name, len(object.data.vertices), tuple(verts_idx))
+        if not key in self.verts_kdtrees:
+            matrix = object.matrix_world
+            vertices = object.data.vertices
+            items = [(matrix * vertices[v_idx].co, order, v_idx) for order, v_idx in enumerate(verts_idx)]
+            self.verts_kdtrees[key] = kdtree_build(items)
+        
+        return self.verts_kdtrees[key]
+        
+        
     #### Calculate the which vert of verts_idx list is the nearest one to the point_co coordinates, and the distance.
     def shortest_distance(self, object, point_co, verts_idx):
-        matrix = object.matrix_world
-        
-        for i in range(0, len(verts_idx)):
-            dist = (point_co - matrix * object.data.vertices[verts_idx[i]].co).length
-            if i == 0:
-                prev_dist = dist
-                nearest_vert_idx = verts_idx[i]
-                shortest_dist = dist
-                
-            if dist < prev_dist:
-                prev_dist = dist
-                nearest_vert_idx = verts_idx[i]
-                shortest_dist = dist
+        shortest_dist, order, nearest_vert_idx = kdtree_nearest(self.verts_kdtree(object, verts_idx), point_co)
                     
         return nearest_vert_idx, shortest_dist
         
@@ -493,35 +540,26 @@ class GPENCIL_OT_SURFSK_add_surface(bpy.types.Operator):
     
     
     
-    #### Counts the number of faces that belong to each edge.
+    #### Counts the number of faces that belong to each edge. The counts are kept until the element counts change (or the caches are cleared).
     def edge_face_count(self, ob):
-        ed_keys_count_dict = {}
-        
-        for face in ob.data.polygons:
-            for ed_keys in face.edge_keys:
-                if not ed_keys in ed_keys_count_dict:
-                    ed_keys_count_dict[ed_keys] = 1
-                else:
-                    ed_keys_count_dict[ed_keys] += 1
-        
-        
-        edge_face_count = []
-        for i in range(len(ob.data.edges)):
-            edge_face_count.append(0)
+        if not hasattr(self, "edge_face_counts"):
+            self.edge_face_counts = {}
         
-        for i in range(len(ob.data.edges)):
-            ed = ob.data.edges[i]
+        me = ob.data
+        key = (ob.name, len(me.vertices), len(me.edges), len(me.polygons), len(me.loops))
+        if not key in self.edge_face_counts:
+            # Every loop of a face uses one of its edges.
+            loops_edges = [0] * len(me.loops)
+            me.loops.foreach_get("edge_index", loops_edges)
             
-            v1 = ed.vertices[0]
-            v2 = ed.vertices[1]
+            edge_face_count = [0] * len(me.edges)
+            for ed_idx in loops_edges:
+                edge_face_count[ed_idx] += 1
             
-            if (v1, v2) in ed_keys_count_dict:
-                edge_face_count[i] = ed_keys_count_dict[(v1, v2)]
-            elif (v2, v1) in ed_keys_count_dict:
-                edge_face_count[i] = ed_keys_count_dict[(v2, v1)]
+            self.edge_face_counts[key] = edge_face_count
         
         
-        return edge_face_count
+        return list(self.edge_face_counts[key])
     
     
     
@@ -2861,6 +2899,7 @@ class GPENCIL_OT_SURFSK_add_surface(bpy.types.Operator):
         
         
     def execute(self, context):
+        self.caches_clear()
         bpy.context.user_preferences.edit.use_global_undo = False
         
         if not self.is_fill_faces:
@@ -2942,6 +2981,7 @@ class GPENCIL_OT_SURFSK_add_surface(bpy.types.Operator):
         
         
     def invoke(self, context, event):
+        self.caches_clear()
         self.initial_global_undo_state = bpy.context.user_preferences.edit.use_global_undo
         
         self.main_object = bpy.context.scene.objects.active
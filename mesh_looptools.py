@@ -31,6 +31,7 @@ bl_info = {
     "category": "Mesh"}
 
 
+import bisect
 import bmesh
 import bpy
 import collections
@@ -46,6 +47,8 @@ from bpy_extras import view3d_utils
 
 # used by all tools to improve speed on reruns
 looptools_cache = {}
+# adjacency dictionaries and parallel loops, shared by all tools
+looptools_topology = {}
 
 
 # force a full recalculation next time
@@ -54,6 +57,34 @@ def cache_delete(tool):
         del looptools_cache[tool]
 
 
+# cached adjacency dictionary of bm, calculated by function(bm, *args)
+def cache_dict(bm, function, *args):
+    if looptools_topology.get("fingerprint") != topology_fingerprint(bm):
+        looptools_topology.clear()
+        looptools_topology["fingerprint"] = topology_fingerprint(bm)
+    name = function.__name__
+    if name not in looptools_topology:
+        looptools_topology[name] = function(bm, *args)
+    
+    return(looptools_topology[name])
+
+
+# drop the adjacency data, the tool caches are validated by their
+# fingerprint, which includes the selection
+def cache_invalidate():
+    looptools_topology.clear()
+
+
+# a new invocation, or a call from a script, can follow any edit (also ones
+# which keep the element counts). The adjacency data is only kept for a redo
+# (or repeat) of the last registered operator, nothing was registered since
+def cache_check_redo(operator, context):
+    operators = context.window_manager.operators
+    if not operators or \
+    operators[-1].as_pointer() != operator.as_pointer():
+        cache_invalidate()
+
+
 # check cache for stored information
 def cache_read(tool, object, bm, input_method, boundaries):
     # current tool not cached yet
@@ -71,8 +102,10 @@ def cache_read(tool, object, bm, input_method, boundaries):
         and mod.type == 'MIRROR']
     if modifiers != looptools_cache[tool]["modifiers"]:
         return(False, False, False, False, False)
-    input = [v.index for v in bm.verts if v.select and not v.hide]
-    if input != looptools_cache[tool]["input"]:
+    if cache_fingerprint(object, bm) != looptools_cache[tool]["fingerprint"]:
+        return(False, False, False, False, False)
+    # only scan the vertices when everything else matches
+    if cache_input(bm) != looptools_cache[tool]["input"]:
         return(False, False, False, False, False)
     # reading values
     single_loops = looptools_cache[tool]["single_loops"]
@@ -90,14 +123,26 @@ loops, derived, mapping):
     if tool in looptools_cache:
         del looptools_cache[tool]
     # prepare values to be saved to cache
-    input = [v.index for v in bm.verts if v.select and not v.hide]
     modifiers = [mod.name for mod in object.modifiers if mod.show_viewport \
         and mod.type == 'MIRROR']
     # update cache
-    looptools_cache[tool] = {"input": input, "object": object.name,
+    looptools_cache[tool] = {"input": cache_input(bm), "object": object.name,
         "input_method": input_method, "boundaries": boundaries,
         "single_loops": single_loops, "loops": loops,
-        "derived": derived, "mapping": mapping, "modifiers": modifiers}
+        "derived": derived, "mapping": mapping, "modifiers": modifiers,
+        "fingerprint": cache_fingerprint(object, bm)}
+
+
+# cheap summary of the topology and selection of the edit-mesh
+def cache_fingerprint(object, bm):
+    mesh = object.data
+    return(topology_fingerprint(bm) + (mesh.total_vert_sel,
+        mesh.total_edge_sel, mesh.total_face_sel))
+
+
+# selected vertices, tells apart different selections of the same size
+def cache_input(bm):
+    return(tuple(v.index for v in bm.verts if v.select and not v.hide))
 
 
 # calculates natural cubic splines through all given knots
@@ -146,30 +191,24 @@ def calculate_cubic_splines(bm_mod, tknots, knots):
         return False
     x = tknots[:]
     locs = [bm_mod.verts[k].co[:] for k in knots]
+    h = [(x[i+1] - x[i]) or 1e-8 for i in range(n-1)]
+    # the tridiagonal matrix only depends on the parameters, so it is
+    # factorised once and the three coordinates are solved with it
+    l = [1.0]
+    u = [0.0]
+    for i in range(1, n-1):
+        l.append(2*(x[i+1]-x[i-1]) - h[i-1]*u[i-1])
+        if l[i] == 0:
+            l[i] = 1e-8
+        u.append(h[i] / l[i])
+    l.append(1.0)
     result = []
     for j in range(3):
-        a = []
-        for i in locs:
-            a.append(i[j])
-        h = []
-        for i in range(n-1):
-            if x[i+1] - x[i] == 0:
-                h.append(1e-8)
-            else:
-                h.append(x[i+1] - x[i])
-        q = [False]
-        for i in range(1, n-1):
-            q.append(3/h[i]*(a[i+1]-a[i]) - 3/h[i-1]*(a[i]-a[i-1]))
-        l = [1.0]
-        u = [0.0]
+        a = [loc[j] for loc in locs]
         z = [0.0]
         for i in range(1, n-1):
-            l.append(2*(x[i+1]-x[i-1]) - h[i-1]*u[i-1])
-            if l[i] == 0:
-                l[i] = 1e-8
-            u.append(h[i] / l[i])
-            z.append((q[i] - h[i-1] * z[i-1]) / l[i])
-        l.append(1.0)
+            q = 3/h[i]*(a[i+1]-a[i]) - 3/h[i-1]*(a[i]-a[i-1])
+            z.append((q - h[i-1] * z[i-1]) / l[i])
         z.append(0.0)
         b = [False for i in range(n-1)]
         c = [False for i in range(n)]
@@ -292,6 +331,51 @@ def calculate_splines(interpolation, bm_mod, tknots, knots):
     return(splines)
 
 
+# evaluate the splines at the parameters tpoints of the given points
+def calculate_spline_locations(interpolation, splines, tknots, points,
+tpoints):
+    # segments are found by bisection when the knots are sorted, which is
+    # only not the case for the extension of very short circular loops
+    ordered = all(tknots[i] <= tknots[i+1] for i in range(len(tknots)-1))
+    last = len(splines) - 1
+    first_index = {}
+    for i, p in enumerate(points):
+        first_index.setdefault(p, i)
+    locations = []
+    for p in points:
+        m = tpoints[first_index[p]]
+        if ordered:
+            n = bisect.bisect_left(tknots, m)
+            if n == len(tknots) or tknots[n] != m:
+                n -= 1
+        elif m in tknots:
+            n = tknots.index(m)
+        else:
+            t = tknots[:]
+            t.append(m)
+            t.sort()
+            n = t.index(m) - 1
+        if n > last:
+            n = last
+        elif n < 0:
+            n = 0
+        
+        if interpolation == 'cubic':
+            sx, sy, sz = splines[n]
+            dt = m - sx[4]
+            x = sx[0] + dt*(sx[1] + dt*(sx[2] + dt*sx[3]))
+            y = sy[0] + dt*(sy[1] + dt*(sy[2] + dt*sy[3]))
+            z = sz[0] + dt*(sz[1] + dt*(sz[2] + dt*sz[3]))
+            locations.append([p, mathutils.Vector([x,y,z])])
+        else: # interpolation == 'linear'
+            a, d, t, u = splines[n]
+            if u == 0:
+                u = 1e-8
+            locations.append([p, ((m-t)/u)*d + a])
+    
+    return(locations)
+
+
 # check loops and only return valid ones
 def check_loops(loops, mapping, bm_mod):
     valid_loops = []
@@ -526,6 +610,30 @@ def get_mapping(derived, bm, bm_mod, single_vertices, full_search, loops):
     if not derived:
         return(False)
     
+    # derived vertices are looked up in a grid with cells of the matching
+    # distance, so only the neighbouring cells need to be checked
+    limit = 1e-6
+    def cell(co):
+        return(int(co[0] // limit), int(co[1] // limit), int(co[2] // limit))
+    def build_grid(verts_mod):
+        grid = {}
+        for order, v_mod in enumerate(verts_mod):
+            grid.setdefault(cell(v_mod.co), []).append((order, v_mod))
+        return(grid)
+    def find_match(grid, v):
+        # first vertex in input order that lies within the limit of v
+        x, y, z = cell(v.co)
+        match = False
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for order, v_mod in grid.get((x+dx, y+dy, z+dz), ()):
+                        if match and order > match[0]:
+                            continue
+                        if (v.co - v_mod.co).length < limit:
+                            match = (order, v_mod)
+        return(match)
+    
     if full_search:
         verts = [v for v in bm.verts if not v.hide]
     else:
@@ -534,23 +642,23 @@ def get_mapping(derived, bm, bm_mod, single_vertices, full_search, loops):
     # non-selected vertices around single vertices also need to be mapped
     if single_vertices:
         mapping = dict([[vert, -1] for vert in single_vertices])
-        verts_mod = [bm_mod.verts[vert] for vert in single_vertices]
+        grid = build_grid([bm_mod.verts[vert] for vert in single_vertices])
         for v in verts:
-            for v_mod in verts_mod:
-                if (v.co - v_mod.co).length < 1e-6:
-                    mapping[v_mod.index] = v.index
-                    break
-        real_singles = [v_real for v_real in mapping.values() if v_real>-1]
+            match = find_match(grid, v)
+            if match:
+                mapping[match[1].index] = v.index
+        real_singles = set([v_real for v_real in mapping.values() if \
+            v_real>-1])
         
-        verts_indices = [vert.index for vert in verts]
+        verts_indices = set([vert.index for vert in verts])
         for face in [face for face in bm.faces if not face.select \
         and not face.hide]:
             for vert in face.verts:
                 if vert.index in real_singles:
                     for v in face.verts:
                         if not v.index in verts_indices:
-                            if v not in verts:
-                                verts.append(v)
+                            verts.append(v)
+                            verts_indices.add(v.index)
                     break
     
     # create mapping of derived indices to indices
@@ -558,22 +666,37 @@ def get_mapping(derived, bm, bm_mod, single_vertices, full_search, loops):
     if single_vertices:
         for single in single_vertices:
             mapping[single] = -1
-    verts_mod = [bm_mod.verts[i] for i in mapping.keys()]
+    grid = build_grid([bm_mod.verts[i] for i in mapping.keys()])
     for v in verts:
-        for v_mod in verts_mod:
-            if (v.co - v_mod.co).length < 1e-6:
-                mapping[v_mod.index] = v.index
-                verts_mod.remove(v_mod)
-                break
+        match = find_match(grid, v)
+        if match:
+            mapping[match[1].index] = v.index
+            grid[cell(match[1].co)].remove(match)
     
     return(mapping)
 
 
 # returns a list of all loops parallel to the input, input included
 def get_parallel_loops(bm_mod, loops):
+    # reuse the result of an earlier call with the same input
+    key = tuple((tuple(loop[0]), loop[1]) for loop in loops)
+    parallel = cache_dict(bm_mod, dict_parallel_loops)
+    if key not in parallel:
+        parallel[key] = calculate_parallel_loops(bm_mod, loops)
+    
+    return([[loop[:], circular] for loop, circular in parallel[key]])
+
+
+# input: bmesh, output: empty dict to store parallel loops in
+def dict_parallel_loops(bm):
+    return({})
+
+
+# find the loops parallel to the input, input included
+def calculate_parallel_loops(bm_mod, loops):
     # get required dictionaries
-    edge_faces = dict_edge_faces(bm_mod)
-    connected_faces = dict_face_faces(bm_mod, edge_faces)
+    edge_faces = cache_dict(bm_mod, dict_edge_faces)
+    connected_faces = cache_dict(bm_mod, dict_face_faces, edge_faces)
     # turn vertex loops into edge loops
     edgeloops = []
     for loop in loops:
@@ -761,6 +884,11 @@ def terminate(global_undo):
     context.user_preferences.edit.use_global_undo = global_undo
 
 
+# element counts of a bmesh, they change with almost every topology edit
+def topology_fingerprint(bm):
+    return((len(bm.verts), len(bm.edges), len(bm.faces)))
+
+
 ##########################################
 ####### Bridge functions #################
 ##########################################
@@ -1706,8 +1834,8 @@ def circle_calculate_verts(flatten, bm_mod, locs_2d, com, p, q, normal):
         return(locs_3d)
     
     else: # project the locations on the existing mesh
-        vert_edges = dict_vert_edges(bm_mod)
-        vert_faces = dict_vert_faces(bm_mod)
+        vert_edges = cache_dict(bm_mod, dict_vert_edges)
+        vert_faces = cache_dict(bm_mod, dict_vert_faces)
         faces = [f for f in bm_mod.faces if not f.hide]
         rays = [normal, -normal]
         new_locs = []
@@ -2182,8 +2310,8 @@ def curve_get_input(object, bm, boundaries, scene):
     verts_unsorted = [v.index for v in bm_mod.verts if \
         v.select and not v.hide]
     # necessary dictionaries
-    vert_edges = dict_vert_edges(bm_mod)
-    edge_faces = dict_edge_faces(bm_mod)
+    vert_edges = cache_dict(bm_mod, dict_vert_edges)
+    edge_faces = cache_dict(bm_mod, dict_edge_faces)
     correct_loops = []
     
     # find loops through each selected vertex
@@ -2498,7 +2626,7 @@ def gstretch_calculate_verts(loop, stroke, object, bm_mod, method):
     
     if method == 'project':
         projection_vectors = []
-        vert_edges = dict_vert_edges(bm_mod)
+        vert_edges = cache_dict(bm_mod, dict_vert_edges)
         
         for v_index in loop[0]:
             for ek in vert_edges[v_index]:
@@ -2746,38 +2874,11 @@ def relax_calculate_t(bm_mod, knots, points, regular):
 # change the location of the points to their place on the spline
 def relax_calculate_verts(bm_mod, interpolation, tknots, knots, tpoints,
 points, splines):
-    change = []
     move = []
     for i in range(len(knots)):
-        for p in points[i]:
-            m = tpoints[i][points[i].index(p)]
-            if m in tknots[i]:
-                n = tknots[i].index(m)
-            else:
-                t = tknots[i][:]
-                t.append(m)
-                t.sort()
-                n = t.index(m)-1
-            if n > len(splines[i]) - 1:
-                n = len(splines[i]) - 1
-            elif n < 0:
-                n = 0
-            
-            if interpolation == 'cubic':
-                ax, bx, cx, dx, tx = splines[i][n][0]
-                x = ax + bx*(m-tx) + cx*(m-tx)**2 + dx*(m-tx)**3
-                ay, by, cy, dy, ty = splines[i][n][1]
-                y = ay + by*(m-ty) + cy*(m-ty)**2 + dy*(m-ty)**3
-                az, bz, cz, dz, tz = splines[i][n][2]
-                z = az + bz*(m-tz) + cz*(m-tz)**2 + dz*(m-tz)**3
-                change.append([p, mathutils.Vector([x,y,z])])
-            else: # interpolation == 'linear'
-                a, d, t, u = splines[i][n]
-                if u == 0:
-                    u = 1e-8
-                change.append([p, ((m-t)/u)*d + a])
-    for c in change:
-        move.append([c[0], (bm_mod.verts[c[0]].co + c[1]) / 2])
+        for p, loc in calculate_spline_locations(interpolation, splines[i],
+        tknots[i], points[i], tpoints[i]):
+            move.append([p, (bm_mod.verts[p].co + loc) / 2])
     
     return(move)
 
@@ -2808,34 +2909,8 @@ def space_calculate_t(bm_mod, knots):
 # change the location of the points to their place on the spline
 def space_calculate_verts(bm_mod, interpolation, tknots, tpoints, points,
 splines):
-    move = []
-    for p in points:
-        m = tpoints[points.index(p)]
-        if m in tknots:
-            n = tknots.index(m)
-        else:
-            t = tknots[:]
-            t.append(m)
-            t.sort()
-            n = t.index(m) - 1
-        if n > len(splines) - 1:
-            n = len(splines) - 1
-        elif n < 0:
-            n = 0
-        
-        if interpolation == 'cubic':
-            ax, bx, cx, dx, tx = splines[n][0]
-            x = ax + bx*(m-tx) + cx*(m-tx)**2 + dx*(m-tx)**3
-            ay, by, cy, dy, ty = splines[n][1]
-            y = ay + by*(m-ty) + cy*(m-ty)**2 + dy*(m-ty)**3
-            az, bz, cz, dz, tz = splines[n][2]
-            z = az + bz*(m-tz) + cz*(m-tz)**2 + dz*(m-tz)**3
-            move.append([p, mathutils.Vector([x,y,z])])
-        else: # interpolation == 'linear'
-            a, d, t, u = splines[n]
-            move.append([p, ((m-t)/u)*d + a])
-    
-    return(move)
+    return(calculate_spline_locations(interpolation, splines, tknots, points,
+        tpoints))
 
 
 ##########################################
@@ -2940,6 +3015,7 @@ class Bridge(bpy.types.Operator):
     
     def execute(self, context):
         # initialise
+        cache_check_redo(self, context)
         global_undo, object, bm = initialise()
         edge_faces, edgekey_to_edge, old_selected_faces, smooth = \
             bridge_initialise(bm, self.interpolation)
@@ -3079,6 +3155,7 @@ class Circle(bpy.types.Operator):
     
     def execute(self, context):
         # initialise
+        cache_check_redo(self, context)
         global_undo, object, bm = initialise()
         settings_write(self)
         # check cache to see if we can save time
@@ -3204,6 +3281,7 @@ class Curve(bpy.types.Operator):
     
     def execute(self, context):
         # initialise
+        cache_check_redo(self, context)
         global_undo, object, bm = initialise()
         settings_write(self)
         # check cache to see if we can save time
@@ -3300,6 +3378,7 @@ class Flatten(bpy.types.Operator):
     
     def execute(self, context):
         # initialise
+        cache_check_redo(self, context)
         global_undo, object, bm = initialise()
         settings_write(self)
         # check cache to see if we can save time
@@ -3384,6 +3463,7 @@ class GStretch(bpy.types.Operator):
     
     def execute(self, context):
         # initialise
+        cache_check_redo(self, context)
         global_undo, object, bm = initialise()
         settings_write(self)
         
@@ -3480,6 +3560,7 @@ class Relax(bpy.types.Operator):
     
     def execute(self, context):
         # initialise
+        cache_check_redo(self, context)
         global_undo, object, bm = initialise()
         settings_write(self)
         # check cache to see if we can save time
@@ -3568,6 +3649,7 @@ class Space(bpy.types.Operator):
     
     def execute(self, context):
         # initialise
+        cache_check_redo(self, context)
         global_undo, object, bm = initialise()
         settings_write(self)
         # check cache to see if we can save time
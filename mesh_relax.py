@@ -49,46 +49,63 @@ Additional links:
 
 import bpy
 from bpy.props import IntProperty
+from mathutils import Vector
 
-def relax_mesh(context):
-
-    # deselect everything that's not related
-    for obj in context.selected_objects:
-        obj.select = False
-
-    # get active object
+def relax_mesh(context, iterations=1):
+    # the mesh data is only up to date outside of edit mode
     obj = context.active_object
-
-    # duplicate the object so it can be used for the shrinkwrap modifier
-    obj.select = True # make sure the object is selected!
     bpy.ops.object.mode_set(mode='OBJECT')
-    bpy.ops.object.duplicate()
-    target = context.active_object
-
-    # remove all other modifiers from the target
-    for m in range(0, len(target.modifiers)):
-        target.modifiers.remove(target.modifiers[0])
-
-    context.scene.objects.active = obj
-    
-    sw = obj.modifiers.new(type='SHRINKWRAP', name='relax_target')
-    sw.target = target
-    
-    # run smooth operator to relax the mesh
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.vertices_smooth()
-    bpy.ops.object.mode_set(mode='OBJECT')
-
-    # apply the modifier
-    bpy.ops.object.modifier_apply(modifier='relax_target')
-    
-    # delete the target object
-    obj.select = False
-    target.select = True
-    bpy.ops.object.delete()
-    
-    # go back to initial state
-    obj.select = True
+    mesh = obj.data
+
+    count = len(mesh.vertices)
+    co = [0.0] * (count * 3)
+    mesh.vertices.foreach_get('co', co)
+    select = [False] * count
+    mesh.vertices.foreach_get('select', select)
+    hide = [False] * count
+    mesh.vertices.foreach_get('hide', hide)
+    edges = [0] * (len(mesh.edges) * 2)
+    mesh.edges.foreach_get('vertices', edges)
+
+    neighbours = [[] for i in range(count)]
+    for a, b in zip(edges[0::2], edges[1::2]):
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    relaxed = [i for i in range(count)
+               if select[i] and not hide[i] and neighbours[i]]
+
+    # the positions are projected back on the mesh without modifiers, the
+    # mesh itself is only changed at the end so it stays the original surface
+    shown = [m for m in obj.modifiers if m.show_viewport]
+    for m in shown:
+        m.show_viewport = False
+    context.scene.update()
+    try:
+        for iteration in range(iterations):
+            # move each vertex halfway to the average of its neighbours,
+            # like the smooth vertex tool does
+            smoothed = []
+            for i in relaxed:
+                x = y = z = 0.0
+                for j in neighbours[i]:
+                    x += co[3 * j]
+                    y += co[3 * j + 1]
+                    z += co[3 * j + 2]
+                k = 2.0 * len(neighbours[i])
+                smoothed.append((co[3 * i] / 2.0 + x / k,
+                                 co[3 * i + 1] / 2.0 + y / k,
+                                 co[3 * i + 2] / 2.0 + z / k))
+            for i, loc in zip(relaxed, smoothed):
+                nearest, normal, face = obj.closest_point_on_mesh(Vector(loc))
+                if face != -1:
+                    loc = nearest
+                co[3 * i:3 * i + 3] = loc[:]
+    finally:
+        for m in shown:
+            m.show_viewport = True
+
+    mesh.vertices.foreach_set('co', co)
+    mesh.update()
     bpy.ops.object.mode_set(mode='EDIT')
 
 class Relax(bpy.types.Operator):
@@ -107,8 +124,7 @@ class Relax(bpy.types.Operator):
         return (obj and obj.type == 'MESH')
 
     def execute(self, context):
-        for i in range(0,self.iterations):
-            relax_mesh(context)
+        relax_mesh(context, self.iterations)
         return {'FINISHED'}
 
 
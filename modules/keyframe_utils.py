@@ -0,0 +1,127 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8-80 compliant>
+
+"""
+    keyframe_utils.py
+
+    Bulk F-Curve keying for importers.
+
+    keyframe_insert() updates the F-Curve (and searches it for the frame)
+    on every call, which makes long animations very slow to import.
+    KeyframeWriter collects the values of every channel first and writes
+    each F-Curve in one pass, with pre-sized keyframe_points.
+"""
+
+from array import array
+
+import bpy
+
+
+def ensure_action(id_data, name=None):
+    """Return the action of id_data, creating one when needed."""
+    anim_data = id_data.animation_data
+    if anim_data is None:
+        anim_data = id_data.animation_data_create()
+    if anim_data.action is None:
+        anim_data.action = bpy.data.actions.new(
+            name or id_data.name + "Action")
+    return anim_data.action
+
+
+class KeyframeWriter:
+    """
+        Collect keyframes per F-Curve channel and write them to an action.
+
+        Keys of a channel have to be added in increasing frame order, a key
+        added again on the last frame replaces the previous value (like
+        keyframe_insert() does).
+    """
+
+    def __init__(self, action):
+        self.action = action
+        # (data_path, index) -> [group, frames, values]
+        self.channels = {}
+
+    def add(self, data_path, frame, values, group=None):
+        """Key every component of values, indices 0..n-1 of data_path."""
+        channels = self.channels
+        for index, value in enumerate(values):
+            channel = channels.get((data_path, index))
+            if channel is None:
+                channel = channels[data_path, index] = \
+                    [group, array('d'), array('d')]
+            frames = channel[1]
+            if frames and frames[-1] == frame:
+                channel[2][-1] = value
+            else:
+                frames.append(frame)
+                channel[2].append(value)
+
+    def add_channel(self, data_path, index, frames, values, group=None):
+        """Key a whole channel at once from frame and value sequences."""
+        self.channels[data_path, index] = \
+            [group, array('d', frames), array('d', values)]
+
+    def add_property(self, struct, prop, frame, group=None):
+        """Key the current value of struct.prop, as keyframe_insert() would."""
+        value = getattr(struct, prop)
+        if not hasattr(value, "__len__"):
+            value = (value,)
+        self.add(struct.path_from_id(prop), frame, value, group)
+
+    def write(self, interpolation=None):
+        """Write all collected channels and clear them."""
+        fcurves = self.action.fcurves
+        existing = {(fc.data_path, fc.array_index): fc for fc in fcurves}
+        for (data_path, index), (group, frames, values) in \
+                self.channels.items():
+            fcurve = existing.get((data_path, index))
+            if fcurve is None:
+                if group:
+                    fcurve = fcurves.new(data_path, index=index,
+                                         action_group=group)
+                else:
+                    fcurve = fcurves.new(data_path, index=index)
+            points = fcurve.keyframe_points
+            co = [0.0] * (len(frames) * 2)
+            co[0::2] = frames
+            co[1::2] = values
+            if len(points):
+                # Keep the keys already there, update() sorts them in,
+                # except on the frames written again (they're replaced).
+                old = [0.0] * (len(points) * 2)
+                points.foreach_get("co", old)
+                # (compared in single precision, like the stored keys)
+                frames_new = set(array('f', frames))
+                co = [c for i in range(0, len(old), 2)
+                      if old[i] not in frames_new
+                      for c in old[i:i + 2]] + co
+            count = len(co) // 2 - len(points)
+            if count > 0:
+                points.add(count)
+            else:
+                for i in range(-count):
+                    points.remove(points[-1])
+            points.foreach_set("co", co)
+            if interpolation:
+                for point in points:
+                    point.interpolation = interpolation
+            fcurve.update()
+        self.channels.clear()
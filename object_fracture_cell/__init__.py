@@ -63,6 +63,7 @@ def main_object(scene, obj, level, **kw):
     use_interior_vgroup = kw_copy.pop("use_interior_vgroup")
     use_sharp_edges = kw_copy.pop("use_sharp_edges")
     use_sharp_edges_apply = kw_copy.pop("use_sharp_edges_apply")
+    use_convex_clip = kw_copy.pop("use_convex_clip")
 
     if level != 0:
         kw_copy["source_limit"] = recursion_source_limit
@@ -76,14 +77,25 @@ def main_object(scene, obj, level, **kw):
         obj_draw_type_prev = obj.draw_type
         obj.draw_type = 'WIRE'
     
-    objects = fracture_cell_setup.cell_fracture_objects(scene, obj, **kw_copy)
-    objects = fracture_cell_setup.cell_fracture_boolean(scene, obj, objects,
-                                                        use_island_split=use_island_split,
+    # convex meshes can be clipped by their planes, no need for a boolean
+    convex_planes = None
+    if use_convex_clip:
+        convex_planes = fracture_cell_setup.convex_planes_from_object(obj)
+
+    objects = fracture_cell_setup.cell_fracture_objects(scene, obj,
+                                                        convex_planes=convex_planes,
                                                         use_interior_hide=(use_interior_vgroup or use_sharp_edges),
-                                                        use_debug_bool=use_debug_bool,
-                                                        use_debug_redraw=kw_copy["use_debug_redraw"],
-                                                        level=level,
-                                                        )
+                                                        **kw_copy)
+    if convex_planes is None:
+        objects = fracture_cell_setup.cell_fracture_boolean(scene, obj, objects,
+                                                            use_island_split=use_island_split,
+                                                            use_interior_hide=(use_interior_vgroup or use_sharp_edges),
+                                                            use_debug_bool=use_debug_bool,
+                                                            use_debug_redraw=kw_copy["use_debug_redraw"],
+                                                            level=level,
+                                                            )
+    elif use_island_split and kw_copy["use_mesh_single"]:
+        objects = fracture_cell_setup.cell_fracture_island_split(scene, objects)
 
     # must apply after boolean.
     if use_recenter:
@@ -284,6 +296,14 @@ class FractureCell(Operator):
             default=(1.0, 1.0, 1.0),
             )
 
+    processes = IntProperty(
+            name="Processes",
+            description="Number of processes to calculate the cells with, "
+                        "0 for one per CPU (Linux or background mode only)",
+            min=0, max=64,
+            default=1,
+            )
+
     # -------------------------------------------------------------------------
     # Recursion
 
@@ -365,6 +385,20 @@ class FractureCell(Operator):
             default=0.001,
             )
 
+    use_mesh_single = BoolProperty(
+            name="Single Mesh",
+            description="Create all shards as islands of one mesh "
+                        "(use Split Islands to get separate objects)",
+            default=False,
+            )
+
+    use_convex_clip = BoolProperty(
+            name="Convex Clip",
+            description="Clip shards by the faces of convex meshes "
+                        "instead of using a boolean modifier",
+            default=False,
+            )
+
     material_index = IntProperty(
             name="Material",
             description="Material index for interior faces",
@@ -481,6 +515,8 @@ class FractureCell(Operator):
         rowsub.prop(self, "source_noise")
         rowsub = col.row()
         rowsub.prop(self, "cell_scale")
+        rowsub = col.row()
+        rowsub.prop(self, "processes")
 
         box = layout.box()
         col = box.column()
@@ -510,6 +546,9 @@ class FractureCell(Operator):
         # could be own section, control how we subdiv        
         rowsub.prop(self, "margin")
         rowsub.prop(self, "use_island_split")
+        rowsub = col.row()
+        rowsub.prop(self, "use_mesh_single")
+        rowsub.prop(self, "use_convex_clip")
 
 
         box = layout.box()
@@ -21,20 +21,239 @@
 # Script copyright (C) Blender Foundation 2012
 
 
+class KDTree:
+    """
+    Static KD-tree, used to stream the nearest points in order of distance.
+    """
+    LEAF_SIZE = 8
+
+    def __init__(self, points):
+        self.points = points = [tuple(p[:3]) for p in points]
+        # nodes are (bounds_min, bounds_max, child_a, child_b, indices)
+        self.nodes = nodes = []
+
+        if not points:
+            return
+
+        def node_add(indices):
+            cos = [points[i] for i in indices]
+            bounds_min = tuple(min(co[axis] for co in cos) for axis in range(3))
+            bounds_max = tuple(max(co[axis] for co in cos) for axis in range(3))
+            nodes.append([bounds_min, bounds_max, -1, -1, indices])
+            return len(nodes) - 1
+
+        stack = [node_add(list(range(len(points))))]
+        while stack:
+            node = nodes[stack.pop()]
+            indices = node[4]
+            if len(indices) <= self.LEAF_SIZE:
+                continue
+            bounds_min, bounds_max = node[0], node[1]
+            extent = [bounds_max[axis] - bounds_min[axis] for axis in range(3)]
+            axis = extent.index(max(extent))
+            if extent[axis] == 0.0:
+                continue
+            indices.sort(key=lambda i: points[i][axis])
+            mid = len(indices) // 2
+            node[2] = node_add(indices[:mid])
+            node[3] = node_add(indices[mid:])
+            node[4] = None
+            stack.append(node[2])
+            stack.append(node[3])
+
+    def nearest_iter(self, co):
+        """
+        Yield (index, distance_squared) pairs of the points,
+        nearest first, evaluated lazily so the caller can stop early.
+        """
+        from heapq import heappush, heappop
+
+        points = self.points
+        nodes = self.nodes
+        x, y, z = co[:3]
+
+        def node_distance_sq(node):
+            bounds_min, bounds_max = node[0], node[1]
+            d = 0.0
+            for axis, value in ((0, x), (1, y), (2, z)):
+                if value < bounds_min[axis]:
+                    d += (bounds_min[axis] - value) ** 2
+                elif value > bounds_max[axis]:
+                    d += (value - bounds_max[axis]) ** 2
+            return d
+
+        if not nodes:
+            return
+
+        # (distance_squared, is_node, index), points sort before nodes
+        heap = [(node_distance_sq(nodes[0]), True, 0)]
+        while heap:
+            distance_sq, is_node, index = heappop(heap)
+            if not is_node:
+                yield index, distance_sq
+                continue
+
+            node = nodes[index]
+            if node[4] is None:
+                for child in node[2:4]:
+                    heappush(heap, (node_distance_sq(nodes[child]), True, child))
+            else:
+                for i in node[4]:
+                    px, py, pz = points[i]
+                    heappush(heap, ((px - x) ** 2 + (py - y) ** 2 + (pz - z) ** 2, False, i))
+
+
+def points_as_bmesh_cell(index,
+                         points,
+                         points_tree,
+                         convexPlanes,
+                         points_scale=None,
+                         margin_cell=0.0):
+    """
+    Calculate the vertices of the cell around points[index],
+    relative to the point, an empty list when there is no cell.
+    """
+    from math import sqrt
+    import mathutils
+
+    # number of planes added between points_in_planes() calls,
+    # enough for most cells to be calculated in one go.
+    PLANES_BATCH = 16
+
+    plane_indices = []
+    vertices = []
+
+    point_cell_current = points[index]
+
+    planes = [None] * len(convexPlanes)
+    for j in range(len(convexPlanes)):
+        planes[j] = convexPlanes[j].copy()
+        planes[j][3] += planes[j].xyz.dot(point_cell_current)
+    distance_max = 10000000000.0  # a big value!
+
+    def planes_clip():
+        # updates the cell vertices and returns the distance past
+        # which the plane of a point can't clip the cell any more.
+        vertices[:], plane_indices[:] = mathutils.geometry.points_in_planes(planes)
+        if len(vertices) == 0:
+            return 0.0
+
+        if len(plane_indices) != len(planes):
+            planes[:] = [planes[k] for k in plane_indices]
+
+        # for comparisons use length_squared and delay
+        # converting to a real length until the end.
+        distance_max = 0.0
+        for v in vertices:
+            distance = v.length_squared
+            if distance_max < distance:
+                distance_max = distance
+        distance_max = sqrt(distance_max)  # make real length
+        return (distance_max + margin_cell) * 2.0
+
+    # neighbors come in order of their unscaled distance, scaling shortens
+    # a plane distance to no less than min_scalar of it (the smallest cosine
+    # between a direction and its scaled direction).
+    if points_scale is not None:
+        scale_min = min(points_scale)
+        scale_max = max(points_scale)
+        if scale_min > 0.0:
+            min_scalar = 2.0 * sqrt(scale_min * scale_max) / (scale_min + scale_max)
+        else:
+            min_scalar = 0.0
+    else:
+        min_scalar = 1.0
+
+    planes_pending = 0
+
+    # neighbors in order of distance, skipping the cell's own point
+    for j, _ in points_tree.nearest_iter(point_cell_current):
+        if j == index:
+            continue
+
+        normal = points[j] - point_cell_current
+        nlength = normal.length
+
+        # no further neighbor can clip the cell
+        if nlength * min_scalar > distance_max:
+            break
+
+        if points_scale is not None:
+            normal_alt = normal.copy()
+            normal_alt.x *= points_scale[0]
+            normal_alt.y *= points_scale[1]
+            normal_alt.z *= points_scale[2]
+
+            # rotate plane to new distance
+            # should always be positive!! - but abs incase
+            scalar = normal_alt.normalized().dot(normal.normalized())
+            # assert(scalar >= 0.0)
+            nlength *= scalar
+            normal = normal_alt
+
+        if nlength > distance_max:
+            continue
+
+        plane = normal.normalized()
+        plane.resize_4d()
+        plane[3] = (-nlength / 2.0) + margin_cell
+        planes.append(plane)
+        planes_pending += 1
+
+        if planes_pending == PLANES_BATCH:
+            planes_pending = 0
+            distance_max = planes_clip()
+            if len(vertices) == 0:
+                break
+
+    if planes_pending:
+        planes_clip()
+
+    return vertices
+
+
+# arguments for points_as_bmesh_cell() in worker processes,
+# set before the pool is created so the (forked) workers inherit them.
+_cells_calc_args = None
+
+
+def _cells_calc_chunk(indices):
+    args = _cells_calc_args
+    # plain tuples, to send back to the parent process
+    return [(i, [v.to_tuple() for v in points_as_bmesh_cell(i, *args)])
+            for i in indices]
+
+
 def points_as_bmesh_cells(verts,
                           points,
                           points_scale=None,
                           margin_bounds=0.05,
-                          margin_cell=0.0):
-    from math import sqrt
-    import mathutils
+                          margin_cell=0.0,
+                          processes=1,
+                          convex_planes=None):
+    """
+    Calculate the cells around points, clipped by the bounds of verts.
+
+    convex_planes: clip by these (outward facing) planes instead of the
+    bounds, for convex meshes this gives the cells intersected with the mesh.
+
+    processes: calculate the cells in a pool of worker processes,
+    0 for one per CPU. The pool forks Blender, so it's only used on Linux
+    or in background mode, otherwise one process is used.
+    Cells are independent of each other, so the result doesn't depend
+    on the number of processes.
+    """
+    global _cells_calc_args
+
+    import os
+    import sys
+    import bpy
     from mathutils import Vector
 
-    cells = []
+    # below this the pool start-up isn't worth it
+    POINTS_PROCESSES_MIN = 64
 
-    points_sorted_current = [p for p in points]
-    plane_indices = []
-    vertices = []
+    cells = []
 
     if points_scale is not None:
         points_scale = tuple(points_scale)
@@ -43,7 +262,9 @@ def points_as_bmesh_cells(verts,
 
     # there are many ways we could get planes - convex hull for eg
     # but it ends up fastest if we just use bounding box
-    if 1:
+    if convex_planes is not None:
+        convexPlanes = [Vector(plane) for plane in convex_planes]
+    else:
         xa = [v[0] for v in verts]
         ya = [v[1] for v in verts]
         za = [v[2] for v in verts]
@@ -60,61 +281,43 @@ def points_as_bmesh_cells(verts,
             Vector((0.0, 0.0, -1.0, +zmin)),
             ]
 
-    for i, point_cell_current in enumerate(points):
-        planes = [None] * len(convexPlanes)
-        for j in range(len(convexPlanes)):
-            planes[j] = convexPlanes[j].copy()
-            planes[j][3] += planes[j].xyz.dot(point_cell_current)
-        distance_max = 10000000000.0  # a big value!
-
-        points_sorted_current.sort(key=lambda p: (p - point_cell_current).length_squared)
-
-        for j in range(1, len(points)):
-            normal = points_sorted_current[j] - point_cell_current
-            nlength = normal.length
-
-            if points_scale is not None:
-                normal_alt = normal.copy()
-                normal_alt.x *= points_scale[0]
-                normal_alt.y *= points_scale[1]
-                normal_alt.z *= points_scale[2]
-
-                # rotate plane to new distance
-                # should always be positive!! - but abs incase
-                scalar = normal_alt.normalized().dot(normal.normalized())
-                # assert(scalar >= 0.0)
-                nlength *= scalar
-                normal = normal_alt
-
-            if nlength > distance_max:
-                break
+    args = (points, KDTree(points), convexPlanes, points_scale, margin_cell)
 
-            plane = normal.normalized()
-            plane.resize_4d()
-            plane[3] = (-nlength / 2.0) + margin_cell
-            planes.append(plane)
+    # the workers need fork, which isn't safe for the user interface
+    # (macOS especially)
+    if (len(points) < POINTS_PROCESSES_MIN or not hasattr(os, "fork") or
+        not (sys.platform.startswith("linux") or bpy.app.background)):
+        processes = 1
+    elif processes == 0:
+        import multiprocessing
+        processes = multiprocessing.cpu_count()
 
-            vertices[:], plane_indices[:] = mathutils.geometry.points_in_planes(planes)
+    if processes == 1:
+        for i, point_cell_current in enumerate(points):
+            vertices = points_as_bmesh_cell(i, *args)
             if len(vertices) == 0:
-                break
+                continue
+            cells.append((point_cell_current, vertices))
+    else:
+        import multiprocessing
 
-            if len(plane_indices) != len(planes):
-                planes[:] = [planes[k] for k in plane_indices]
+        indices = list(range(len(points)))
+        chunk = max(1, len(indices) // (processes * 8))
+        chunks = [indices[i:i + chunk] for i in range(0, len(indices), chunk)]
 
-            # for comparisons use length_squared and delay
-            # converting to a real length until the end.
-            distance_max = 10000000000.0  # a big value!
-            for v in vertices:
-                distance = v.length_squared
-                if distance_max < distance:
-                    distance_max = distance
-            distance_max = sqrt(distance_max)  # make real length
-            distance_max *= 2.0
-
-        if len(vertices) == 0:
-            continue
+        _cells_calc_args = args
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_cells_calc_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+            _cells_calc_args = None
 
-        cells.append((point_cell_current, vertices[:]))
-        del vertices[:]
+        for result in results:
+            for i, vertices in result:
+                if len(vertices) == 0:
+                    continue
+                cells.append((points[i], [Vector(v) for v in vertices]))
 
     return cells
@@ -134,6 +134,10 @@ def cell_fracture_objects(scene, obj,
                           material_index=0,
                           use_debug_redraw=False,
                           cell_scale=(1.0, 1.0, 1.0),
+                          processes=1,
+                          use_mesh_single=False,
+                          convex_planes=None,
+                          use_interior_hide=False,
                           ):
 
     from . import fracture_cell_calc
@@ -197,46 +201,31 @@ def cell_fracture_objects(scene, obj,
     cells = fracture_cell_calc.points_as_bmesh_cells(verts,
                                                      points,
                                                      cell_scale,
-                                                     margin_cell=margin)
+                                                     margin_cell=margin,
+                                                     processes=processes,
+                                                     convex_planes=convex_planes)
 
     # some hacks here :S
     cell_name = obj.name + "_cell"
 
     objects = []
 
-    for center_point, cell_points in cells:
-
-        # ---------------------------------------------------------------------
-        # BMESH
+    import random
+    import time
 
-        # create the convex hulls
-        bm = bmesh.new()
+    if convex_planes is not None:
+        # tolerance for faces on the planes of the mesh, relative to its size
+        plane_eps = max((max(co[axis] for co in verts) - min(co[axis] for co in verts))
+                        for axis in range(3)) * 0.0001
+        # the faces on the surface get the material and UVs of the source
+        # triangle they lie in, as they would from the boolean.
+        plane_tris, uv_names = _surface_tris_from_object(obj, convex_planes, plane_eps)
 
-        # WORKAROUND FOR CONVEX HULL BUG/LIMIT
-        # XXX small noise
-        import random
-        def R():
-            return (random.random() - 0.5) * 0.001
-        # XXX small noise
-
-        for i, co in enumerate(cell_points):
-
-            # XXX small noise
-            co.x += R()
-            co.y += R()
-            co.z += R()
-            # XXX small noise
-
-            bm_vert = bm.verts.new(co)
-
-        import mathutils
-        bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.005)
-        try:
-            bmesh.ops.convex_hull(bm, input=bm.verts)
-        except RuntimeError:
-            import traceback
-            traceback.print_exc()
+    # cell vertex coordinates before the noise below is added,
+    # used to find the faces on the planes of the mesh.
+    bm_verts_co = {}
 
+    def bmesh_finish(bm, offset):
         if clean:
             bm.normal_update()
             try:
@@ -249,18 +238,48 @@ def cell_fracture_objects(scene, obj,
             for bm_face in bm.faces:
                 bm_face.smooth = True
 
-        if material_index != 0:
+        if convex_planes is not None:
+            from mathutils.geometry import barycentric_transform
+
+            uv_layers = []
+            if use_data_match:
+                uv_layers = [bm.loops.layers.uv.get(name) or bm.loops.layers.uv.new(name)
+                             for name in uv_names]
+
+            # faces on the planes of the mesh are its surface,
+            # the others are interior.
+            for bm_face in bm.faces:
+                face_co = [bm_verts_co[bm_vert] + offset for bm_vert in bm_face.verts]
+                for plane, tris in zip(convex_planes, plane_tris):
+                    if all(abs(plane.xyz.dot(co) + plane[3]) < plane_eps for co in face_co):
+                        break
+                else:
+                    tris = None
+
+                bm_face.hide = tris is None
+                if tris is None:
+                    if material_index != 0:
+                        bm_face.material_index = material_index
+                elif tris:
+                    tri_co, tri_material_index, tri_uvs = _surface_tri_find(
+                            tris, bm_face.calc_center_median() + offset, plane_eps)
+                    bm_face.material_index = tri_material_index
+                    for uv_layer, uvs in zip(uv_layers, tri_uvs):
+                        for bm_loop, co in zip(bm_face.loops, face_co):
+                            bm_loop[uv_layer].uv = barycentric_transform(co, *(tri_co + uvs)).xy
+                if not use_interior_hide:
+                    bm_face.hide = False
+        elif material_index != 0:
             for bm_face in bm.faces:
                 bm_face.material_index = material_index
 
-
+    def object_from_bmesh(bm, location):
         # ---------------------------------------------------------------------
         # MESH
         mesh_dst = bpy.data.meshes.new(name=cell_name)
 
         bm.to_mesh(mesh_dst)
         bm.free()
-        del bm
 
         if use_data_match:
             # match materials and data layers so boolean displays them
@@ -272,7 +291,9 @@ def cell_fracture_objects(scene, obj,
                 lay_src = getattr(mesh_src, lay_attr)
                 lay_dst = getattr(mesh_dst, lay_attr)
                 for key in lay_src.keys():
-                    lay_dst.new(name=key)
+                    # UV layers of convex clipped cells are already there
+                    if key not in lay_dst:
+                        lay_dst.new(name=key)
 
         # ---------------------------------------------------------------------
         # OBJECT
@@ -280,13 +301,77 @@ def cell_fracture_objects(scene, obj,
         obj_cell = bpy.data.objects.new(name=cell_name, object_data=mesh_dst)
         scene.objects.link(obj_cell)
         # scene.objects.active = obj_cell
-        obj_cell.location = center_point
+        obj_cell.location = location
 
         objects.append(obj_cell)
 
-        if use_debug_redraw:
+    if use_mesh_single:
+        # all cells as islands of one mesh, in world space
+        bm = bmesh.new()
+
+    # redrawing is slow, limit it when there are many cells
+    redraw_time = time.time()
+
+    for cell_index, (center_point, cell_points) in enumerate(cells):
+
+        # ---------------------------------------------------------------------
+        # BMESH
+
+        # create the convex hulls
+        if not use_mesh_single:
+            bm = bmesh.new()
+
+        # WORKAROUND FOR CONVEX HULL BUG/LIMIT
+        # XXX small noise
+        # (seeded per cell for repeatable results)
+        random_cell = random.Random(cell_index).random
+        def R():
+            return (random_cell() - 0.5) * 0.001
+        # XXX small noise
+
+        bm_verts = []
+        for i, co in enumerate(cell_points):
+            co_orig = co + center_point if use_mesh_single else co.copy()
+
+            # XXX small noise
+            co.x += R()
+            co.y += R()
+            co.z += R()
+            # XXX small noise
+
+            if use_mesh_single:
+                co = co + center_point
+
+            bm_vert = bm.verts.new(co)
+            bm_verts.append(bm_vert)
+            bm_verts_co[bm_vert] = co_orig
+
+        bmesh.ops.remove_doubles(bm, verts=bm_verts, dist=0.005)
+        bm_verts = [bm_vert for bm_vert in bm_verts if bm_vert.is_valid]
+        try:
+            bmesh.ops.convex_hull(bm, input=bm_verts)
+        except RuntimeError:
+            import traceback
+            traceback.print_exc()
+
+        if use_mesh_single:
+            continue
+
+        bmesh_finish(bm, center_point)
+        object_from_bmesh(bm, center_point)
+        bm_verts_co.clear()
+        del bm
+
+        if use_debug_redraw and time.time() - redraw_time > 0.25:
             scene.update()
             _redraw_yasiamevil()
+            redraw_time = time.time()
+
+    if use_mesh_single:
+        from mathutils import Vector
+        bmesh_finish(bm, Vector((0.0, 0.0, 0.0)))
+        object_from_bmesh(bm, Vector((0.0, 0.0, 0.0)))
+        del bm
 
     scene.update()
 
@@ -300,6 +385,101 @@ def cell_fracture_objects(scene, obj,
     return objects
 
 
+def _surface_tris_from_object(obj, planes, eps):
+    """
+    Return the triangles of the faces of obj on each of the planes,
+    as (world space coordinates, material index, UVs per layer)
+    and the names of the UV layers.
+    UVs are 3d vectors, for use with barycentric_transform().
+    """
+    from mathutils import Vector
+
+    mesh = obj.data
+    matrix = obj.matrix_world.copy()
+    verts = [matrix * v.co for v in mesh.vertices]
+    uv_layers = mesh.uv_layers[:]
+
+    plane_tris = [[] for plane in planes]
+    for poly in mesh.polygons:
+        poly_co = [verts[i] for i in poly.vertices]
+        for plane, tris in zip(planes, plane_tris):
+            if all(abs(plane.xyz.dot(co) + plane[3]) < eps for co in poly_co):
+                break
+        else:
+            continue
+
+        loops = poly.loop_indices
+        for j in range(1, len(loops) - 1):
+            corners = (0, j, j + 1)
+            tri_co = tuple(poly_co[k] for k in corners)
+            if (tri_co[1] - tri_co[0]).cross(tri_co[2] - tri_co[0]).length_squared == 0.0:
+                continue
+            tri_uvs = [tuple(Vector(uv_layer.data[loops[k]].uv).to_3d() for k in corners)
+                       for uv_layer in uv_layers]
+            tris.append((tri_co, poly.material_index, tri_uvs))
+
+    return plane_tris, [uv_layer.name for uv_layer in uv_layers]
+
+
+def _surface_tri_find(tris, co, eps):
+    """
+    Return the triangle of tris (on one plane) containing co,
+    the nearest one when co is outside all of them.
+    """
+    tri_best = None
+    dist_best = 0.0
+    for tri in tris:
+        co_1, co_2, co_3 = tri[0]
+        normal = (co_2 - co_1).cross(co_3 - co_1).normalized()
+        # how far co is outside of the triangle edges
+        dist = max(-(b - a).cross(co - a).dot(normal) / max((b - a).length, eps)
+                   for a, b in ((co_1, co_2), (co_2, co_3), (co_3, co_1)))
+        if dist <= eps:
+            return tri
+        if tri_best is None or dist < dist_best:
+            tri_best = tri
+            dist_best = dist
+    return tri_best
+
+
+def convex_planes_from_object(obj):
+    """
+    Return the planes of the faces of obj in world space
+    (as 4d vectors, normal and offset), None when the mesh isn't convex.
+    """
+    mesh = obj.data
+    matrix = obj.matrix_world.copy()
+    matrix_normal = matrix.inverted().transposed().to_3x3()
+    verts = [matrix * v.co for v in mesh.vertices]
+
+    if not verts or not mesh.polygons:
+        return None
+
+    # tolerance relative to the size of the mesh
+    eps = max((max(co[axis] for co in verts) - min(co[axis] for co in verts))
+              for axis in range(3)) * 0.00001
+
+    planes = {}
+    for poly in mesh.polygons:
+        no = matrix_normal * poly.normal
+        if no.length_squared == 0.0:
+            continue
+        no.normalize()
+        plane = no.to_4d()
+        plane[3] = -no.dot(verts[poly.vertices[0]])
+        planes.setdefault(plane.to_tuple(5), plane)
+
+    planes = list(planes.values())
+    for plane in planes:
+        no = plane.xyz
+        d = plane[3]
+        for co in verts:
+            if no.dot(co) + d > eps:
+                return None
+
+    return planes
+
+
 def cell_fracture_boolean(scene, obj, objects,
                           use_debug_bool=False,
                           clean=True,
@@ -380,22 +560,26 @@ def cell_fracture_boolean(scene, obj, objects,
                 _redraw_yasiamevil()
 
     if (not use_debug_bool) and use_island_split:
-        # this is ugly and Im not proud of this - campbell
-        base = None
-        for base in scene.object_bases:
-            base.select = False
-        for obj_cell in objects_boolean:
-            obj_cell.select = True
-
-        bpy.ops.mesh.separate(type='LOOSE')
-
-        objects_boolean[:] = [obj_cell for obj_cell in scene.objects if obj_cell.select]
+        objects_boolean[:] = cell_fracture_island_split(scene, objects_boolean)
 
     scene.update()
 
     return objects_boolean
 
 
+def cell_fracture_island_split(scene, objects):
+    # this is ugly and Im not proud of this - campbell
+    base = None
+    for base in scene.object_bases:
+        base.select = False
+    for obj_cell in objects:
+        obj_cell.select = True
+
+    bpy.ops.mesh.separate(type='LOOSE')
+
+    return [obj_cell for obj_cell in scene.objects if obj_cell.select]
+
+
 def cell_fracture_interior_handle(objects,
                                   use_interior_vgroup=False,
                                   use_sharp_edges=False,
@@ -105,81 +105,368 @@ def bmesh_calc_area(bm):
     return sum(f.calc_area() for f in bm.faces)
 
 
-def bmesh_check_self_intersect_object(obj):
+class TriangleBVH:
     """
-    Check if any faces self intersect
+    Bounding volume hierarchy over triangles, kept in flat arrays,
+    for triangle/triangle overlap queries (Object.ray_cast covers rays).
 
-    returns an array of edge index values.
+    Doesn't need a scene object and doesn't access Blender data,
+    so it can be built and queried from a worker thread.
     """
-    import bpy
+    LEAF_SIZE = 8
+
+    def __init__(self, vert_co, tri_verts):
+        # triangle coordinates, 9 floats per triangle
+        vert_co = array.array('d', vert_co)
+        coords = self.coords = array.array('d')
+        for v in tri_verts:
+            coords.extend(vert_co[v * 3:v * 3 + 3])
+
+        tot = len(tri_verts) // 3
+        # triangle bounds and centers, per axis
+        bounds_min = [array.array('d', map(min, coords[axis::9],
+                                               coords[axis + 3::9],
+                                               coords[axis + 6::9]))
+                      for axis in range(3)]
+        bounds_max = [array.array('d', map(max, coords[axis::9],
+                                               coords[axis + 3::9],
+                                               coords[axis + 6::9]))
+                      for axis in range(3)]
+        centers = [array.array('d', map(float.__add__, lo, hi))
+                   for lo, hi in zip(bounds_min, bounds_max)]
+
+        # nodes: bounds (min xyz, max xyz), range in self.order
+        # and the index of the first child (the second follows it),
+        # -1 for leaves
+        self.order = order = array.array('i', range(tot))
+        self.node_bounds = node_bounds = array.array('d')
+        self.node_start = node_start = array.array('i')
+        self.node_end = node_end = array.array('i')
+        self.node_child = node_child = array.array('i')
+
+        def node_add(start, end):
+            tris = order[start:end]
+            node_bounds.extend([min(map(bounds_min[axis].__getitem__, tris))
+                                for axis in range(3)])
+            node_bounds.extend([max(map(bounds_max[axis].__getitem__, tris))
+                                for axis in range(3)])
+            node_start.append(start)
+            node_end.append(end)
+            node_child.append(-1)
+            return len(node_start) - 1
+
+        if not tot:
+            return
+
+        stack = [node_add(0, tot)]
+        while stack:
+            node = stack.pop()
+            start = node_start[node]
+            end = node_end[node]
+            if end - start <= self.LEAF_SIZE:
+                continue
+
+            # split at the median center on the longest axis
+            tris = order[start:end]
+            extent = []
+            for axis in range(3):
+                center = centers[axis]
+                extent.append(max(map(center.__getitem__, tris)) -
+                              min(map(center.__getitem__, tris)))
+            axis = extent.index(max(extent))
+            if extent[axis] == 0.0:
+                continue
+            order[start:end] = array.array(
+                    'i', sorted(tris, key=centers[axis].__getitem__))
+
+            mid = (start + end) // 2
+            child = node_add(start, mid)
+            node_add(mid, end)
+            node_child[node] = child
+            stack.append(child)
+            stack.append(child + 1)
+
+    def overlap(self, index):
+        """
+        Return the indices of the triangles which bounds overlap
+        the bounds of the triangle at index (including itself).
+        """
+        coords = self.coords
+        c = index * 9
+        bounds_min = [min(coords[c + axis:c + 9:3]) for axis in range(3)]
+        bounds_max = [max(coords[c + axis:c + 9:3]) for axis in range(3)]
+        x_min, y_min, z_min = bounds_min
+        x_max, y_max, z_max = bounds_max
+
+        order = self.order
+        node_bounds = self.node_bounds
+        node_child = self.node_child
+        node_start = self.node_start
+        node_end = self.node_end
+
+        result = []
+        if not order:
+            return result
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            b = node * 6
+            if (node_bounds[b] > x_max or node_bounds[b + 3] < x_min or
+                node_bounds[b + 1] > y_max or node_bounds[b + 4] < y_min or
+                node_bounds[b + 2] > z_max or node_bounds[b + 5] < z_min):
+                continue
+
+            child = node_child[node]
+            if child != -1:
+                stack.append(child)
+                stack.append(child + 1)
+                continue
+
+            for i in order[node_start[node]:node_end[node]]:
+                c = i * 9
+                if (min(coords[c:c + 9:3]) > x_max or
+                    max(coords[c:c + 9:3]) < x_min or
+                    min(coords[c + 1:c + 9:3]) > y_max or
+                    max(coords[c + 1:c + 9:3]) < y_min or
+                    min(coords[c + 2:c + 9:3]) > z_max or
+                    max(coords[c + 2:c + 9:3]) < z_min):
+                    continue
+                result.append(i)
+        return result
+
+
+class MeshCheckData:
+    """
+    Triangulated copy of a mesh, in flat arrays.
 
-    # Heres what we do!
-    #
-    # * Take original Mesh.
-    # * Copy it and triangulate it (keeping list of original edge index values)
-    # * Move the BMesh into a temp Mesh.
-    # * Make a temp Object in the scene and assign the temp Mesh.
-    # * For every original edge - ray-cast on the object to find which intersect.
-    # * Report all edge intersections.
-
-    # Triangulate
-    bm = bmesh_copy_from_object(obj, transform=False, triangulate=False)
-    face_map_index_org = {f: i for i, f in enumerate(bm.faces)}
-    ret = bmesh.ops.triangulate(bm, faces=bm.faces, use_beauty=False)
-    face_map = ret["face_map"]
-    # map new index to original index
-    face_map_index = {i: face_map_index_org[face_map.get(f, f)] for i, f in enumerate(bm.faces)}
-    del face_map_index_org
-    del ret
-
-    # Create a real mesh (lame!)
-    scene = bpy.context.scene
-    me_tmp = bpy.data.meshes.new(name="~temp~")
-    bm.to_mesh(me_tmp)
-    bm.free()
-    obj_tmp = bpy.data.objects.new(name=me_tmp.name, object_data=me_tmp)
-    scene.objects.link(obj_tmp)
-    scene.update()
-    ray_cast = obj_tmp.ray_cast
+    Shared by the checks which need the triangles, so the triangulation
+    and the BVH are only calculated once.
+    Only the constructor, ray_cast_fn() and free() access Blender data,
+    the checks using the arrays and the BVH can run in a worker thread.
+    """
 
-    faces_error = set()
+    def __init__(self, bm):
+        """
+        Takes a BMesh which is triangulated and freed,
+        pass a copy to keep the original.
+        """
+        import bpy
 
-    EPS_NORMAL = 0.000001
-    EPS_CENTER = 0.01  # should always be bigger
+        # map original faces to their index.
+        face_index_map_org = {f: i for i, f in enumerate(bm.faces)}
+        ret = bmesh.ops.triangulate(bm, faces=bm.faces, use_beauty=False)
+        face_map = ret["face_map"]
+        del ret
+        # triangle index -> original face index
+        self.face_index = array.array('i', (face_index_map_org[face_map.get(f, f)]
+                                            for f in bm.faces))
+        del face_index_map_org
+        bm.normal_update()
+
+        # read the arrays from a temp mesh (much faster than bmesh access),
+        # the mesh is kept for ray casting until free() is called.
+        me_tmp = self._me_tmp = bpy.data.meshes.new(name="~temp~")
+        bm.to_mesh(me_tmp)
+        bm.free()
+
+        def mesh_array(seq, attr, typecode, size):
+            values = array.array(typecode, bytes(array.array(typecode).itemsize * size * len(seq)))
+            seq.foreach_get(attr, values)
+            return values
+
+        self.vert_co = mesh_array(me_tmp.vertices, "co", 'f', 3)
+        self.tri_verts = mesh_array(me_tmp.loops, "vertex_index", 'i', 1)
+        self.tri_normals = mesh_array(me_tmp.polygons, "normal", 'f', 3)
+
+        self._bvh = None
+        self._obj_tmp = None
+        self._scene = None
+
+    @classmethod
+    def from_object(cls, obj):
+        """World space data for an object (and its edit-mesh)."""
+        return cls(bmesh_copy_from_object(obj, transform=True, triangulate=False))
+
+    def bvh(self):
+        if self._bvh is None:
+            self._bvh = TriangleBVH(self.vert_co, self.tri_verts)
+        return self._bvh
+
+    def ray_cast_fn(self, scene):
+        """
+        Return Object.ray_cast of a temp object using the triangles
+        (polygon index values are triangle index values),
+        the object is linked into the scene once, until free() is called.
+        """
+        if self._obj_tmp is None:
+            import bpy
+            me_tmp = self._me_tmp
+            obj_tmp = bpy.data.objects.new(name=me_tmp.name, object_data=me_tmp)
+            scene.objects.link(obj_tmp)
+            scene.update()
+            self._obj_tmp = obj_tmp
+            self._scene = scene
+        return self._obj_tmp.ray_cast
+
+    def free(self):
+        """
+        Remove the temp object and mesh,
+        the arrays and the BVH can still be used.
+        """
+        import bpy
+        if self._obj_tmp is not None:
+            self._scene.objects.unlink(self._obj_tmp)
+            bpy.data.objects.remove(self._obj_tmp)
+            self._obj_tmp = None
+            self._scene = None
+        if self._me_tmp is not None:
+            bpy.data.meshes.remove(self._me_tmp)
+            self._me_tmp = None
 
-    for ed in me_tmp.edges:
-        v1i, v2i = ed.vertices
-        v1 = me_tmp.vertices[v1i]
-        v2 = me_tmp.vertices[v2i]
 
-        # setup the edge with an offset
-        co_1 = v1.co.copy()
-        co_2 = v2.co.copy()
-        co_mid = (co_1 + co_2) * 0.5
-        no_mid = (v1.normal + v2.normal).normalized() * EPS_NORMAL
-        co_1 = co_1.lerp(co_mid, EPS_CENTER) + no_mid
-        co_2 = co_2.lerp(co_mid, EPS_CENTER) + no_mid
+def bmesh_check_self_intersect_data(data, progress=None):
+    """
+    Check if any faces self intersect, returns an array of face index values.
+    """
 
-        co, no, index = ray_cast(co_1, co_2)
-        if index != -1:
-            faces_error.add(face_map_index[index])
+    # Test every pair of triangles with overlapping bounds,
+    # skipping neighbors (triangles sharing an edge).
+
+    EPS = 0.000001
+
+    bvh = data.bvh()
+    coords = bvh.coords
+    tri_verts = data.tri_verts
+    face_index = data.face_index
+
+    def segment_hits_tri(ox, oy, oz, dx, dy, dz, tri):
+        # segment (o, o + d) / triangle test (Moller-Trumbore)
+        x0, y0, z0, x1, y1, z1, x2, y2, z2 = tri
+        e1x = x1 - x0
+        e1y = y1 - y0
+        e1z = z1 - z0
+        e2x = x2 - x0
+        e2y = y2 - y0
+        e2z = z2 - z0
+        px = dy * e2z - dz * e2y
+        py = dz * e2x - dx * e2z
+        pz = dx * e2y - dy * e2x
+        det = e1x * px + e1y * py + e1z * pz
+        if -EPS < det < EPS:
+            return False
+        det_inv = 1.0 / det
+        sx = ox - x0
+        sy = oy - y0
+        sz = oz - z0
+        u = (sx * px + sy * py + sz * pz) * det_inv
+        if u < 0.0 or u > 1.0:
+            return False
+        qx = sy * e1z - sz * e1y
+        qy = sz * e1x - sx * e1z
+        qz = sx * e1y - sy * e1x
+        v = (dx * qx + dy * qy + dz * qz) * det_inv
+        if v < 0.0 or u + v > 1.0:
+            return False
+        t = (e2x * qx + e2y * qy + e2z * qz) * det_inv
+        return 0.0 <= t <= 1.0
+
+    def edges_hit_tri(tri_a, tri_b):
+        # does an edge of tri_a cross tri_b?
+        x0, y0, z0, x1, y1, z1, x2, y2, z2 = tri_a
+        return (segment_hits_tri(x0, y0, z0, x1 - x0, y1 - y0, z1 - z0, tri_b) or
+                segment_hits_tri(x1, y1, z1, x2 - x1, y2 - y1, z2 - z1, tri_b) or
+                segment_hits_tri(x2, y2, z2, x0 - x2, y0 - y2, z0 - z2, tri_b))
+
+    def edge_opposite_hits_tri(tri_a, k, tri_b):
+        # does the edge of tri_a opposite its k'th vertex cross tri_b?
+        k_1 = ((k + 1) % 3) * 3
+        k_2 = ((k + 2) % 3) * 3
+        ox, oy, oz = tri_a[k_1:k_1 + 3]
+        return segment_hits_tri(ox, oy, oz,
+                                tri_a[k_2] - ox, tri_a[k_2 + 1] - oy, tri_a[k_2 + 2] - oz,
+                                tri_b)
+
+    def plane_side(tri_a, tri_b):
+        # are all the points of tri_b on one side of the plane of tri_a?
+        x0, y0, z0, x1, y1, z1, x2, y2, z2 = tri_a
+        e1x = x1 - x0
+        e1y = y1 - y0
+        e1z = z1 - z0
+        e2x = x2 - x0
+        e2y = y2 - y0
+        e2z = z2 - z0
+        nx = e1y * e2z - e1z * e2y
+        ny = e1z * e2x - e1x * e2z
+        nz = e1x * e2y - e1y * e2x
+        d_0 = nx * (tri_b[0] - x0) + ny * (tri_b[1] - y0) + nz * (tri_b[2] - z0)
+        d_1 = nx * (tri_b[3] - x0) + ny * (tri_b[4] - y0) + nz * (tri_b[5] - z0)
+        d_2 = nx * (tri_b[6] - x0) + ny * (tri_b[7] - y0) + nz * (tri_b[8] - z0)
+        return ((d_0 > 0.0 and d_1 > 0.0 and d_2 > 0.0) or
+                (d_0 < 0.0 and d_1 < 0.0 and d_2 < 0.0))
 
-    scene.objects.unlink(obj_tmp)
-    bpy.data.objects.remove(obj_tmp)
-    bpy.data.meshes.remove(me_tmp)
+    faces_error = set()
+    tot = len(tri_verts) // 3
+    for i in range(tot):
+        if progress is not None and not i % 1024:
+            progress(i / tot)
+
+        tri_a = coords[i * 9:i * 9 + 9]
+        verts_a = tri_verts[i * 3:i * 3 + 3]
+        f_a = face_index[i]
+        for j in bvh.overlap(i):
+            # each pair once, skip neighbors & triangles of the same face
+            if j <= i or f_a == face_index[j]:
+                continue
+            verts_b = tri_verts[j * 3:j * 3 + 3]
+            shared = [v for v in verts_b if v in verts_a]
+            if len(shared) > 1:
+                continue
+
+            tri_b = coords[j * 9:j * 9 + 9]
+            if shared:
+                # triangles sharing a vertex can only cross
+                # through the edges opposite that vertex.
+                if (edge_opposite_hits_tri(tri_a, verts_a.index(shared[0]), tri_b) or
+                    edge_opposite_hits_tri(tri_b, verts_b.index(shared[0]), tri_a)):
+                    faces_error.add(f_a)
+                    faces_error.add(face_index[j])
+                continue
+
+            if plane_side(tri_a, tri_b) or plane_side(tri_b, tri_a):
+                continue
+            if edges_hit_tri(tri_a, tri_b) or edges_hit_tri(tri_b, tri_a):
+                faces_error.add(f_a)
+                faces_error.add(face_index[j])
 
     return array.array('i', faces_error)
 
 
-def bmesh_face_points_random(f, num_points=1, margin=0.05):
-    import random
-    from random import uniform
-    uniform_args = 0.0 + margin, 1.0 - margin
+def bmesh_check_self_intersect(bm):
+    """
+    Check if any faces of a BMesh self intersect,
+    returns an array of face index values.
+    """
+    data = MeshCheckData(bm.copy())
+    data.free()
+    return bmesh_check_self_intersect_data(data)
 
-    # for pradictable results
-    random.seed(f.index)
 
-    vecs = [v.co for v in f.verts]
+def bmesh_check_self_intersect_object(obj):
+    """
+    Check if any faces self intersect
+
+    returns an array of face index values.
+    """
+    data = MeshCheckData.from_object(obj)
+    data.free()
+    return bmesh_check_self_intersect_data(data)
+
+
+def face_points_random(co_1, co_2, co_3, seed, num_points=1, margin=0.05):
+    import random
+    rand = random.Random(seed)  # for pradictable results
+    uniform = rand.uniform
+    uniform_args = 0.0 + margin, 1.0 - margin
 
     for i in range(num_points):
         u1 = uniform(*uniform_args)
@@ -190,72 +477,55 @@ def bmesh_face_points_random(f, num_points=1, margin=0.05):
             u1 = 1.0 - u1
             u2 = 1.0 - u2
 
-        side1 = vecs[1] - vecs[0]
-        side2 = vecs[2] - vecs[0]
+        yield [a + u1 * (b - a) + u2 * (c - a)
+               for a, b, c in zip(co_1, co_2, co_3)]
 
-        yield vecs[0] + u1 * side1 + u2 * side2
 
+def bmesh_check_thick_data(data, thickness, scene):
+    """
+    Check faces are thicker than thickness (relies on correct normals),
+    returns an array of face index values.
 
-def bmesh_check_thick_object(obj, thickness):
-
-    import bpy
-
-    # Triangulate
-    bm = bmesh_copy_from_object(obj, transform=True, triangulate=False)
-    # map original faces to their index.
-    face_index_map_org = {f: i for i, f in enumerate(bm.faces)}
-    ret = bmesh.ops.triangulate(bm, faces=bm.faces, use_beauty=False)
-    face_map = ret["face_map"]
-    del ret
-    # old edge -> new mapping
-
-    # Convert new/old map to index dict.
-
-    # Create a real mesh (lame!)
-    scene = bpy.context.scene
-    me_tmp = bpy.data.meshes.new(name="~temp~")
-    bm.to_mesh(me_tmp)
-    # bm.free()  # delay free
-    obj_tmp = bpy.data.objects.new(name=me_tmp.name, object_data=me_tmp)
-    scene.objects.link(obj_tmp)
-    scene.update()
-    ray_cast = obj_tmp.ray_cast
+    Ray casts on a temp object in the scene, so only call from the main thread.
+    """
 
     EPS_BIAS = 0.0001
 
-    faces_error = set()
+    vert_co = data.vert_co
+    tri_verts = data.tri_verts
+    tri_normals = data.tri_normals
+    face_index = data.face_index
+    ray_cast = data.ray_cast_fn(scene)
 
-    bm_faces_new = bm.faces[:]
+    faces_error = set()
 
-    for f in bm_faces_new:
-        no = f.normal
-        no_sta = no * EPS_BIAS
-        no_end = no * thickness
-        for p in bmesh_face_points_random(f, num_points=6):
+    for i in range(len(tri_verts) // 3):
+        no = tri_normals[i * 3:i * 3 + 3]
+        co_1, co_2, co_3 = (vert_co[v * 3:v * 3 + 3]
+                            for v in tri_verts[i * 3:i * 3 + 3])
+        for p in face_points_random(co_1, co_2, co_3, i, num_points=6):
             # Cast the ray backwards
-            p_a = p - no_sta
-            p_b = p - no_end
+            p_a = [a - n * EPS_BIAS for a, n in zip(p, no)]
+            p_b = [a - n * thickness for a, n in zip(p, no)]
 
-            co, no, index = ray_cast(p_a, p_b)
+            co, no_hit, index = ray_cast(p_a, p_b)
 
             if index != -1:
                 # Add the face we hit
-                for f_iter in (f, bm_faces_new[index]):
-                    # if the face wasn't triangulated, just use existing
-                    f_org = face_map.get(f_iter, f_iter)
-                    f_org_index = face_index_map_org[f_org]
-                    faces_error.add(f_org_index)
-
-    # finished with bm
-    bm.free()
-
-    scene.objects.unlink(obj_tmp)
-    bpy.data.objects.remove(obj_tmp)
-    bpy.data.meshes.remove(me_tmp)
+                faces_error.add(face_index[i])
+                faces_error.add(face_index[index])
 
     return array.array('i', faces_error)
 
 
+def bmesh_check_thick_object(obj, thickness):
+    import bpy
+    data = MeshCheckData.from_object(obj)
+    try:
+        return bmesh_check_thick_data(data, thickness, bpy.context.scene)
+    finally:
+        data.free()
+
 
 def object_merge(context, objects):
     """
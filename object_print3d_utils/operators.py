@@ -111,6 +111,122 @@ def execute_check(self, context):
     return {'FINISHED'}
 
 
+# Checks which test the mesh triangles define data_check(scene), returning a
+# function which runs on a shared mesh_helpers.MeshCheckData,
+# so the triangulation and BVH are only calculated once per object.
+# Unless they set data_check_main (they access Blender data, ray casting
+# on the temp object), these functions only use the arrays and the BVH,
+# so when the operator is invoked from the UI they run in a worker thread,
+# reporting progress.
+
+def execute_check_all(obj, check_cls, info):
+    data = None
+    try:
+        for cls in check_cls:
+            if hasattr(cls, "data_check"):
+                if data is None:
+                    data = mesh_helpers.MeshCheckData.from_object(obj)
+                cls.data_check(bpy.context.scene)(data, info)
+            else:
+                cls.main_check(obj, info)
+    finally:
+        if data is not None:
+            data.free()
+
+
+def invoke_check(self, context, check_cls):
+    import threading
+
+    obj = context.active_object
+
+    # run what we can't thread now, keeping the order of the results
+    data = None
+    self._check_info = []
+    jobs = []
+    try:
+        for cls in check_cls:
+            info = []
+            if hasattr(cls, "data_check"):
+                if data is None:
+                    data = mesh_helpers.MeshCheckData.from_object(obj)
+                if getattr(cls, "data_check_main", False):
+                    cls.data_check(context.scene)(data, info)
+                else:
+                    jobs.append((info, cls.data_check(context.scene)))
+            else:
+                cls.main_check(obj, info)
+            self._check_info.append(info)
+    finally:
+        # the threaded checks don't need the temp mesh
+        if data is not None:
+            data.free()
+
+    if not jobs:
+        report.update(*[item for info in self._check_info for item in info])
+        return {'FINISHED'}
+
+    self._check_progress = 0.0
+    self._check_cancel = False
+    self._check_error = None
+
+    def progress_job(job_index):
+        def progress(fac):
+            if self._check_cancel:
+                raise KeyboardInterrupt
+            self._check_progress = (job_index + fac) / len(jobs)
+        return progress
+
+    def run():
+        try:
+            for job_index, (info, check) in enumerate(jobs):
+                check(data, info, progress_job(job_index))
+        except KeyboardInterrupt:
+            pass
+        except:
+            import traceback
+            self._check_error = traceback.format_exc()
+
+    self._check_thread = threading.Thread(target=run)
+    self._check_thread.start()
+
+    wm = context.window_manager
+    wm.progress_begin(0, 100)
+    self._check_timer = wm.event_timer_add(0.1, context.window)
+    wm.modal_handler_add(self)
+    return {'RUNNING_MODAL'}
+
+
+def modal_check(self, context, event):
+    if event.type == 'ESC':
+        self._check_cancel = True
+    elif event.type != 'TIMER':
+        return {'PASS_THROUGH'}
+
+    wm = context.window_manager
+    if self._check_thread.is_alive():
+        wm.progress_update(int(self._check_progress * 100))
+        if context.area:
+            context.area.header_text_set(
+                    "Print3D: checking %d%% (Esc to cancel)" %
+                    int(self._check_progress * 100))
+        return {'RUNNING_MODAL'}
+
+    wm.event_timer_remove(self._check_timer)
+    wm.progress_end()
+    if context.area:
+        context.area.header_text_set()
+        context.area.tag_redraw()
+
+    if self._check_error is not None:
+        self.report({'ERROR'}, self._check_error)
+        return {'CANCELLED'}
+    if self._check_cancel:
+        return {'CANCELLED'}
+
+    report.update(*[item for info in self._check_info for item in info])
+    return {'FINISHED'}
+
+
 class Print3DCheckSolid(Operator):
     """Check for geometry is solid (has valid inside/outside) and correct normals"""
     bl_idname = "mesh.print3d_check_solid"
@@ -145,15 +261,27 @@ class Print3DCheckIntersections(Operator):
     bl_idname = "mesh.print3d_check_intersect"
     bl_label = "Print3D Check Intersections"
 
+    @staticmethod
+    def data_check(scene):
+        def check(data, info, progress=None):
+            faces_intersect = mesh_helpers.bmesh_check_self_intersect_data(data, progress)
+            info.append(("Intersect Face: %d" % len(faces_intersect),
+                        (bmesh.types.BMFace, faces_intersect)))
+        return check
+
     @staticmethod
     def main_check(obj, info):
-        faces_intersect = mesh_helpers.bmesh_check_self_intersect_object(obj)
-        info.append(("Intersect Face: %d" % len(faces_intersect),
-                    (bmesh.types.BMFace, faces_intersect)))
+        execute_check_all(obj, (Print3DCheckIntersections,), info)
 
     def execute(self, context):
         return execute_check(self, context)
 
+    def invoke(self, context, event):
+        return invoke_check(self, context, (self.__class__,))
+
+    def modal(self, context, event):
+        return modal_check(self, context, event)
+
 
 class Print3DCheckDegenerate(Operator):
     """Check for degenerate geometry that may not print properly """ \
@@ -226,20 +354,34 @@ class Print3DCheckThick(Operator):
     bl_idname = "mesh.print3d_check_thick"
     bl_label = "Print3D Check Thickness"
 
+    # ray casts on the temp object
+    data_check_main = True
+
     @staticmethod
-    def main_check(obj, info):
-        scene = bpy.context.scene
+    def data_check(scene):
         print_3d = scene.print_3d
+        thickness_min = print_3d.thickness_min
 
-        faces_error = mesh_helpers.bmesh_check_thick_object(obj, print_3d.thickness_min)
+        def check(data, info, progress=None):
+            faces_error = mesh_helpers.bmesh_check_thick_data(data, thickness_min, scene)
 
-        info.append(("Thin Faces: %d" % len(faces_error),
-                    (bmesh.types.BMFace, faces_error)))
+            info.append(("Thin Faces: %d" % len(faces_error),
+                        (bmesh.types.BMFace, faces_error)))
+        return check
 
+    @staticmethod
+    def main_check(obj, info):
+        execute_check_all(obj, (Print3DCheckThick,), info)
 
     def execute(self, context):
         return execute_check(self, context)
 
+    def invoke(self, context, event):
+        return invoke_check(self, context, (self.__class__,))
+
+    def modal(self, context, event):
+        return modal_check(self, context, event)
+
 
 class Print3DCheckSharp(Operator):
     """Check edges are below the sharpness preference"""
@@ -320,13 +462,18 @@ class Print3DCheckAll(Operator):
         obj = context.active_object
 
         info = []
-        for cls in self.check_cls:
-            cls.main_check(obj, info)
+        execute_check_all(obj, self.check_cls, info)
 
         report.update(*info)
 
         return {'FINISHED'}
 
+    def invoke(self, context, event):
+        return invoke_check(self, context, self.check_cls)
+
+    def modal(self, context, event):
+        return modal_check(self, context, event)
+
 
 class Print3DCleanIsolated(Operator):
     """Cleanup isolated vertices and edges"""
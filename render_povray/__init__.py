@@ -89,6 +89,18 @@ class RenderPovSettingsScene(PropertyGroup):
             description="Enable line breaks in lists (vectors and indices). Disabled: "
                         "lists are exported in one line",
             default=True)
+    mesh_cache_enable = BoolProperty(
+            name="Cache Meshes",
+            description="Write mesh data to include files next to the exported scene and reuse "
+                        "them for as long as the mesh is unchanged (faster animations and "
+                        "re-renders)",
+            default=False)
+    animation_processes = IntProperty(
+            name="Processes",
+            description="Number of POV-Ray processes rendering frames at the same time when "
+                        "rendering an animation with the process pool. The available cores "
+                        "are split between them",
+            min=1, max=64, default=4)
 
     # Not a real pov option, just to know if we should write
     radio_enable = BoolProperty(
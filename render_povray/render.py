@@ -23,6 +23,8 @@ import subprocess
 import os
 import sys
 import time
+import hashlib
+from array import array
 from math import atan, pi, degrees, sqrt
 import re
 import random
@@ -150,10 +152,74 @@ def renderable_objects(scene):
     return [ob for ob in scene.objects if is_renderable(scene, ob)]
 
 
+def mesh_digest(me):
+    # MD5 of the evaluated mesh data that ends up in a mesh2 block, so that
+    # unchanged meshes can be recognized from one export to the next.
+    md5 = hashlib.md5()
+
+    def update(seq, attr, size, typecode, default):
+        values = [default] * (len(seq) * size)
+        seq.foreach_get(attr, values)
+        md5.update(array(typecode, values).tobytes())
+
+    update(me.vertices, "co", 3, 'f', 0.0)
+    update(me.vertices, "normal", 3, 'f', 0.0)
+    update(me.tessfaces, "vertices_raw", 4, 'i', 0)
+    update(me.tessfaces, "normal", 3, 'f', 0.0)
+    update(me.tessfaces, "use_smooth", 1, 'b', False)
+    update(me.tessfaces, "material_index", 1, 'i', 0)
+    uv_texture = me.tessface_uv_textures.active
+    if uv_texture:
+        update(uv_texture.data, "uv_raw", 8, 'f', 0.0)
+    vcol = me.tessface_vertex_colors.active
+    if vcol:
+        for attr in ("color1", "color2", "color3", "color4"):
+            update(vcol.data, attr, 3, 'f', 0.0)
+    return md5.hexdigest()
+
+
+class MeshCache:
+    # Directory of #include files holding mesh2 sections. Each file is named
+    # after its section and a key describing everything written into it, so
+    # a file that exists can be included as is instead of being rewritten.
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Section name -> keys of the files included since the cache was created.
+        self.live = {}
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.md5(repr(parts).encode()).hexdigest()
+
+    def path(self, name, key):
+        return os.path.join(self.directory, "%s_%s.inc" % (name, key))
+
+    def use(self, name, key):
+        self.live.setdefault(name, set()).add(key)
+
+    def purge(self):
+        # Remove outdated versions of the sections used, keeping every version
+        # that was included. Only call this once no other export using the
+        # cache still needs its files (other sections are never touched).
+        for f in os.listdir(self.directory):
+            if not f.endswith(".inc"):
+                continue
+            name, sep, key = f[:-4].rpartition("_")
+            keys = self.live.get(name)
+            if keys is not None and key not in keys:
+                try:
+                    os.remove(os.path.join(self.directory, f))
+                except OSError:
+                    pass
+
+
 tabLevel = 0
 
 
-def write_pov(filename, scene=None, info_callback=None):
+def write_pov(filename, scene=None, info_callback=None, mesh_cache=None):
     import mathutils
     #file = filename
     file = open(filename, "w")
@@ -162,6 +228,12 @@ def write_pov(filename, scene=None, info_callback=None):
     if not scene:
         scene = bpy.data.scenes[0]
 
+    # A mesh_cache shared by several exports is purged by the caller, once none
+    # of them needs the outdated files any more. Otherwise it's done at the end.
+    meshCache = mesh_cache
+    if meshCache is None and scene.pov.mesh_cache_enable:
+        meshCache = MeshCache(os.path.join(os.path.dirname(filename), "povray_mesh_cache"))
+
     render = scene.render
     world = scene.world
     global_matrix = mathutils.Matrix.Rotation(-pi / 2.0, 4, 'X')
@@ -798,6 +870,45 @@ def write_pov(filename, scene=None, info_callback=None):
 
         data_ref = {}
 
+        def writeCachedSection(name, key, writeSection):
+            # Without cache key, the section is written inline. Otherwise it goes
+            # to its own file (only if no up to date one exists) and gets included.
+            nonlocal file
+            if key is None:
+                writeSection()
+                return
+            path = meshCache.path(name, key)
+            if not os.path.isfile(path):
+                mainFile = file
+                file = open(path, "w")
+                try:
+                    writeSection()
+                    file.close()
+                except:
+                    # Never leave a truncated section behind to be included later
+                    file.close()
+                    os.remove(path)
+                    raise
+                finally:
+                    file = mainFile
+            meshCache.use(name, key)
+            tabWrite("#include \"%s\"\n" % path.replace("\\", "/"))
+
+        def writeList(name, fmts, values):
+            # Write a mesh2 list (vertex_vectors, face_indices...) from the item
+            # templates and the flat array of all their values. Items are formatted
+            # with a single string operation and written at once.
+            tabWrite("%s {\n" % name)
+            tabWrite("%d" % len(fmts))  # item count
+            if not scene.pov.tempfiles_enable and scene.pov.list_lf_enable:
+                sep = ",\n" + tab * tabLevel
+            else:
+                sep = ", "
+            if fmts:
+                file.write((sep + sep.join(fmts)) % tuple(values))
+            file.write("\n")
+            tabWrite("}\n")
+
         def store(scene, ob, name, dataname, matrix):
             # The Object needs to be written at least once but if its data is
             # already in data_ref this has already been done.
@@ -1045,89 +1156,64 @@ def write_pov(filename, scene=None, info_callback=None):
             file.write("\n")
             tabWrite("#declare %s =\n" % povdataname)
             tabWrite("mesh2 {\n")
-            tabWrite("vertex_vectors {\n")
-            tabWrite("%d" % len(me.vertices))  # vert count
-
-            tabStr = tab * tabLevel
-            for v in me.vertices:
-                if not scene.pov.tempfiles_enable and scene.pov.list_lf_enable:
-                    file.write(",\n")
-                    file.write(tabStr + "<%.6f, %.6f, %.6f>" % v.co[:])  # vert count
-                else:
-                    file.write(", ")
-                    file.write("<%.6f, %.6f, %.6f>" % v.co[:])  # vert count
-                #tabWrite("<%.6f, %.6f, %.6f>" % v.co[:])  # vert count
-            file.write("\n")
-            tabWrite("}\n")
 
-            # Build unique Normal list
+            # Build unique Normal and UV lists, indexed in the order they are written.
             uniqueNormals = {}
-            for fi, f in enumerate(me_faces):
-                fv = faces_verts[fi]
-                # [-1] is a dummy index, use a list so we can modify in place
-                if f.use_smooth:  # Use vertex normals
-                    for v in fv:
-                        key = verts_normals[v]
+            uniqueUVs = {}
+
+            def buildUniqueVectors():
+                if uniqueNormals:
+                    return
+                for fi, f in enumerate(me_faces):
+                    fv = faces_verts[fi]
+                    # [-1] is a dummy index, use a list so we can modify in place
+                    if f.use_smooth:  # Use vertex normals
+                        for v in fv:
+                            key = verts_normals[v]
+                            uniqueNormals[key] = [-1]
+                    else:  # Use face normal
+                        key = faces_normals[fi]
                         uniqueNormals[key] = [-1]
-                else:  # Use face normal
-                    key = faces_normals[fi]
-                    uniqueNormals[key] = [-1]
-
-            tabWrite("normal_vectors {\n")
-            tabWrite("%d" % len(uniqueNormals))  # vert count
-            idx = 0
-            tabStr = tab * tabLevel
-            for no, index in uniqueNormals.items():
-                if not scene.pov.tempfiles_enable and scene.pov.list_lf_enable:
-                    file.write(",\n")
-                    file.write(tabStr + "<%.6f, %.6f, %.6f>" % no)  # vert count
-                else:
-                    file.write(", ")
-                    file.write("<%.6f, %.6f, %.6f>" % no)  # vert count
-                index[0] = idx
-                idx += 1
-            file.write("\n")
-            tabWrite("}\n")
+                for idx, index in enumerate(uniqueNormals.values()):
+                    index[0] = idx
 
-            # Vertex colors
-            vertCols = {}  # Use for material colors also.
+                if uv_layer:
+                    for fi, uv in enumerate(uv_layer):
 
-            if uv_layer:
-                # Generate unique UV's
-                uniqueUVs = {}
-                #n = 0
-                for fi, uv in enumerate(uv_layer):
+                        if len(faces_verts[fi]) == 4:
+                            uvs = uv_layer[fi].uv[0], uv_layer[fi].uv[1], uv_layer[fi].uv[2], uv_layer[fi].uv[3]
+                        else:
+                            uvs = uv_layer[fi].uv[0], uv_layer[fi].uv[1], uv_layer[fi].uv[2]
 
-                    if len(faces_verts[fi]) == 4:
-                        uvs = uv_layer[fi].uv[0], uv_layer[fi].uv[1], uv_layer[fi].uv[2], uv_layer[fi].uv[3]
-                    else:
-                        uvs = uv_layer[fi].uv[0], uv_layer[fi].uv[1], uv_layer[fi].uv[2]
-
-                    for uv in uvs:
-                        uniqueUVs[uv[:]] = [-1]
-
-                tabWrite("uv_vectors {\n")
-                #print unique_uvs
-                tabWrite("%d" % len(uniqueUVs))  # vert count
-                idx = 0
-                tabStr = tab * tabLevel
-                for uv, index in uniqueUVs.items():
-                    if not scene.pov.tempfiles_enable and scene.pov.list_lf_enable:
-                        file.write(",\n")
-                        file.write(tabStr + "<%.6f, %.6f>" % uv)
-                    else:
-                        file.write(", ")
-                        file.write("<%.6f, %.6f>" % uv)
-                    index[0] = idx
-                    idx += 1
-                '''
-                else:
-                    # Just add 1 dummy vector, no real UV's
-                    tabWrite('1') # vert count
-                    file.write(',\n\t\t<0.0, 0.0>')
-                '''
-                file.write("\n")
-                tabWrite("}\n")
+                        for uv in uvs:
+                            uniqueUVs[uv[:]] = [-1]
+                    for idx, index in enumerate(uniqueUVs.values()):
+                        index[0] = idx
+
+            def writeVectors():
+                buildUniqueVectors()
+
+                co = [0.0] * (len(me.vertices) * 3)
+                me.vertices.foreach_get("co", co)
+                writeList("vertex_vectors", ("<%.6f, %.6f, %.6f>",) * len(me.vertices), co)
+
+                writeList("normal_vectors", ("<%.6f, %.6f, %.6f>",) * len(uniqueNormals),
+                          [c for no in uniqueNormals for c in no])
+
+                if uv_layer:
+                    writeList("uv_vectors", ("<%.6f, %.6f>",) * len(uniqueUVs),
+                              [c for uv in uniqueUVs for c in uv])
+
+            # With the mesh cache, sections only depending on the mesh data are
+            # keyed on its digest and on everything changing their formatting.
+            geomKey = None
+            if meshCache:
+                geomKey = MeshCache.key(mesh_digest(me), tab, tabLevel,
+                                        scene.pov.tempfiles_enable, scene.pov.list_lf_enable)
+            writeCachedSection(povdataname + "_vectors", geomKey, writeVectors)
+
+            # Vertex colors
+            vertCols = {}  # Use for material colors also.
 
             if me.vertex_colors:
 
@@ -1621,111 +1707,61 @@ def write_pov(filename, scene=None, info_callback=None):
                     
                 tabWrite("}\n")
 
-                # Face indices
-                tabWrite("face_indices {\n")
-                tabWrite("%d" % (len(me_faces) + quadCount))  # faces count
-                tabStr = tab * tabLevel
-
-                for fi, f in enumerate(me_faces):
-                    fv = faces_verts[fi]
-                    material_index = f.material_index
-                    if len(fv) == 4:
-                        indices = (0, 1, 2), (0, 2, 3)
-                    else:
-                        indices = ((0, 1, 2),)
-
-                    if vcol_layer:
-                        col = vcol_layer[fi]
+                def writeIndices():
+                    buildUniqueVectors()
 
+                    # Face indices
+                    fmts = []
+                    values = []
+                    for fi, f in enumerate(me_faces):
+                        fv = faces_verts[fi]
+                        material_index = f.material_index
                         if len(fv) == 4:
-                            cols = col.color1, col.color2, col.color3, col.color4
+                            indices = (0, 1, 2), (0, 2, 3)
                         else:
-                            cols = col.color1, col.color2, col.color3
-
-                    if not me_materials or me_materials[material_index] is None:  # No materials
-                        for i1, i2, i3 in indices:
-                            if not scene.pov.tempfiles_enable and scene.pov.list_lf_enable:
-                                file.write(",\n")
-                                # vert count
-                                file.write(tabStr + "<%d,%d,%d>" % (fv[i1], fv[i2], fv[i3]))
-                            else:
-                                file.write(", ")
-                                file.write("<%d,%d,%d>" % (fv[i1], fv[i2], fv[i3]))  # vert count
-                    else:
-                        material = me_materials[material_index]
-                        for i1, i2, i3 in indices:
-                            if me.vertex_colors and material.use_vertex_color_paint:
-                                # Color per vertex - vertex color
+                            indices = ((0, 1, 2),)
 
-                                col1 = cols[i1]
-                                col2 = cols[i2]
-                                col3 = cols[i3]
+                        if vcol_layer:
+                            col = vcol_layer[fi]
 
-                                ci1 = vertCols[col1[0], col1[1], col1[2], material_index][0]
-                                ci2 = vertCols[col2[0], col2[1], col2[2], material_index][0]
-                                ci3 = vertCols[col3[0], col3[1], col3[2], material_index][0]
-                            else:
-                                # Color per material - flat material color
-                                if material.subsurface_scattering.use:
-                                    diffuse_color = [i * j for i, j in zip(material.subsurface_scattering.color[:], material.diffuse_color[:])]
-                                else:
-                                    diffuse_color = material.diffuse_color[:]
-                                ci1 = ci2 = ci3 = vertCols[diffuse_color[0], diffuse_color[1], \
-                                                  diffuse_color[2], f.material_index][0]
-
-                            if not scene.pov.tempfiles_enable and scene.pov.list_lf_enable:
-                                file.write(",\n")
-                                file.write(tabStr + "<%d,%d,%d>, %d,%d,%d" % \
-                                           (fv[i1], fv[i2], fv[i3], ci1, ci2, ci3))  # vert count
+                            if len(fv) == 4:
+                                cols = col.color1, col.color2, col.color3, col.color4
                             else:
-                                file.write(", ")
-                                file.write("<%d,%d,%d>, %d,%d,%d" % \
-                                           (fv[i1], fv[i2], fv[i3], ci1, ci2, ci3))  # vert count
-
-                file.write("\n")
-                tabWrite("}\n")
-
-                # normal_indices indices
-                tabWrite("normal_indices {\n")
-                tabWrite("%d" % (len(me_faces) + quadCount))  # faces count
-                tabStr = tab * tabLevel
-                for fi, fv in enumerate(faces_verts):
+                                cols = col.color1, col.color2, col.color3
 
-                    if len(fv) == 4:
-                        indices = (0, 1, 2), (0, 2, 3)
-                    else:
-                        indices = ((0, 1, 2),)
-
-                    for i1, i2, i3 in indices:
-                        if me_faces[fi].use_smooth:
-                            if not scene.pov.tempfiles_enable and scene.pov.list_lf_enable:
-                                file.write(",\n")
-                                file.write(tabStr + "<%d,%d,%d>" %\
-                                (uniqueNormals[verts_normals[fv[i1]]][0],\
-                                 uniqueNormals[verts_normals[fv[i2]]][0],\
-                                 uniqueNormals[verts_normals[fv[i3]]][0]))  # vert count
-                            else:
-                                file.write(", ")
-                                file.write("<%d,%d,%d>" %\
-                                (uniqueNormals[verts_normals[fv[i1]]][0],\
-                                 uniqueNormals[verts_normals[fv[i2]]][0],\
-                                 uniqueNormals[verts_normals[fv[i3]]][0]))  # vert count
+                        if not me_materials or me_materials[material_index] is None:  # No materials
+                            for i1, i2, i3 in indices:
+                                fmts.append("<%d,%d,%d>")
+                                values.extend((fv[i1], fv[i2], fv[i3]))
                         else:
-                            idx = uniqueNormals[faces_normals[fi]][0]
-                            if not scene.pov.tempfiles_enable and scene.pov.list_lf_enable:
-                                file.write(",\n")
-                                file.write(tabStr + "<%d,%d,%d>" % (idx, idx, idx))  # vert count
-                            else:
-                                file.write(", ")
-                                file.write("<%d,%d,%d>" % (idx, idx, idx))  # vert count
+                            material = me_materials[material_index]
+                            for i1, i2, i3 in indices:
+                                if me.vertex_colors and material.use_vertex_color_paint:
+                                    # Color per vertex - vertex color
+
+                                    col1 = cols[i1]
+                                    col2 = cols[i2]
+                                    col3 = cols[i3]
+
+                                    ci1 = vertCols[col1[0], col1[1], col1[2], material_index][0]
+                                    ci2 = vertCols[col2[0], col2[1], col2[2], material_index][0]
+                                    ci3 = vertCols[col3[0], col3[1], col3[2], material_index][0]
+                                else:
+                                    # Color per material - flat material color
+                                    if material.subsurface_scattering.use:
+                                        diffuse_color = [i * j for i, j in zip(material.subsurface_scattering.color[:], material.diffuse_color[:])]
+                                    else:
+                                        diffuse_color = material.diffuse_color[:]
+                                    ci1 = ci2 = ci3 = vertCols[diffuse_color[0], diffuse_color[1], \
+                                                      diffuse_color[2], f.material_index][0]
 
-                file.write("\n")
-                tabWrite("}\n")
+                                fmts.append("<%d,%d,%d>, %d,%d,%d")
+                                values.extend((fv[i1], fv[i2], fv[i3], ci1, ci2, ci3))
 
-                if uv_layer:
-                    tabWrite("uv_indices {\n")
-                    tabWrite("%d" % (len(me_faces) + quadCount))  # faces count
-                    tabStr = tab * tabLevel
+                    writeList("face_indices", fmts, values)
+
+                    # normal_indices indices
+                    values = []
                     for fi, fv in enumerate(faces_verts):
 
                         if len(fv) == 4:
@@ -1733,28 +1769,41 @@ def write_pov(filename, scene=None, info_callback=None):
                         else:
                             indices = ((0, 1, 2),)
 
-                        uv = uv_layer[fi]
-                        if len(faces_verts[fi]) == 4:
-                            uvs = uv.uv[0][:], uv.uv[1][:], uv.uv[2][:], uv.uv[3][:]
+                        if me_faces[fi].use_smooth:
+                            nv = [uniqueNormals[verts_normals[v]][0] for v in fv]
+                            for i1, i2, i3 in indices:
+                                values.extend((nv[i1], nv[i2], nv[i3]))
                         else:
-                            uvs = uv.uv[0][:], uv.uv[1][:], uv.uv[2][:]
-
-                        for i1, i2, i3 in indices:
-                            if not scene.pov.tempfiles_enable and scene.pov.list_lf_enable:
-                                file.write(",\n")
-                                file.write(tabStr + "<%d,%d,%d>" % (
-                                         uniqueUVs[uvs[i1]][0],\
-                                         uniqueUVs[uvs[i2]][0],\
-                                         uniqueUVs[uvs[i3]][0]))
+                            idx = uniqueNormals[faces_normals[fi]][0]
+                            values.extend((idx, idx, idx) * len(indices))
+
+                    writeList("normal_indices", ("<%d,%d,%d>",) * (len(values) // 3), values)
+
+                    if uv_layer:
+                        values = []
+                        for fi, fv in enumerate(faces_verts):
+
+                            if len(fv) == 4:
+                                indices = (0, 1, 2), (0, 2, 3)
                             else:
-                                file.write(", ")
-                                file.write("<%d,%d,%d>" % (
-                                         uniqueUVs[uvs[i1]][0],\
-                                         uniqueUVs[uvs[i2]][0],\
-                                         uniqueUVs[uvs[i3]][0]))
+                                indices = ((0, 1, 2),)
 
-                    file.write("\n")
-                    tabWrite("}\n")
+                            uv = uv_layer[fi]
+                            uvi = [uniqueUVs[uv.uv[i][:]][0] for i in range(len(fv))]
+
+                            for i1, i2, i3 in indices:
+                                values.extend((uvi[i1], uvi[i2], uvi[i3]))
+
+                        writeList("uv_indices", ("<%d,%d,%d>",) * (len(values) // 3), values)
+
+                # Face indices refer to the texture_list through vertCols as well
+                indicesKey = None
+                if meshCache:
+                    indicesKey = MeshCache.key(
+                            geomKey, sorted((k, v[0]) for k, v in vertCols.items()),
+                            [(m.use_vertex_color_paint, m.subsurface_scattering.use) if m else None
+                             for m in me_materials])
+                writeCachedSection(povdataname + "_indices", indicesKey, writeIndices)
 
                 if me.materials:
                     try:
@@ -2030,6 +2079,8 @@ def write_pov(filename, scene=None, info_callback=None):
         file.write("//--Mesh objects--\n")
 
     exportMeshes(scene, sel)
+    if meshCache is not None and mesh_cache is None:
+        meshCache.purge()
     #What follow used to happen here:
     #exportCamera()
     #exportWorld(scene.world)
@@ -2043,7 +2094,7 @@ def write_pov(filename, scene=None, info_callback=None):
     #print("pov file closed %s" % file.closed)
 
 
-def write_pov_ini(scene, filename_ini, filename_pov, filename_image):
+def write_pov_ini(scene, filename_ini, filename_pov, filename_image, threads=0, display=True):
     #scene = bpy.data.scenes[0]
     render = scene.render
 
@@ -2068,9 +2119,12 @@ def write_pov_ini(scene, filename_ini, filename_pov, filename_image):
 
     file.write("Bounding_Method=2\n")  # The new automatic BSP is faster in most scenes
 
+    if threads > 0:
+        file.write("Work_Threads=%d\n" % threads)
+
     # Activated (turn this back off when better live exchange is done between the two programs
     # (see next comment)
-    file.write("Display=1\n")
+    file.write("Display=%d\n" % display)
     file.write("Pause_When_Done=0\n")
     # PNG, with POV-Ray 3.7, can show background color with alpha. In the long run using the
     # POV-Ray interactive preview like bishop 3D could solve the preview for all formats.
@@ -2501,3 +2555,185 @@ class PovrayRender(bpy.types.RenderEngine):
 
         if scene.pov.tempfiles_enable or scene.pov.deletefiles_enable:
             self._cleanup()
+
+
+class RenderPovrayAnimation(bpy.types.Operator):
+    """Export the whole frame range, then render it with several POV-Ray processes at once"""
+    bl_idname = "render.povray_animation"
+    bl_label = "Render Animation (POV-Ray Pool)"
+
+    DELAY = 0.5
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.render.engine == 'POVRAY_RENDER'
+
+    def _export_frames(self, context):
+        import tempfile
+
+        scene = context.scene
+        wm = context.window_manager
+        pov = scene.pov
+
+        if pov.tempfiles_enable or not pov.scene_path:
+            self._directory = tempfile.mkdtemp(prefix="povray_")
+        else:
+            self._directory = os.path.realpath(bpy.path.abspath(pov.scene_path))
+            if not os.path.exists(self._directory):
+                os.makedirs(self._directory)
+
+        # Split the cores between the processes, POV-Ray scales poorly on
+        # a single frame so several smaller processes keep all of them busy.
+        import multiprocessing
+        self._max_processes = max(1, pov.animation_processes)
+        threads = max(1, multiprocessing.cpu_count() // self._max_processes)
+
+        # All frames share one mesh cache, it's purged once they're rendered
+        # (the outdated files of one frame are still included by the others).
+        self._mesh_cache = None
+        if pov.mesh_cache_enable:
+            self._mesh_cache = MeshCache(os.path.join(self._directory, "povray_mesh_cache"))
+
+        frames = range(scene.frame_start, scene.frame_end + 1, scene.frame_step)
+        frame_orig = scene.frame_current
+        self._jobs = []
+        wm.progress_begin(0, len(frames))
+        for i, frame in enumerate(frames):
+            scene.frame_set(frame)
+            base = os.path.join(self._directory, "frame_%04d" % frame)
+            image = os.path.splitext(bpy.path.abspath(scene.render.frame_path(frame=frame)))[0] + ".png"
+            image_dir = os.path.dirname(image)
+            if image_dir and not os.path.exists(image_dir):
+                os.makedirs(image_dir)
+            write_pov(base + ".pov", scene, mesh_cache=self._mesh_cache)
+            # No preview window for each of the processes
+            write_pov_ini(scene, base + ".ini", base + ".pov", image, threads, display=False)
+            self._jobs.append((frame, base, image))
+            wm.progress_update(i)
+        wm.progress_end()
+        scene.frame_set(frame_orig)
+
+    def _start(self, job):
+        frame, base, image = job
+        try:
+            os.remove(image)  # so as not to report an old file as rendered
+        except OSError:
+            pass
+        log = open(base + ".log", "w")
+        try:
+            process = subprocess.Popen([self._pov_binary, base + ".ini"] + self._extra_args,
+                                       stdout=log, stderr=subprocess.STDOUT)
+        finally:
+            log.close()
+        return process
+
+    def _report_done(self):
+        # Results are reported in frame order, whichever process finishes first.
+        while self._next_report < len(self._jobs):
+            frame, base, image = self._jobs[self._next_report]
+            result = self._results.get(frame)
+            if result is None:
+                break
+            if result == 0 and os.path.exists(image):
+                print("POV-Ray 3.7: frame %d saved to %r" % (frame, image))
+            else:
+                self._failed.append(frame)
+                print("POV-Ray 3.7: frame %d FAILED, see %r" % (frame, base + ".log"))
+            self._next_report += 1
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            for process in self._running.values():
+                try:
+                    process.terminate()
+                except OSError:
+                    pass
+            self._running.clear()
+            self.report({'WARNING'}, "POV-Ray animation cancelled")
+            return self._finish(context, {'CANCELLED'})
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        for frame, process in list(self._running.items()):
+            result = process.poll()
+            if result is not None:
+                self._results[frame] = result
+                del self._running[frame]
+
+        while self._pending and len(self._running) < self._max_processes:
+            job = self._pending.pop(0)
+            try:
+                self._running[job[0]] = self._start(job)
+            except OSError:
+                self._results[job[0]] = -1
+
+        self._report_done()
+        context.window_manager.progress_update(len(self._results))
+        if context.area:
+            context.area.header_text_set("POV-Ray 3.7: %d of %d frames rendered, %d running" %
+                                         (len(self._results), len(self._jobs), len(self._running)))
+
+        if not self._pending and not self._running:
+            if self._failed:
+                self.report({'WARNING'}, "POV-Ray 3.7: %d frame(s) failed: %s" %
+                            (len(self._failed), ", ".join(str(f) for f in self._failed)))
+            else:
+                self.report({'INFO'}, "POV-Ray 3.7: %d frames rendered" % len(self._jobs))
+            return self._finish(context, {'FINISHED'})
+
+        return {'PASS_THROUGH'}
+
+    def _finish(self, context, result):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        if context.area:
+            context.area.header_text_set()
+
+        if self._mesh_cache is not None:
+            self._mesh_cache.purge()
+
+        pov = context.scene.pov
+        if pov.tempfiles_enable and not self._failed:
+            import shutil
+            shutil.rmtree(self._directory, ignore_errors=True)
+        elif pov.tempfiles_enable or pov.deletefiles_enable:
+            for frame, base, image in self._jobs:
+                for ext in (".pov", ".ini", ".log"):
+                    if frame in self._failed and ext == ".log":
+                        continue
+                    try:
+                        os.remove(base + ext)
+                    except OSError:
+                        pass
+        return result
+
+    def execute(self, context):
+        self._pov_binary = PovrayRender._locate_binary()
+        if not self._pov_binary:
+            self.report({'ERROR'}, "POV-Ray 3.7: could not execute povray, possibly POV-Ray isn't installed")
+            return {'CANCELLED'}
+
+        scene = context.scene
+        self._extra_args = []
+        if scene.pov.command_line_switches != "":
+            for newArg in scene.pov.command_line_switches.split(" "):
+                self._extra_args.append(newArg)
+        if sys.platform[:3] != "win":
+            # -d prevents the render window popup which leads to segfault on linux
+            self._extra_args.append("-d")
+
+        self._export_frames(context)
+
+        self._pending = list(self._jobs)
+        self._running = {}
+        self._results = {}
+        self._failed = []
+        self._next_report = 0
+
+        wm = context.window_manager
+        wm.progress_begin(0, len(self._jobs))
+        self._timer = wm.event_timer_add(self.DELAY, context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
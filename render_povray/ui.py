@@ -189,6 +189,10 @@ class RENDER_PT_povray_export_settings(RenderButtonsPanel, bpy.types.Panel):
         split.prop(scene.pov, "tempfiles_enable", text="OS Tempfiles")
         if not scene.pov.tempfiles_enable:
             split.prop(scene.pov, "deletefiles_enable", text="Delete files")
+        layout.prop(scene.pov, "mesh_cache_enable")
+        row = layout.row(align=True)
+        row.operator("render.povray_animation", text="Animation Pool", icon='RENDER_ANIMATION')
+        row.prop(scene.pov, "animation_processes")
 
         if not scene.pov.tempfiles_enable:
             col = layout.column()